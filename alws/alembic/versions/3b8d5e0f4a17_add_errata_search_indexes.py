@@ -0,0 +1,70 @@
+"""Add errata search vector and listing indexes
+
+Revision ID: 3b8d5e0f4a17
+Revises: a6f0c2d8e913
+Create Date: 2026-10-17 16:12:40.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '3b8d5e0f4a17'
+down_revision = 'a6f0c2d8e913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'errata_records',
+        sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                "to_tsvector('simple'::regconfig, translate("
+                "id || ' ' || coalesce(title, '') || ' ' || original_title, "
+                "'-:', '  '))",
+                persisted=True,
+            ),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        'errata_records_search_vector_idx',
+        'errata_records',
+        ['search_vector'],
+        unique=False,
+        postgresql_using='gin',
+    )
+    op.create_index(
+        'errata_records_updated_date_id_idx',
+        'errata_records',
+        ['updated_date', 'id'],
+        unique=False,
+    )
+    op.create_index(
+        'errata_references_cve_id_pattern_idx',
+        'errata_references',
+        ['cve_id'],
+        unique=False,
+        postgresql_ops={'cve_id': 'text_pattern_ops'},
+    )
+
+
+def downgrade():
+    op.drop_index(
+        'errata_references_cve_id_pattern_idx',
+        table_name='errata_references',
+    )
+    op.drop_index(
+        'errata_records_updated_date_id_idx',
+        table_name='errata_records',
+    )
+    op.drop_index(
+        'errata_records_search_vector_idx',
+        table_name='errata_records',
+    )
+    op.drop_column('errata_records', 'search_vector')
@@ -0,0 +1,33 @@
+"""Add partial index for ready build tasks
+
+Revision ID: 5d2a1f6c7e80
+Revises: e4b4a298844b
+Create Date: 2026-10-17 09:12:41.318220
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2a1f6c7e80'
+down_revision = 'e4b4a298844b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'idx_build_tasks_ready_arch_id',
+        'build_tasks',
+        ['arch', 'id'],
+        unique=False,
+        postgresql_where=sa.text('status < 2'),
+    )
+
+
+def downgrade():
+    op.drop_index(
+        'idx_build_tasks_ready_arch_id',
+        table_name='build_tasks',
+    )
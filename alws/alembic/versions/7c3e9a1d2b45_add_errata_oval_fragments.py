@@ -0,0 +1,59 @@
+"""Add errata OVAL fragments cache
+
+Revision ID: 7c3e9a1d2b45
+Revises: 5d2a1f6c7e80
+Create Date: 2026-10-17 11:04:52.601934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3e9a1d2b45'
+down_revision = '5d2a1f6c7e80'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'errata_oval_fragments',
+        sa.Column('errata_record_id', sa.Text(), nullable=False),
+        sa.Column('platform_id', sa.Integer(), nullable=False),
+        sa.Column('updated_date', sa.DateTime(), nullable=False),
+        sa.Column('rendered_at', sa.DateTime(), nullable=False),
+        sa.Column(
+            'fragment',
+            postgresql.JSONB(astext_type=sa.Text()),
+            nullable=True,
+        ),
+        sa.ForeignKeyConstraint(
+            ['errata_record_id'],
+            ['errata_records.id'],
+            name='errata_oval_fragment_errata_record_id_fk',
+            ondelete='CASCADE',
+        ),
+        sa.ForeignKeyConstraint(
+            ['platform_id'],
+            ['platforms.id'],
+            name='errata_oval_fragment_platform_id_fk',
+            ondelete='CASCADE',
+        ),
+        sa.PrimaryKeyConstraint('errata_record_id'),
+    )
+    op.create_index(
+        op.f('ix_errata_oval_fragments_platform_id'),
+        'errata_oval_fragments',
+        ['platform_id'],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index(
+        op.f('ix_errata_oval_fragments_platform_id'),
+        table_name='errata_oval_fragments',
+    )
+    op.drop_table('errata_oval_fragments')
@@ -0,0 +1,112 @@
+"""Add parsed NEVRA columns to build artifacts
+
+Revision ID: a6f0c2d8e913
+Revises: 7c3e9a1d2b45
+Create Date: 2026-10-17 13:27:05.114870
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+from alws.utils.parsing import clean_release
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6f0c2d8e913'
+down_revision = '7c3e9a1d2b45'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 10000
+# Same as BuildTaskArtifact.name_as_dict
+ARTIFACT_NAME_REGEX = re.compile(
+    r"^(?P<name>[\w+-.]+)-"
+    r"(?P<version>\d+?[\w.]*)-"
+    r"(?P<release>\d+?[\w.+]*?)"
+    r"\.(?P<arch>[\w]*)(\.rpm)?$"
+)
+
+
+def backfill_nevra_columns():
+    # Epoch isn't a part of file names, so it's filled
+    # for new artifacts only, at the build done time
+    conn = op.get_bind()
+    select_query = sa.text(
+        "SELECT id, name FROM build_artifacts "
+        "WHERE type = 'rpm' AND id > :last_id "
+        "ORDER BY id LIMIT :limit"
+    )
+    update_query = sa.text(
+        "UPDATE build_artifacts SET rpm_name = :rpm_name, "
+        "rpm_version = :rpm_version, "
+        "rpm_clean_release = :rpm_clean_release, "
+        "rpm_arch = :rpm_arch "
+        "WHERE id = :id"
+    )
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select_query,
+            {'last_id': last_id, 'limit': BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        values = []
+        for row in rows:
+            match = ARTIFACT_NAME_REGEX.search(row.name)
+            if not match:
+                continue
+            values.append({
+                'id': row.id,
+                'rpm_name': match.group('name'),
+                'rpm_version': match.group('version'),
+                'rpm_clean_release': clean_release(match.group('release')),
+                'rpm_arch': match.group('arch'),
+            })
+        if values:
+            conn.execute(update_query, values)
+
+
+def upgrade():
+    op.add_column(
+        'build_artifacts',
+        sa.Column('rpm_name', sa.Text(), nullable=True),
+    )
+    op.add_column(
+        'build_artifacts',
+        sa.Column('rpm_epoch', sa.Integer(), nullable=True),
+    )
+    op.add_column(
+        'build_artifacts',
+        sa.Column('rpm_version', sa.Text(), nullable=True),
+    )
+    op.add_column(
+        'build_artifacts',
+        sa.Column('rpm_clean_release', sa.Text(), nullable=True),
+    )
+    op.add_column(
+        'build_artifacts',
+        sa.Column('rpm_arch', sa.Text(), nullable=True),
+    )
+    backfill_nevra_columns()
+    op.create_index(
+        'build_artifacts_rpm_nevra_idx',
+        'build_artifacts',
+        ['rpm_name', 'rpm_version', 'rpm_clean_release', 'rpm_arch'],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index(
+        'build_artifacts_rpm_nevra_idx',
+        table_name='build_artifacts',
+    )
+    op.drop_column('build_artifacts', 'rpm_arch')
+    op.drop_column('build_artifacts', 'rpm_clean_release')
+    op.drop_column('build_artifacts', 'rpm_version')
+    op.drop_column('build_artifacts', 'rpm_epoch')
+    op.drop_column('build_artifacts', 'rpm_name')
@@ -12,6 +12,9 @@ from alws.auth.oauth.github import get_github_oauth_client
 from alws.auth.schemas import UserRead
 from alws.config import settings
 from alws.middlewares import handlers
+from alws.utils.heartbeat import heartbeat_writer
+from alws.utils.pulp_client import PulpClient
+from alws.utils.task_notifier import task_notifier
 
 logging.basicConfig(level=settings.logging_level)
 
@@ -34,6 +37,20 @@ if settings.sentry_dsn:
 app = FastAPI()
 app.add_middleware(ExceptionMiddleware, handlers=handlers)
 
+
+@app.on_event('startup')
+async def startup():
+    await task_notifier.start()
+    await heartbeat_writer.start()
+
+
+@app.on_event('shutdown')
+async def shutdown():
+    await task_notifier.stop()
+    await heartbeat_writer.stop()
+    await PulpClient.close_session()
+
+
 for module in ROUTERS:
     for router_type in (
         'router',
@@ -20,9 +20,36 @@ class Settings(BaseSettings):
     package_beholder_enabled: bool = True
     beholder_host: str = 'http://beholder-web:5000'
     beholder_token: Optional[str] = None
+    # Beholder responses are cached in Redis for this number of seconds,
+    # set to 0 to disable the cache
+    beholder_cache_ttl: int = 600
+    # How many reference platforms are queried at the same time
+    # and how long a single query may take, in seconds
+    beholder_concurrency: int = 5
+    beholder_endpoint_timeout: int = 60
 
     redis_url: str = 'redis://redis:6379'
 
+    # Pick up build tasks with "FOR UPDATE SKIP LOCKED",
+    # set to False to fall back to the plain "FOR UPDATE" dispatch
+    build_task_skip_locked: bool = True
+    # Upper limit for "max_tasks" of a single /build_node/get_tasks request
+    build_node_max_tasks_per_request: int = 10
+    # Upper limit for "wait_timeout" of build/sign/test tasks long polling
+    # and how often parked requests recheck the database, in seconds
+    task_long_poll_max_timeout: int = 60
+    task_long_poll_recheck_interval: int = 10
+    # Build nodes pings are buffered and written to the database
+    # once per this interval in seconds, set to 0 to write every ping.
+    # Should stay well below the build task expiration time (20 minutes)
+    build_task_ping_flush_interval: int = 5
+    # How many errata records are prepared and how many repositories
+    # are written to Pulp at the same time during bulk errata release
+    errata_release_concurrency: int = 5
+    # How many modules.yaml files are fetched from Pulp at the same time
+    # during release planning
+    release_modules_concurrency: int = 10
+
     database_url: str = (
         'postgresql+asyncpg://postgres:password@db/almalinux-bs'
     )
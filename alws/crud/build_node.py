@@ -29,60 +29,154 @@ from alws.utils.noarch import save_noarch_packages
 from alws.utils.parsing import clean_release, parse_rpm_nevra
 from alws.utils.pulp_client import PulpClient
 from alws.utils.rpm_package import get_rpm_packages_info
+from alws.utils.task_notifier import get_build_topics, get_notify_query
 
 
-async def get_available_build_task(
+def get_build_task_ts_expired() -> datetime.datetime:
+    # TODO: here should be config value
+    return datetime.datetime.utcnow() - datetime.timedelta(minutes=20)
+
+
+def get_build_task_load_options() -> list:
+    return [
+        selectinload(models.BuildTask.ref),
+        selectinload(models.BuildTask.build).selectinload(models.Build.repos),
+        selectinload(models.BuildTask.platform).selectinload(
+            models.Platform.repos
+        ),
+        selectinload(models.BuildTask.build).selectinload(models.Build.owner),
+        selectinload(models.BuildTask.build)
+        .selectinload(models.Build.linked_builds)
+        .selectinload(models.Build.repos),
+        selectinload(models.BuildTask.build)
+        .selectinload(models.Build.platform_flavors)
+        .selectinload(models.PlatformFlavour.repos),
+        selectinload(models.BuildTask.artifacts),
+        selectinload(models.BuildTask.rpm_module),
+    ]
+
+
+def get_ready_build_tasks_query(
+    supported_arches: typing.List[str],
+):
+    # Narrow projection over the "ready" part of build_tasks, which is
+    # backed by the partial idx_build_tasks_ready_arch_id index.
+    # Rows locked by other build nodes are skipped instead of waited for,
+    # so concurrent nodes don't line up behind the same first row.
+    ts_expired = get_build_task_ts_expired()
+    # status is rendered inline, otherwise planner can't match
+    # the partial index predicate for generic prepared statements
+    ready_status = sqlalchemy.bindparam(
+        "ready_status",
+        int(BuildTaskStatus.COMPLETED),
+        literal_execute=True,
+    )
+    return (
+        select(models.BuildTask.id)
+        .where(
+            models.BuildTask.status < ready_status,
+            models.BuildTask.arch.in_(supported_arches),
+            sqlalchemy.or_(
+                models.BuildTask.ts < ts_expired,
+                models.BuildTask.ts.is_(None),
+            ),
+            ~sqlalchemy.exists().where(
+                models.BuildTaskDependency.c.build_task_id
+                == models.BuildTask.id
+            ),
+        )
+        .order_by(models.BuildTask.id.asc())
+        .with_for_update(skip_locked=True)
+    )
+
+
+async def claim_ready_build_tasks(
     db: AsyncSession,
-    request: build_node_schema.RequestTask,
-) -> typing.Optional[models.BuildTask]:
+    supported_arches: typing.List[str],
+    max_tasks: int = 1,
+) -> typing.List[models.BuildTask]:
     async with db.begin():
-        # TODO: here should be config value
-        ts_expired = datetime.datetime.utcnow() - datetime.timedelta(
-            minutes=20
+        tasks_ids = (
+            (
+                await db.execute(
+                    get_ready_build_tasks_query(supported_arches).limit(
+                        max_tasks
+                    )
+                )
+            )
+            .scalars()
+            .all()
+        )
+        if not tasks_ids:
+            return []
+        await db.execute(
+            update(models.BuildTask)
+            .where(models.BuildTask.id.in_(tasks_ids))
+            .values(
+                ts=datetime.datetime.utcnow(),
+                status=BuildTaskStatus.STARTED,
+            )
         )
-        db_task = await db.execute(
+        # Heavy relationships are loaded only for the claimed rows
+        db_tasks = await db.execute(
+            select(models.BuildTask)
+            .where(models.BuildTask.id.in_(tasks_ids))
+            .options(*get_build_task_load_options())
+            .order_by(models.BuildTask.id.asc())
+            .execution_options(populate_existing=True)
+        )
+        db_tasks = db_tasks.scalars().all()
+        await db.commit()
+    return db_tasks
+
+
+async def get_available_build_tasks(
+    db: AsyncSession,
+    supported_arches: typing.List[str],
+    max_tasks: int = 1,
+) -> typing.List[models.BuildTask]:
+    if settings.build_task_skip_locked:
+        return await claim_ready_build_tasks(
+            db,
+            supported_arches,
+            max_tasks=max_tasks,
+        )
+    async with db.begin():
+        ts_expired = get_build_task_ts_expired()
+        db_tasks = await db.execute(
             select(models.BuildTask)
             .where(~models.BuildTask.dependencies.any())
             .with_for_update()
             .filter(
                 sqlalchemy.and_(
                     models.BuildTask.status < BuildTaskStatus.COMPLETED,
-                    models.BuildTask.arch.in_(request.supported_arches),
+                    models.BuildTask.arch.in_(supported_arches),
                     sqlalchemy.or_(
                         models.BuildTask.ts < ts_expired,
                         models.BuildTask.ts.is_(None),
                     ),
                 )
             )
-            .options(
-                selectinload(models.BuildTask.ref),
-                selectinload(models.BuildTask.build).selectinload(
-                    models.Build.repos
-                ),
-                selectinload(models.BuildTask.platform).selectinload(
-                    models.Platform.repos
-                ),
-                selectinload(models.BuildTask.build).selectinload(
-                    models.Build.owner
-                ),
-                selectinload(models.BuildTask.build)
-                .selectinload(models.Build.linked_builds)
-                .selectinload(models.Build.repos),
-                selectinload(models.BuildTask.build)
-                .selectinload(models.Build.platform_flavors)
-                .selectinload(models.PlatformFlavour.repos),
-                selectinload(models.BuildTask.artifacts),
-                selectinload(models.BuildTask.rpm_module),
-            )
+            .options(*get_build_task_load_options())
             .order_by(models.BuildTask.id.asc())
+            .limit(max_tasks)
         )
-        db_task = db_task.scalars().first()
-        if not db_task:
-            return
-        db_task.ts = datetime.datetime.utcnow()
-        db_task.status = BuildTaskStatus.STARTED
+        db_tasks = db_tasks.scalars().all()
+        if not db_tasks:
+            return []
+        for db_task in db_tasks:
+            db_task.ts = datetime.datetime.utcnow()
+            db_task.status = BuildTaskStatus.STARTED
         await db.commit()
-    return db_task
+    return db_tasks
+
+
+async def get_available_build_task(
+    db: AsyncSession,
+    request: build_node_schema.RequestTask,
+) -> typing.Optional[models.BuildTask]:
+    db_tasks = await get_available_build_tasks(db, request.supported_arches)
+    return db_tasks[0] if db_tasks else None
 
 
 def add_build_task_dependencies(
@@ -177,6 +271,7 @@ async def update_failed_build_items_in_parallel(
                 # we shouldn't wait first task completion
                 if first_index_dep is None and not completed_index_tasks:
                     first_index_dep = task
+        await db.execute(get_notify_query(get_build_topics()))
         await db.commit()
 
 
@@ -205,6 +300,7 @@ async def update_failed_build_items(db: AsyncSession, build_id: int):
                         add_build_task_dependencies, task, last_task
                     )
                 last_task = task
+        await db.execute(get_notify_query(get_build_topics()))
         await db.commit()
 
 
@@ -281,6 +377,39 @@ async def ping_tasks(db: AsyncSession, task_list: typing.List[int]):
         await db.commit()
 
 
+async def bulk_ping_tasks(
+    db: AsyncSession,
+    pings: typing.Dict[int, datetime.datetime],
+):
+    """
+    Writes buffered pings of many build tasks with one
+    UPDATE ... FROM (VALUES ...) statement.
+    A timestamp isn't moved backwards, so a ping buffered before
+    build_done doesn't overwrite the timestamp set by it.
+    """
+    if not pings:
+        return
+    values = sqlalchemy.values(
+        sqlalchemy.column("id", sqlalchemy.Integer),
+        sqlalchemy.column("ts", sqlalchemy.DateTime),
+        name="pings",
+    ).data(sorted(pings.items()))
+    async with db.begin():
+        await db.execute(
+            update(models.BuildTask)
+            .where(
+                models.BuildTask.id == values.c.id,
+                sqlalchemy.or_(
+                    models.BuildTask.ts.is_(None),
+                    models.BuildTask.ts < values.c.ts,
+                ),
+            )
+            .values(ts=values.c.ts)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+
 async def get_build_task(db: AsyncSession, task_id: int) -> models.BuildTask:
     build_tasks = await db.execute(
         select(models.BuildTask)
@@ -320,6 +449,101 @@ async def get_srpm_artifact_by_build_task_id(
     return srpm_artifact.scalars().first()
 
 
+async def add_errata_packages_proposals(
+    db: AsyncSession,
+    rpms: typing.List[models.BuildTaskArtifact],
+    rpms_info: typing.Dict[str, typing.Dict[str, typing.Any]],
+    module_index: typing.Optional[IndexWrapper] = None,
+):
+    # All errata packages that can match built RPMs are loaded at once
+    # and indexed by (name, version, arch, clean_release),
+    # noarch RPMs match errata packages of any arch
+    if not rpms:
+        return
+    nevras = {
+        (rpm_info["name"], rpm_info["version"])
+        for rpm_info in rpms_info.values()
+    }
+    names_versions = sqlalchemy.values(
+        sqlalchemy.column("name", sqlalchemy.Text),
+        sqlalchemy.column("version", sqlalchemy.Text),
+        name="built_rpms",
+    ).data(list(nevras))
+    query = select(models.ErrataPackage).join(
+        names_versions,
+        sqlalchemy.and_(
+            models.ErrataPackage.name == names_versions.c.name,
+            models.ErrataPackage.version == names_versions.c.version,
+        ),
+    )
+    # In case of an errata that involves a module, we only add those
+    # packages that belong to the right module:stream
+    if module_index:
+        module = None
+        for mod in module_index.iter_modules():
+            if mod.name.endswith("-devel"):
+                continue
+            module = mod
+        build_task_module = f"{module.name}:{module.stream}"
+        query = query.join(models.ErrataRecord).filter(
+            models.ErrataRecord.module == build_task_module
+        )
+    errata_packages = defaultdict(list)
+    for errata_package in (await db.execute(query)).scalars().all():
+        key = (
+            errata_package.name,
+            errata_package.version,
+            errata_package.arch,
+            clean_release(errata_package.release),
+        )
+        errata_packages[key].append(errata_package)
+        if errata_package.arch != "noarch":
+            errata_packages[(*key[:2], "noarch", key[3])].append(
+                errata_package
+            )
+    if not errata_packages:
+        return
+
+    # We add ErrataToALBSPackage proposals for every matching package
+    proposals = []
+    for build_task_artifact in rpms:
+        rpm_info = rpms_info[build_task_artifact.href]
+        if rpm_info["arch"] != "src":
+            src_name = parse_rpm_nevra(rpm_info["rpm_sourcerpm"]).name
+        else:
+            src_name = rpm_info["name"]
+        key = (
+            rpm_info["name"],
+            rpm_info["version"],
+            rpm_info["arch"],
+            clean_release(rpm_info["release"]),
+        )
+        for errata_package in errata_packages.get(key, []):
+            errata_package.source_srpm = src_name
+            proposals.append((errata_package, build_task_artifact, rpm_info))
+    if not proposals:
+        return
+    # artifacts need their ids before proposals can refer to them
+    db.add_all(rpms)
+    await db.flush()
+    await db.execute(
+        insert(models.ErrataToALBSPackage),
+        [
+            {
+                "errata_package_id": errata_package.id,
+                "albs_artifact_id": build_task_artifact.id,
+                "status": ErrataPackageStatus.proposal,
+                "name": rpm_info["name"],
+                "version": rpm_info["version"],
+                "release": rpm_info["release"],
+                "epoch": int(rpm_info["epoch"]),
+                "arch": rpm_info["arch"],
+            }
+            for errata_package, build_task_artifact, rpm_info in proposals
+        ],
+    )
+
+
 async def __process_rpms(
     db: AsyncSession,
     pulp_client: PulpClient,
@@ -386,19 +610,6 @@ async def __process_rpms(
                 f"Cannot add RPM packages to the repository {str(repo)}"
             )
 
-    def append_errata_package(_, errata_package, artifact, rpm_info):
-        model = models.ErrataToALBSPackage(
-            status=ErrataPackageStatus.proposal,
-            name=rpm_info["name"],
-            version=rpm_info["version"],
-            release=rpm_info["release"],
-            epoch=int(rpm_info["epoch"]),
-            arch=rpm_info["arch"],
-        )
-        model.errata_package = errata_package
-        model.build_artifact = artifact
-        errata_package.albs_packages.append(model)
-
     rpms = [
         models.BuildTaskArtifact(
             build_task_id=task_id,
@@ -409,51 +620,10 @@ async def __process_rpms(
         )
         for href, _, artifact in processed_packages
     ]
-    rpms_info = get_rpm_packages_info(rpms)
+    rpms_info = await get_rpm_packages_info(rpms)
     for build_task_artifact in rpms:
-        rpm_info = rpms_info[build_task_artifact.href]
-        if rpm_info["arch"] != "src":
-            src_name = parse_rpm_nevra(rpm_info["rpm_sourcerpm"]).name
-        else:
-            src_name = rpm_info["name"]
-        clean_rpm_release = clean_release(rpm_info["release"])
-        conditions = [
-            models.ErrataPackage.name == rpm_info["name"],
-            models.ErrataPackage.version == rpm_info["version"],
-        ]
-        if rpm_info["arch"] != "noarch":
-            conditions.append(models.ErrataPackage.arch == rpm_info["arch"])
-
-        query = select(models.ErrataPackage).where(
-            sqlalchemy.and_(*conditions)
-        )
-
-        if module_index:
-            module = None
-            for mod in module_index.iter_modules():
-                if mod.name.endswith("-devel"):
-                    continue
-                module = mod
-            build_task_module = f"{module.name}:{module.stream}"
-            query = query.join(models.ErrataRecord).filter(
-                models.ErrataRecord.module == build_task_module
-            )
-
-        errata_packages = (await db.execute(query)).scalars().all()
-
-        # We add ErrataToALBSPackage proposals for every matching package.
-        # In case of an errata that involves a module, we only add those
-        # packages that belong to the right module:stream
-        for errata_package in errata_packages:
-            if clean_rpm_release != clean_release(errata_package.release):
-                continue
-            errata_package.source_srpm = src_name
-            await db.run_sync(
-                append_errata_package,
-                errata_package,
-                build_task_artifact,
-                rpm_info,
-            )
+        build_task_artifact.set_nevra(rpms_info[build_task_artifact.href])
+    await add_errata_packages_proposals(db, rpms, rpms_info, module_index)
 
     # we need to put source RPM in module as well, but it can be skipped
     # because it's built before
@@ -461,7 +631,7 @@ async def __process_rpms(
     if built_srpm_url is not None:
         db_srpm = await get_srpm_artifact_by_build_task_id(db, task_id)
         if db_srpm is not None:
-            srpms_info = get_rpm_packages_info([db_srpm])
+            srpms_info = await get_rpm_packages_info([db_srpm])
             module_artifacts.append(srpms_info[db_srpm.href])
     if module_index and module_artifacts:
         try:
@@ -952,6 +1122,8 @@ async def safe_build_done(
             ),
         )
         await db.execute(remove_dep_query)
+        # dependent tasks could become available for the build nodes
+        await db.execute(get_notify_query(get_build_topics()))
         await db.commit()
     logging.info("Build task: %d, processing is finished", request.task_id)
     return success
@@ -1,8 +1,14 @@
 import asyncio
 import collections
+import concurrent.futures
+import copy
 import datetime
+import json
 import logging
+import multiprocessing
+import os
 import re
+import types
 import uuid
 from contextlib import asynccontextmanager
 from typing import (
@@ -10,6 +16,7 @@ from typing import (
     Awaitable,
     DefaultDict,
     Dict,
+    Iterable,
     List,
     Optional,
     Tuple,
@@ -18,10 +25,13 @@ from typing import (
 
 import createrepo_c as cr
 import jinja2
+import sqlalchemy
 from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import Session, load_only, selectinload
-from sqlalchemy.sql.expression import func
+from sqlalchemy.sql.expression import ClauseElement, Executable, func
 
 from alws import models
 from alws.config import settings
@@ -39,6 +49,7 @@ from alws.pulp_models import (
 )
 from alws.schemas import errata_schema
 from alws.schemas.errata_schema import BaseErrataRecord
+from alws.utils.asyncio_utils import gather_with_concurrency
 from alws.utils.errata import (
     clean_errata_title,
     debrand_affected_cpe_list,
@@ -53,9 +64,9 @@ from alws.utils.errata import (
 from alws.utils.parsing import clean_release, parse_rpm_nevra
 from alws.utils.pulp_client import PulpClient
 from alws.utils.pulp_utils import (
-    get_rpm_module_packages_from_repository,
+    get_rpm_module_packages_by_repositories,
     get_rpm_packages_by_ids,
-    get_rpm_packages_from_repository,
+    get_rpm_packages_by_repositories,
     get_uuid_from_pulp_href,
 )
 
@@ -116,21 +127,42 @@ class CriteriaNode:
         return False
 
 
-async def get_oval_xml(db: AsyncSession, platform_name: str):
-    platform = await db.execute(
-        select(models.Platform).where(models.Platform.name == platform_name)
-    )
-    platform: models.Platform = platform.scalars().first()
-    records = (
+# Number of errata records rendered to OVAL fragments per query
+OVAL_FRAGMENTS_CHUNK_SIZE = 200
+# Number of errata records on the listing page
+ERRATA_PAGE_SIZE = 10
+# platform id -> (fragments state, OVAL document)
+_oval_xml_cache: Dict[int, Tuple[Tuple[int, datetime.datetime], str]] = {}
+UPDATEINFO_XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n<updates>\n'
+UPDATEINFO_XML_FOOTER = "</updates>\n"
+# Errata records per GET /errata/updateinfo/ request and per "id__in"
+# filter of Pulp advisories requests, so URLs stay below proxies limits
+UPDATEINFO_MAX_RECORDS = 100
+UPDATEINFO_PULP_IDS_CHUNK_SIZE = 50
+# Number of errata records with rendered updateinfo.xml kept in memory,
+# the least recently used ones are evicted first
+UPDATEINFO_XML_CACHE_SIZE = 2000
+# errata record id -> (Pulp advisories state, rendered <update> elements)
+_updateinfo_xml_cache: collections.OrderedDict[
+    str, Tuple[Tuple[Tuple[str, str, str], ...], str]
+] = collections.OrderedDict()
+
+
+async def get_oval_errata_records(
+    db: AsyncSession,
+    record_ids: List[str],
+) -> List[models.ErrataRecord]:
+    return (
         (
             await db.execute(
                 select(models.ErrataRecord)
-                .where(models.ErrataRecord.platform_id == platform.id)
+                .where(models.ErrataRecord.id.in_(record_ids))
+                .order_by(models.ErrataRecord.id)
                 .options(
-                    selectinload(models.ErrataRecord.packages)
-                    .selectinload(models.ErrataPackage.albs_packages)
-                    .selectinload(models.ErrataToALBSPackage.build_artifact)
-                    .selectinload(models.BuildTaskArtifact.build_task),
+                    selectinload(models.ErrataRecord.platform),
+                    selectinload(models.ErrataRecord.packages).selectinload(
+                        models.ErrataPackage.albs_packages
+                    ),
                     selectinload(models.ErrataRecord.references).selectinload(
                         models.ErrataReference.cve
                     ),
@@ -140,235 +172,554 @@ async def get_oval_xml(db: AsyncSession, platform_name: str):
         .scalars()
         .all()
     )
-    return errata_records_to_oval(records)
+
+
+async def store_oval_fragments(
+    db: AsyncSession,
+    records: List[Any],
+    fragments: List[Optional[Dict[str, Any]]],
+):
+    rendered_at = datetime.datetime.utcnow()
+    insert_query = insert(models.ErrataOvalFragment).values([
+        {
+            "errata_record_id": record.id,
+            "platform_id": record.platform_id,
+            "updated_date": record.updated_date,
+            "rendered_at": rendered_at,
+            "fragment": fragment,
+        }
+        for record, fragment in zip(records, fragments)
+    ])
+    await db.execute(
+        insert_query.on_conflict_do_update(
+            index_elements=[models.ErrataOvalFragment.errata_record_id],
+            set_={
+                "updated_date": insert_query.excluded.updated_date,
+                "rendered_at": insert_query.excluded.rendered_at,
+                "fragment": insert_query.excluded.fragment,
+            },
+        )
+    )
+
+
+async def refresh_oval_fragments(
+    db: AsyncSession,
+    platform: models.Platform,
+):
+    records = (
+        await db.execute(
+            select(
+                models.ErrataRecord.id,
+                models.ErrataRecord.updated_date,
+            ).where(models.ErrataRecord.platform_id == platform.id)
+        )
+    ).all()
+    rendered = dict(
+        (
+            await db.execute(
+                select(
+                    models.ErrataOvalFragment.errata_record_id,
+                    models.ErrataOvalFragment.updated_date,
+                ).where(models.ErrataOvalFragment.platform_id == platform.id)
+            )
+        ).all()
+    )
+    stale_ids = [
+        record_id
+        for record_id, updated_date in records
+        if rendered.get(record_id) != updated_date
+    ]
+    if not stale_ids:
+        return
+    logging.info(
+        "Rendering OVAL fragments for %d errata records of %s",
+        len(stale_ids),
+        platform.name,
+    )
+    for start in range(0, len(stale_ids), OVAL_FRAGMENTS_CHUNK_SIZE):
+        chunk = stale_ids[start : start + OVAL_FRAGMENTS_CHUNK_SIZE]
+        stale_records = await get_oval_errata_records(db, chunk)
+        if not stale_records:
+            continue
+        await store_oval_fragments(
+            db,
+            stale_records,
+            render_oval_fragments(stale_records),
+        )
+        await db.commit()
+
+
+def errata_record_to_oval_input(
+    record: models.ErrataRecord,
+) -> types.SimpleNamespace:
+    """
+    Copies the errata record attributes used by
+    errata_record_to_oval_fragment into plain objects,
+    so the record can be sent to another process.
+    """
+    return types.SimpleNamespace(
+        **{
+            column.key: getattr(record, column.key)
+            for column in models.ErrataRecord.__table__.columns
+            if column.key != "search_vector"
+        },
+        platform=types.SimpleNamespace(
+            distr_version=record.platform.distr_version,
+        ),
+        packages=[
+            types.SimpleNamespace(
+                epoch=pkg.epoch,
+                version=pkg.version,
+                release=pkg.release,
+                arch=pkg.arch,
+                albs_packages=[
+                    types.SimpleNamespace(
+                        name=albs_pkg.name,
+                        epoch=albs_pkg.epoch,
+                        version=albs_pkg.version,
+                        release=albs_pkg.release,
+                        arch=albs_pkg.arch,
+                        status=albs_pkg.status,
+                    )
+                    for albs_pkg in pkg.albs_packages
+                ],
+            )
+            for pkg in record.packages
+        ],
+        references=[
+            types.SimpleNamespace(
+                ref_id=ref.ref_id,
+                ref_type=ref.ref_type,
+                href=ref.href,
+                title=ref.title,
+                cve=(
+                    types.SimpleNamespace(
+                        public=ref.cve.public,
+                        impact=ref.cve.impact,
+                        cwe=ref.cve.cwe,
+                        cvss3=ref.cve.cvss3,
+                    )
+                    if ref.cve
+                    else None
+                ),
+            )
+            for ref in record.references
+        ],
+    )
+
+
+def render_oval_fragments(
+    records: List[Any],
+) -> List[Optional[Dict[str, Any]]]:
+    return [errata_record_to_oval_fragment(record) for record in records]
+
+
+async def regenerate_oval_fragments(
+    db: AsyncSession,
+    platform_names: Optional[List[str]] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = OVAL_FRAGMENTS_CHUNK_SIZE,
+) -> int:
+    """
+    Renders OVAL fragments of all errata records from scratch,
+    e.g. after changes in the debranding or in the rendering itself.
+
+    Chunks of records are rendered in a pool of processes while
+    the next chunks are loaded, and fragments are stored in the order
+    of record ids. OVAL ids come from the upstream definitions,
+    so the documents merged from these fragments don't depend
+    on the number of workers or on the order chunks are finished in.
+    Returns the number of rendered records.
+    """
+    query = select(models.Platform).where(
+        models.Platform.is_reference.is_(False)
+    )
+    if platform_names:
+        query = query.where(models.Platform.name.in_(platform_names))
+    platforms = (await db.execute(query)).scalars().all()
+    workers = workers or os.cpu_count()
+    loop = asyncio.get_running_loop()
+    rendered = 0
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as pool:
+        for platform in platforms:
+            record_ids = (
+                (
+                    await db.execute(
+                        select(models.ErrataRecord.id)
+                        .where(models.ErrataRecord.platform_id == platform.id)
+                        .order_by(models.ErrataRecord.id)
+                    )
+                )
+                .scalars()
+                .all()
+            )
+            logging.info(
+                "Regenerating OVAL fragments for %d errata records of %s",
+                len(record_ids),
+                platform.name,
+            )
+            pending = collections.deque()
+
+            async def store_next_chunk():
+                records, future = pending.popleft()
+                await store_oval_fragments(db, records, await future)
+                await db.commit()
+
+            for start in range(0, len(record_ids), chunk_size):
+                records = await get_oval_errata_records(
+                    db, record_ids[start : start + chunk_size]
+                )
+                pending.append((
+                    records,
+                    loop.run_in_executor(
+                        pool,
+                        render_oval_fragments,
+                        [errata_record_to_oval_input(rec) for rec in records],
+                    ),
+                ))
+                rendered += len(records)
+                # keep every worker busy without loading all records
+                if len(pending) > workers:
+                    await store_next_chunk()
+            while pending:
+                await store_next_chunk()
+    return rendered
+
+
+async def invalidate_oval_fragments(db: AsyncSession, record_ids: List[str]):
+    await db.execute(
+        delete(models.ErrataOvalFragment).where(
+            models.ErrataOvalFragment.errata_record_id.in_(record_ids)
+        )
+    )
+
+
+async def get_oval_xml(db: AsyncSession, platform_name: str) -> str:
+    platform = await db.execute(
+        select(models.Platform).where(models.Platform.name == platform_name)
+    )
+    platform: models.Platform = platform.scalars().first()
+    await refresh_oval_fragments(db, platform)
+    fragments_state = tuple(
+        (
+            await db.execute(
+                select(
+                    func.count(models.ErrataOvalFragment.errata_record_id),
+                    func.max(models.ErrataOvalFragment.rendered_at),
+                ).where(models.ErrataOvalFragment.platform_id == platform.id)
+            )
+        ).one()
+    )
+    cached = _oval_xml_cache.get(platform.id)
+    if cached and cached[0] == fragments_state:
+        return cached[1]
+    fragments = (
+        (
+            await db.execute(
+                select(models.ErrataOvalFragment.fragment)
+                .where(
+                    models.ErrataOvalFragment.platform_id == platform.id,
+                    models.ErrataOvalFragment.fragment.isnot(None),
+                )
+                .order_by(models.ErrataOvalFragment.errata_record_id)
+            )
+        )
+        .scalars()
+        .all()
+    )
+    oval_xml = await asyncio.to_thread(oval_fragments_to_xml, fragments)
+    _oval_xml_cache[platform.id] = (fragments_state, oval_xml)
+    return oval_xml
+
+
+def iter_oval_xml_json(oval_xml: str, chunk_size: int = 1024 * 1024):
+    # OVAL document is returned as a JSON string, it's encoded by chunks
+    # to avoid keeping one more copy of the whole document in memory
+    yield b'"'
+    for start in range(0, len(oval_xml), chunk_size):
+        chunk = oval_xml[start : start + chunk_size]
+        yield json.dumps(chunk)[1:-1].encode()
+    yield b'"'
 
 
 def errata_records_to_oval(records: List[models.ErrataRecord]):
-    oval = Composer()
-    generator = Generator(
-        product_name="AlmaLinux OS Errata System",
-        product_version="0.0.1",
-        schema_version="5.10",
-        timestamp=datetime.datetime.utcnow(),
+    return oval_fragments_to_xml(
+        errata_record_to_oval_fragment(record) for record in records
     )
-    oval.generator = generator
+
+
+def errata_record_to_oval_fragment(
+    record: models.ErrataRecord,
+) -> Optional[Dict[str, Any]]:
+    """
+    Renders OVAL entities of the errata record in JSON serializable form.
+    Tests, objects, states and variables aren't filtered here,
+    see oval_fragments_to_xml for the filtering by references
+    and deduplication across records.
+    """
     # TODO: add this info to platform
     gpg_keys = {
         "8": "51D6647EC21AD6EA",
         "9": "D36CB86CB86B3716",
     }
-    objects = set()
-    links_tracking = set()
     evra_regex = re.compile(r"(\d+):(.*)-(.*)")
-    for record in records:
-        is_freezed = record.freezed
-        rhel_evra_mapping = collections.defaultdict(dict)
-        rhel_name_mapping = collections.defaultdict(set)
-        for pkg in record.packages:
-            albs_pkgs = [
-                albs_pkg
-                for albs_pkg in pkg.albs_packages
-                if albs_pkg.status == ErrataPackageStatus.released
-            ]
-            for albs_pkg in albs_pkgs:
-                rhel_evra = f"{pkg.epoch}:{pkg.version}-{pkg.release}"
-                albs_evra = (
-                    f"{albs_pkg.epoch}:{albs_pkg.version}-{albs_pkg.release}"
+    is_freezed = record.freezed
+    rhel_evra_mapping = collections.defaultdict(dict)
+    rhel_name_mapping = collections.defaultdict(set)
+    for pkg in record.packages:
+        albs_pkgs = [
+            albs_pkg
+            for albs_pkg in pkg.albs_packages
+            if albs_pkg.status == ErrataPackageStatus.released
+        ]
+        for albs_pkg in albs_pkgs:
+            rhel_evra = f"{pkg.epoch}:{pkg.version}-{pkg.release}"
+            albs_evra = (
+                f"{albs_pkg.epoch}:{albs_pkg.version}-{albs_pkg.release}"
+            )
+            arch = albs_pkg.arch
+            if arch == "noarch":
+                arch = pkg.arch
+            rhel_evra_mapping[rhel_evra][arch] = albs_evra
+            rhel_name_mapping[rhel_evra].add(albs_pkg.name)
+    if not rhel_evra_mapping and not is_freezed:
+        return None
+    links = set()
+    original_criteria = copy.deepcopy(record.original_criteria)
+    criteria_list = original_criteria[:]
+    while criteria_list:
+        new_criteria_list = []
+        for criteria in criteria_list:
+            new_criteria_list.extend(criteria["criteria"])
+            criterion_list = []
+            criterion_refs = set()
+            for criterion in criteria["criterion"]:
+                criterion["ref"] = debrand_id(criterion["ref"])
+                if criterion["ref"] in criterion_refs:
+                    continue
+                criterion_refs.add(criterion["ref"])
+                if criterion["comment"] == "Red Hat CoreOS 4 is installed":
+                    continue
+                criterion["comment"] = debrand_comment(
+                    criterion["comment"], record.platform.distr_version
                 )
-                arch = albs_pkg.arch
-                if arch == "noarch":
-                    arch = pkg.arch
-                rhel_evra_mapping[rhel_evra][arch] = albs_evra
-                rhel_name_mapping[rhel_evra].add(albs_pkg.name)
-        if not rhel_evra_mapping and not is_freezed:
-            continue
-        criteria_list = record.original_criteria[:]
-        while criteria_list:
-            new_criteria_list = []
-            for criteria in criteria_list:
-                new_criteria_list.extend(criteria["criteria"])
+                if not is_freezed:
+                    evra = evra_regex.search(criterion["comment"])
+                    if evra:
+                        evra = evra.group()
+                        if evra not in rhel_evra_mapping.keys():
+                            continue
+                        package_name = criterion["comment"].split()[0]
+                        if package_name not in rhel_name_mapping[evra]:
+                            continue
+                        # TODO: Add test mapping here
+                        #       test_id: rhel_evra
+                        criterion["comment"] = criterion["comment"].replace(
+                            evra,
+                            rhel_evra_mapping[evra][
+                                next(iter(rhel_evra_mapping[evra].keys()))
+                            ],
+                        )
+                criterion_list.append(criterion)
+            if len(criterion_list) == 1 and re.search(
+                r"is signed with AlmaLinux OS",
+                criterion_list[0]["comment"],
+            ):
                 criterion_list = []
-                criterion_refs = set()
-                for criterion in criteria["criterion"]:
-                    criterion["ref"] = debrand_id(criterion["ref"])
-                    if criterion["ref"] in criterion_refs:
-                        continue
-                    criterion_refs.add(criterion["ref"])
-                    if criterion["comment"] == "Red Hat CoreOS 4 is installed":
-                        continue
-                    criterion["comment"] = debrand_comment(
-                        criterion["comment"], record.platform.distr_version
-                    )
-                    if not is_freezed:
-                        evra = evra_regex.search(criterion["comment"])
-                        if evra:
-                            evra = evra.group()
-                            if evra not in rhel_evra_mapping.keys():
-                                continue
-                            package_name = criterion["comment"].split()[0]
-                            if package_name not in rhel_name_mapping[evra]:
-                                continue
-                            # TODO: Add test mapping here
-                            #       test_id: rhel_evra
-                            criterion["comment"] = criterion[
-                                "comment"
-                            ].replace(
-                                evra,
-                                rhel_evra_mapping[evra][
-                                    next(iter(rhel_evra_mapping[evra].keys()))
-                                ],
-                            )
-                    criterion_list.append(criterion)
-                if len(criterion_list) == 1 and re.search(
-                    r"is signed with AlmaLinux OS",
-                    criterion_list[0]["comment"],
-                ):
-                    criterion_list = []
-                criteria["criterion"] = criterion_list
-                links_tracking.update(
-                    criterion["ref"] for criterion in criterion_list
-                )
-            criteria_list = new_criteria_list
-        for criteria in record.original_criteria:
-            criteria_node = CriteriaNode(criteria, None)
-            criteria_node.simplify()
-        if record.oval_title:
-            title = record.oval_title
-        elif not record.oval_title and record.title:
-            title = record.title
-        else:
-            title = record.original_title
-        definition = Definition.from_dict({
-            "id": debrand_id(record.definition_id),
-            "version": record.definition_version,
-            "class": record.definition_class,
-            "metadata": {
-                "title": title,
-                "description": (
-                    record.description
-                    if record.description
-                    else record.original_description
+            criteria["criterion"] = criterion_list
+            links.update(criterion["ref"] for criterion in criterion_list)
+        criteria_list = new_criteria_list
+    for criteria in original_criteria:
+        criteria_node = CriteriaNode(criteria, None)
+        criteria_node.simplify()
+    if record.oval_title:
+        title = record.oval_title
+    elif not record.oval_title and record.title:
+        title = record.title
+    else:
+        title = record.original_title
+    definition = {
+        "id": debrand_id(record.definition_id),
+        "version": record.definition_version,
+        "class": record.definition_class,
+        "metadata": {
+            "title": title,
+            "description": (
+                record.description
+                if record.description
+                else record.original_description
+            ),
+            "advisory": {
+                "from": record.contact_mail,
+                "severity": record.severity,
+                "rights": record.rights,
+                "issued_date": record.issued_date.isoformat(),
+                "updated_date": record.updated_date.isoformat(),
+                "affected_cpe_list": debrand_affected_cpe_list(
+                    record.affected_cpe, record.platform.distr_version
                 ),
-                "advisory": {
-                    "from": record.contact_mail,
-                    "severity": record.severity,
-                    "rights": record.rights,
-                    "issued_date": record.issued_date,
-                    "updated_date": record.updated_date,
-                    "affected_cpe_list": debrand_affected_cpe_list(
-                        record.affected_cpe, record.platform.distr_version
-                    ),
-                    "bugzilla": [
-                        {
-                            "id": ref.ref_id,
-                            "href": ref.href,
-                            "title": ref.title,
-                        }
-                        for ref in record.references
-                        if ref.ref_type == ErrataReferenceType.bugzilla
-                    ],
-                    "cves": [
-                        {
-                            "name": ref.ref_id,
-                            "public": datetime.datetime.strptime(
-                                # year-month-day
-                                ref.cve.public[:10],
-                                "%Y-%m-%d",
-                            ).date(),
-                            "href": ref.href,
-                            "impact": ref.cve.impact,
-                            "cwe": ref.cve.cwe,
-                            "cvss3": ref.cve.cvss3,
-                        }
-                        for ref in record.references
-                        if ref.ref_type == ErrataReferenceType.cve and ref.cve
-                    ],
-                },
-                "references": [
-                    debrand_reference(
-                        {
-                            "id": ref.ref_id,
-                            "source": ref.ref_type.value.upper(),
-                            "url": ref.href,
-                        },
-                        record.platform.distr_version,
-                    )
+                "bugzilla": [
+                    {
+                        "id": ref.ref_id,
+                        "href": ref.href,
+                        "title": ref.title,
+                    }
                     for ref in record.references
-                    if ref.ref_type
-                    not in [
-                        ErrataReferenceType.bugzilla,
-                    ]
+                    if ref.ref_type == ErrataReferenceType.bugzilla
+                ],
+                "cves": [
+                    {
+                        "name": ref.ref_id,
+                        "public": datetime.datetime.strptime(
+                            # year-month-day
+                            ref.cve.public[:10],
+                            "%Y-%m-%d",
+                        )
+                        .date()
+                        .isoformat(),
+                        "href": ref.href,
+                        "impact": ref.cve.impact,
+                        "cwe": ref.cve.cwe,
+                        "cvss3": ref.cve.cvss3,
+                    }
+                    for ref in record.references
+                    if ref.ref_type == ErrataReferenceType.cve and ref.cve
                 ],
             },
-            "criteria": record.original_criteria,
-        })
-        oval.append_object(definition)
-        for test in record.original_tests:
-            test["id"] = debrand_id(test["id"])
+            "references": [
+                debrand_reference(
+                    {
+                        "id": ref.ref_id,
+                        "source": ref.ref_type.value.upper(),
+                        "url": ref.href,
+                    },
+                    record.platform.distr_version,
+                )
+                for ref in record.references
+                if ref.ref_type
+                not in [
+                    ErrataReferenceType.bugzilla,
+                ]
+            ],
+        },
+        "criteria": original_criteria,
+    }
+    tests = []
+    for test in copy.deepcopy(record.original_tests):
+        test["id"] = debrand_id(test["id"])
+        if get_test_cls_by_tag(test["type"]) in (
+            RpminfoTest,
+            RpmverifyfileTest,
+        ):
+            test["comment"] = debrand_comment(
+                test["comment"], record.platform.distr_version
+            )
+        test["object_ref"] = debrand_id(test["object_ref"])
+        if test.get("state_ref"):
+            test["state_ref"] = debrand_id(test["state_ref"])
+        tests.append(test)
+    objects = []
+    for obj in copy.deepcopy(record.original_objects):
+        obj["id"] = debrand_id(obj["id"])
+        if obj.get("instance_var_ref"):
+            obj["instance_var_ref"] = debrand_id(obj["instance_var_ref"])
+        if get_object_cls_by_tag(obj["type"]) == RpmverifyfileObject:
+            if obj["filepath"] == "/etc/redhat-release":
+                obj["filepath"] = "/etc/almalinux-release"
+        objects.append(obj)
+    states = []
+    for state in copy.deepcopy(record.original_states):
+        state["id"] = debrand_id(state["id"])
+        if state.get("evr"):
+            if state["evr"] in rhel_evra_mapping:
+                if state["arch"]:
+                    state["arch"] = "|".join(
+                        rhel_evra_mapping[state["evr"]].keys()
+                    )
+                state["evr"] = rhel_evra_mapping[state["evr"]][
+                    next(iter(rhel_evra_mapping[state["evr"]].keys()))
+                ]
+        state_cls = get_state_cls_by_tag(state["type"])
+        if state_cls == RpminfoState:
+            if not is_freezed:
+                if state["signature_keyid"]:
+                    state["signature_keyid"] = gpg_keys[
+                        record.platform.distr_version
+                    ].lower()
+        elif state_cls == RpmverifyfileState:
+            if state["name"] == "^redhat-release":
+                state["name"] = "^almalinux-release"
+        states.append(state)
+    variables = []
+    for var in copy.deepcopy(record.original_variables):
+        var["id"] = debrand_id(var["id"])
+        variables.append(var)
+    return {
+        "definition": definition,
+        "links": sorted(links),
+        "tests": tests,
+        "objects": objects,
+        "states": states,
+        "variables": variables,
+    }
+
+
+def oval_fragments_to_xml(fragments: Iterable[Optional[Dict[str, Any]]]):
+    oval = Composer()
+    generator = Generator(
+        product_name="AlmaLinux OS Errata System",
+        product_version="0.0.1",
+        schema_version="5.10",
+        timestamp=datetime.datetime.utcnow(),
+    )
+    oval.generator = generator
+    objects = set()
+    links_tracking = set()
+    for fragment in fragments:
+        if not fragment:
+            continue
+        links_tracking.update(fragment["links"])
+        definition = fragment["definition"]
+        advisory = definition["metadata"]["advisory"]
+        for key in ("issued_date", "updated_date"):
+            advisory[key] = datetime.datetime.fromisoformat(advisory[key])
+        for cve in advisory["cves"]:
+            cve["public"] = datetime.date.fromisoformat(cve["public"])
+        oval.append_object(Definition.from_dict(definition))
+        for test in fragment["tests"]:
             if test["id"] in objects:
                 continue
             if test["id"] not in links_tracking:
                 continue
             objects.add(test["id"])
-            if get_test_cls_by_tag(test["type"]) in (
-                RpminfoTest,
-                RpmverifyfileTest,
-            ):
-                test["comment"] = debrand_comment(
-                    test["comment"], record.platform.distr_version
-                )
-            test["object_ref"] = debrand_id(test["object_ref"])
-            if test.get("state_ref"):
-                test["state_ref"] = debrand_id(test["state_ref"])
-            links_tracking.update([test["object_ref"], test["state_ref"]])
+            links_tracking.update([test["object_ref"], test.get("state_ref")])
             oval.append_object(
                 get_test_cls_by_tag(test["type"]).from_dict(test)
             )
-        for obj in record.original_objects:
-            obj["id"] = debrand_id(obj["id"])
+        for obj in fragment["objects"]:
             if obj["id"] in objects:
                 continue
             if obj["id"] not in links_tracking:
                 continue
             objects.add(obj["id"])
             if obj.get("instance_var_ref"):
-                obj["instance_var_ref"] = debrand_id(obj["instance_var_ref"])
                 links_tracking.add(obj["instance_var_ref"])
-            if get_object_cls_by_tag(obj["type"]) == RpmverifyfileObject:
-                if obj["filepath"] == "/etc/redhat-release":
-                    obj["filepath"] = "/etc/almalinux-release"
             oval.append_object(
                 get_object_cls_by_tag(obj["type"]).from_dict(obj)
             )
-        for state in record.original_states:
-            state["id"] = debrand_id(state["id"])
+        for state in fragment["states"]:
             if state["id"] in objects:
                 continue
             if state["id"] not in links_tracking:
                 continue
-            if state.get("evr"):
-                if state["evr"] in rhel_evra_mapping:
-                    if state["arch"]:
-                        state["arch"] = "|".join(
-                            rhel_evra_mapping[state["evr"]].keys()
-                        )
-                    state["evr"] = rhel_evra_mapping[state["evr"]][
-                        next(iter(rhel_evra_mapping[state["evr"]].keys()))
-                    ]
             objects.add(state["id"])
-            state_cls = get_state_cls_by_tag(state["type"])
-            if state_cls == RpminfoState:
-                if not is_freezed:
-                    if state["signature_keyid"]:
-                        state["signature_keyid"] = gpg_keys[
-                            record.platform.distr_version
-                        ].lower()
-            elif state_cls == RpmverifyfileState:
-                if state["name"] == "^redhat-release":
-                    state["name"] = "^almalinux-release"
-            oval.append_object(state_cls.from_dict(state))
-        for var in record.original_variables:
-            var["id"] = debrand_id(var["id"])
+            oval.append_object(
+                get_state_cls_by_tag(state["type"]).from_dict(state)
+            )
+        for var in fragment["variables"]:
             if var["id"] in objects:
                 continue
             if var["id"] not in links_tracking:
@@ -377,7 +728,7 @@ def errata_records_to_oval(records: List[models.ErrataRecord]):
             oval.append_object(
                 get_variable_cls_by_tag(var["type"]).from_dict(var)
             )
-            for obj in record.original_objects:
+            for obj in fragment["objects"]:
                 if (
                     obj["id"]
                     != var["arithmetic"]["object_component"]["object_ref"]
@@ -394,9 +745,17 @@ def errata_records_to_oval(records: List[models.ErrataRecord]):
 
 def prepare_search_params(
     errata_record: Union[models.ErrataRecord, BaseErrataRecord],
+) -> DefaultDict[str, List[str]]:
+    return prepare_packages_search_params(errata_record.packages)
+
+
+def prepare_packages_search_params(
+    packages: Iterable[
+        Union[models.ErrataPackage, errata_schema.BaseErrataPackage]
+    ],
 ) -> DefaultDict[str, List[str]]:
     search_params = collections.defaultdict(list)
-    for package in errata_record.packages:
+    for package in packages:
         for attr in ("name", "version", "epoch"):
             value = str(getattr(package, attr))
             if value in search_params[attr]:
@@ -412,55 +771,55 @@ async def load_platform_packages(
     module: Optional[str] = None,
 ) -> Dict[str, Any]:
     cache = {}
-    for repo in platform.repos:
-        if not repo.production:
-            continue
-
-        repo_id = get_uuid_from_pulp_href(repo.pulp_href)
-        if module:
-            pkgs = get_rpm_module_packages_from_repository(
-                repo_id=repo_id,
-                module=module,
-                pkg_names=search_params["name"],
-                pkg_versions=search_params["version"],
-                pkg_epochs=search_params["epoch"],
-            )
-        else:
-            pkgs = get_rpm_packages_from_repository(
-                repo_id=repo_id,
-                pkg_names=search_params["name"],
-                pkg_versions=search_params["version"],
-                pkg_epochs=search_params["epoch"],
-            )
-
-        if not pkgs:
+    repo_hrefs = {
+        get_uuid_from_pulp_href(repo.pulp_href): repo.pulp_href
+        for repo in platform.repos
+        if repo.production
+    }
+    if not repo_hrefs:
+        return cache
+    if module:
+        pkgs = await get_rpm_module_packages_by_repositories(
+            repo_ids=list(repo_hrefs),
+            module=module,
+            pkg_names=search_params["name"],
+            pkg_versions=search_params["version"],
+            pkg_epochs=search_params["epoch"],
+        )
+    else:
+        pkgs = await get_rpm_packages_by_repositories(
+            repo_ids=list(repo_hrefs),
+            pkg_names=search_params["name"],
+            pkg_versions=search_params["version"],
+            pkg_epochs=search_params["epoch"],
+        )
+    # keep the platform repositories order in the cache values
+    repos_order = {repo_id: index for index, repo_id in enumerate(repo_hrefs)}
+    pkgs.sort(key=lambda item: repos_order[item[1]])
+
+    if for_release:
+        for pkg, repo_id in pkgs:
+            cache.setdefault(pkg.pulp_href, []).append(repo_hrefs[repo_id])
+        return cache
+
+    added_pkgs = set()
+    for pkg, _ in pkgs:
+        if pkg.content_ptr_id in added_pkgs:
             continue
-
-        for pkg in pkgs:
-            if for_release:
-                key = pkg.pulp_href
-                if not cache.get(key):
-                    cache[key] = []
-                cache[key].append(repo.pulp_href)
-                continue
-            short_pkg_name = "-".join(
-                (
-                    pkg.name,
-                    pkg.version,
-                    clean_release(pkg.release),
-                )
+        added_pkgs.add(pkg.content_ptr_id)
+        short_pkg_name = "-".join(
+            (
+                pkg.name,
+                pkg.version,
+                clean_release(pkg.release),
             )
-            if not cache.get(short_pkg_name):
-                cache[short_pkg_name] = {}
-            arch_list = [pkg.arch]
-            if pkg.arch == "noarch":
-                arch_list = platform.arch_list
-            for arch in arch_list:
-                if not cache[short_pkg_name].get(arch):
-                    cache[short_pkg_name][arch] = []
-                if pkg in cache[short_pkg_name][arch]:
-                    continue
-                cache[short_pkg_name][arch].append(pkg)
+        )
+        arch_list = [pkg.arch]
+        if pkg.arch == "noarch":
+            arch_list = platform.arch_list
+        pkgs_by_arch = cache.setdefault(short_pkg_name, {})
+        for arch in arch_list:
+            pkgs_by_arch.setdefault(arch, []).append(pkg)
     return cache
 
 
@@ -483,6 +842,8 @@ async def update_errata_record(
             record.description = None
         else:
             record.description = update_record.description
+    await invalidate_oval_fragments(db, [record.id])
+    invalidate_updateinfo_xml([record.id])
     await db.commit()
     await db.refresh(record)
     return record
@@ -490,52 +851,88 @@ async def update_errata_record(
 
 async def get_matching_albs_packages(
     db: AsyncSession,
-    errata_package: models.ErrataPackage,
+    errata_packages: List[models.ErrataPackage],
     prod_repos_cache,
     module,
 ) -> List[models.ErrataToALBSPackage]:
     items_to_insert = []
-    # We're going to check packages that match name-version-clean_release
-    # Note that clean_release doesn't include the .module... str, we match:
-    #   - my-pkg-2.0-2
-    #   - my-pkg-2.0-20191233git
-    #   - etc
-    clean_package_name = "-".join(
-        (
+    # errata packages without production packages, by their
+    # (name, version, clean_release)
+    albs_search = collections.defaultdict(list)
+    for errata_package in errata_packages:
+        # We're going to check packages that match name-version-clean_release
+        # Note that clean_release doesn't include the .module... str,
+        # we match:
+        #   - my-pkg-2.0-2
+        #   - my-pkg-2.0-20191233git
+        #   - etc
+        clean_package_release = clean_release(errata_package.release)
+        clean_package_name = "-".join(
+            (
+                errata_package.name,
+                errata_package.version,
+                clean_package_release,
+            )
+        )
+        # We add ErrataToALBSPackage if we find a matching package already
+        # in production repositories.
+        prod_packages = prod_repos_cache.get(clean_package_name, {}).get(
+            errata_package.arch, []
+        )
+        if prod_packages:
+            prod_package = prod_packages[0]
+            mapping = models.ErrataToALBSPackage(
+                pulp_href=prod_package.pulp_href,
+                status=ErrataPackageStatus.released,
+                name=prod_package.name,
+                version=prod_package.version,
+                release=prod_package.release,
+                epoch=int(prod_package.epoch),
+                arch=prod_package.arch,
+            )
+            src_nevra = parse_rpm_nevra(prod_package.rpm_sourcerpm)
+            errata_package.source_srpm = src_nevra.name
+            items_to_insert.append(mapping)
+            errata_package.albs_packages.append(mapping)
+            continue
+        search_key = (
             errata_package.name,
             errata_package.version,
-            clean_release(errata_package.release),
+            clean_package_release,
         )
-    )
-    # We add ErrataToALBSPackage if we find a matching package already
-    # in production repositories.
-    for prod_package in prod_repos_cache.get(clean_package_name, {}).get(
-        errata_package.arch, []
-    ):
-        mapping = models.ErrataToALBSPackage(
-            pulp_href=prod_package.pulp_href,
-            status=ErrataPackageStatus.released,
-            name=prod_package.name,
-            version=prod_package.version,
-            release=prod_package.release,
-            epoch=int(prod_package.epoch),
-            arch=prod_package.arch,
-        )
-        src_nevra = parse_rpm_nevra(prod_package.rpm_sourcerpm)
-        errata_package.source_srpm = src_nevra.name
-        items_to_insert.append(mapping)
-        errata_package.albs_packages.append(mapping)
+        albs_search[search_key].append(errata_package)
+
+    if not albs_search:
         return items_to_insert
 
     # If we couldn't find any pkg in production repos
-    # we'll look for every package that matches name-version
+    # we'll look for every package that matches name-version-clean_release
     # inside the ALBS, this is, build_task_artifacts.
-    name_query = f"{errata_package.name}-{errata_package.version}"
-
-    query = select(models.BuildTaskArtifact).where(
-        and_(
+    nevras = sqlalchemy.values(
+        sqlalchemy.column("name", sqlalchemy.Text),
+        sqlalchemy.column("version", sqlalchemy.Text),
+        sqlalchemy.column("clean_release", sqlalchemy.Text),
+        name="errata_nevras",
+    ).data(list(albs_search))
+    arches = {
+        errata_package.arch
+        for errata_packages in albs_search.values()
+        for errata_package in errata_packages
+    }
+    query = (
+        select(models.BuildTaskArtifact)
+        .join(
+            nevras,
+            and_(
+                models.BuildTaskArtifact.rpm_name == nevras.c.name,
+                models.BuildTaskArtifact.rpm_version == nevras.c.version,
+                models.BuildTaskArtifact.rpm_clean_release
+                == nevras.c.clean_release,
+            ),
+        )
+        .where(
             models.BuildTaskArtifact.type == "rpm",
-            models.BuildTaskArtifact.name.startswith(name_query),
+            models.BuildTaskArtifact.rpm_arch.in_(arches | {"noarch"}),
         )
     )
     # If the errata record references a module, then we'll get
@@ -552,6 +949,8 @@ async def get_matching_albs_packages(
         )
 
     result = (await db.execute(query)).scalars().all()
+    if not result:
+        return items_to_insert
 
     pulp_pkg_ids = [get_uuid_from_pulp_href(pkg.href) for pkg in result]
     pkg_fields = [
@@ -563,49 +962,43 @@ async def get_matching_albs_packages(
         RpmPackage.arch,
         RpmPackage.rpm_sourcerpm,
     ]
-    pulp_pkgs = get_rpm_packages_by_ids(pulp_pkg_ids, pkg_fields)
+    pulp_pkgs = await get_rpm_packages_by_ids(pulp_pkg_ids, pkg_fields)
     for package in result:
         pulp_rpm_package = pulp_pkgs.get(package.href)
         if not pulp_rpm_package:
             continue
-        clean_pulp_package_name = "-".join(
+        matching_errata_packages = albs_search.get(
             (
                 pulp_rpm_package.name,
                 pulp_rpm_package.version,
                 clean_release(pulp_rpm_package.release),
-            )
-        )
-        if (
-            pulp_rpm_package.arch not in (errata_package.arch, "noarch")
-            or clean_pulp_package_name != clean_package_name
-        ):
-            continue
-        mapping = models.ErrataToALBSPackage(
-            albs_artifact_id=package.id,
-            status=ErrataPackageStatus.proposal,
-            name=pulp_rpm_package.name,
-            version=pulp_rpm_package.version,
-            release=pulp_rpm_package.release,
-            epoch=int(pulp_rpm_package.epoch),
-            arch=pulp_rpm_package.arch,
+            ),
+            [],
         )
-        if errata_package.source_srpm is None:
-            nevra = parse_rpm_nevra(pulp_rpm_package.rpm_sourcerpm)
-            errata_package.source_srpm = nevra.name
-        items_to_insert.append(mapping)
-        errata_package.albs_packages.append(mapping)
+        for errata_package in matching_errata_packages:
+            if pulp_rpm_package.arch not in (errata_package.arch, "noarch"):
+                continue
+            mapping = models.ErrataToALBSPackage(
+                albs_artifact_id=package.id,
+                status=ErrataPackageStatus.proposal,
+                name=pulp_rpm_package.name,
+                version=pulp_rpm_package.version,
+                release=pulp_rpm_package.release,
+                epoch=int(pulp_rpm_package.epoch),
+                arch=pulp_rpm_package.arch,
+            )
+            if errata_package.source_srpm is None:
+                nevra = parse_rpm_nevra(pulp_rpm_package.rpm_sourcerpm)
+                errata_package.source_srpm = nevra.name
+            items_to_insert.append(mapping)
+            errata_package.albs_packages.append(mapping)
     return items_to_insert
 
 
-async def create_errata_record(db: AsyncSession, errata: BaseErrataRecord):
-    platform = await db.execute(
-        select(models.Platform)
-        .where(models.Platform.id == errata.platform_id)
-        .options(selectinload(models.Platform.repos))
-    )
-    platform = platform.scalars().first()
-    items_to_insert = []
-
+def get_errata_record_values(
+    errata: BaseErrataRecord,
+    platform: models.Platform,
+) -> Dict[str, Any]:
     # Rebranding RHEL -> AlmaLinux
     for key in ("description", "title"):
         setattr(
@@ -620,45 +1013,61 @@ async def create_errata_record(db: AsyncSession, errata: BaseErrataRecord):
     match = r.findall(str(errata.criteria))
     errata_module = None if not match else match[0]
 
-    # Errata db record
-    db_errata = models.ErrataRecord(
-        id=alma_errata_id,
-        freezed=errata.freezed,
-        platform_id=errata.platform_id,
-        module=errata_module,
-        release_status=ErrataReleaseStatus.NOT_RELEASED,
-        summary=None,
-        solution=None,
-        issued_date=errata.issued_date,
-        updated_date=errata.updated_date,
-        description=None,
-        original_description=errata.description,
-        title=None,
-        oval_title=get_oval_title(
+    return {
+        "id": alma_errata_id,
+        "freezed": errata.freezed,
+        "platform_id": errata.platform_id,
+        "module": errata_module,
+        "release_status": ErrataReleaseStatus.NOT_RELEASED,
+        "summary": None,
+        "solution": None,
+        "issued_date": errata.issued_date,
+        "updated_date": errata.updated_date,
+        "description": None,
+        "original_description": errata.description,
+        "title": None,
+        "oval_title": get_oval_title(
             errata.title, alma_errata_id, errata.severity
         ),
-        original_title=get_verbose_errata_title(errata.title, errata.severity),
-        contact_mail=platform.contact_mail,
-        status=errata.status,
-        version=errata.version,
-        severity=errata.severity,
-        rights=jinja2.Template(platform.copyright).render(
+        "original_title": get_verbose_errata_title(
+            errata.title, errata.severity
+        ),
+        "contact_mail": platform.contact_mail,
+        "status": errata.status,
+        "version": errata.version,
+        "severity": errata.severity,
+        "rights": jinja2.Template(platform.copyright).render(
             year=datetime.datetime.utcnow().year
         ),
-        definition_id=errata.definition_id,
-        definition_version=errata.definition_version,
-        definition_class=errata.definition_class,
-        affected_cpe=errata.affected_cpe,
-        criteria=None,
-        original_criteria=errata.criteria,
-        tests=None,
-        original_tests=errata.tests,
-        objects=None,
-        original_objects=errata.objects,
-        states=None,
-        original_states=errata.states,
-        variables=None,
-        original_variables=errata.variables,
+        "definition_id": errata.definition_id,
+        "definition_version": errata.definition_version,
+        "definition_class": errata.definition_class,
+        "affected_cpe": errata.affected_cpe,
+        "criteria": None,
+        "original_criteria": errata.criteria,
+        "tests": None,
+        "original_tests": errata.tests,
+        "objects": None,
+        "original_objects": errata.objects,
+        "states": None,
+        "original_states": errata.states,
+        "variables": None,
+        "original_variables": errata.variables,
+    }
+
+
+async def create_errata_record(db: AsyncSession, errata: BaseErrataRecord):
+    platform = await db.execute(
+        select(models.Platform)
+        .where(models.Platform.id == errata.platform_id)
+        .options(selectinload(models.Platform.repos))
+    )
+    platform = platform.scalars().first()
+    items_to_insert = []
+
+    # Errata db record
+    db_errata = models.ErrataRecord(
+        **get_errata_record_values(errata, platform)
     )
     items_to_insert.append(db_errata)
 
@@ -722,6 +1131,7 @@ async def create_errata_record(db: AsyncSession, errata: BaseErrataRecord):
         False,
         db_errata.module,
     )
+    db_packages = []
     for package in errata.packages:
         db_package = models.ErrataPackage(
             name=package.name,
@@ -733,13 +1143,14 @@ async def create_errata_record(db: AsyncSession, errata: BaseErrataRecord):
             reboot_suggested=False,
         )
         db_errata.packages.append(db_package)
-        items_to_insert.append(db_package)
-        # Create ErrataToAlbsPackages
-        items_to_insert.extend(
-            await get_matching_albs_packages(
-                db, db_package, prod_repos_cache, db_errata.module
-            )
+        db_packages.append(db_package)
+    items_to_insert.extend(db_packages)
+    # Create ErrataToAlbsPackages
+    items_to_insert.extend(
+        await get_matching_albs_packages(
+            db, db_packages, prod_repos_cache, db_errata.module
         )
+    )
 
     db.add_all(items_to_insert)
     await db.commit()
@@ -747,6 +1158,278 @@ async def create_errata_record(db: AsyncSession, errata: BaseErrataRecord):
     return db_errata
 
 
+# Upstream fields of errata records updated by the bulk import
+ERRATA_UPSERT_FIELDS = (
+    "module",
+    "issued_date",
+    "updated_date",
+    "original_description",
+    "oval_title",
+    "original_title",
+    "status",
+    "version",
+    "severity",
+    "definition_id",
+    "definition_version",
+    "definition_class",
+    "affected_cpe",
+    "original_criteria",
+    "original_tests",
+    "original_objects",
+    "original_states",
+    "original_variables",
+)
+
+
+def get_errata_references_values(
+    errata: BaseErrataRecord,
+    record_id: str,
+    platform: models.Platform,
+) -> List[Dict[str, Any]]:
+    references = []
+    self_ref_exists = False
+    for ref in errata.references:
+        ref_type = ErrataReferenceType(ref.ref_type)
+        ref_title = ""
+        if ref_type in (ErrataReferenceType.cve, ErrataReferenceType.rhsa):
+            ref_title = ref.ref_id
+        if ref_type == ErrataReferenceType.self_ref:
+            self_ref_exists = True
+        references.append({
+            "href": ref.href,
+            "ref_id": ref.ref_id,
+            "ref_type": ref_type,
+            "title": ref_title,
+            "cve_id": ref.cve.id if ref.cve else None,
+            "errata_record_id": record_id,
+        })
+    if not self_ref_exists:
+        html_id = record_id.replace(":", "-")
+        references.append({
+            "href": (
+                "https://errata.almalinux.org/"
+                f"{platform.distr_version}/{html_id}.html"
+            ),
+            "ref_id": record_id,
+            "ref_type": ErrataReferenceType.self_ref,
+            "title": record_id,
+            "cve_id": None,
+            "errata_record_id": record_id,
+        })
+    return references
+
+
+async def bulk_create_errata_records(
+    db: AsyncSession,
+    records: List[BaseErrataRecord],
+    upsert: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Creates many errata records in one transaction.
+
+    Production packages are loaded once for all records of the same
+    platform and module, errata packages are matched against them
+    and build artifacts together, and the rows are inserted with
+    executemany. With upsert enabled, already existing records with
+    the older updated_date get new upstream fields, their packages
+    and references are left as is.
+    Returns the result of every record in the order of the request.
+    """
+    platforms = {
+        platform.id: platform
+        for platform in (
+            await db.execute(
+                select(models.Platform)
+                .where(
+                    models.Platform.id.in_(
+                        {record.platform_id for record in records}
+                    )
+                )
+                .options(selectinload(models.Platform.repos))
+            )
+        )
+        .scalars()
+        .all()
+    }
+    results = []
+    records_values = {}
+    new_records = {}
+    for errata in records:
+        platform = platforms.get(errata.platform_id)
+        if platform is None:
+            results.append({
+                "id": errata.id,
+                "action": "skipped",
+                "error": f"Unknown platform: {errata.platform_id}",
+            })
+            continue
+        values = get_errata_record_values(errata, platform)
+        result = {"id": values["id"], "action": "created", "error": None}
+        if values["id"] in records_values:
+            result.update(
+                action="skipped",
+                error="Errata record is duplicated in the request",
+            )
+        else:
+            records_values[values["id"]] = values
+            new_records[values["id"]] = (errata, platform)
+        results.append(result)
+
+    existing_records = dict(
+        (
+            await db.execute(
+                select(
+                    models.ErrataRecord.id,
+                    models.ErrataRecord.updated_date,
+                ).where(models.ErrataRecord.id.in_(list(records_values)))
+            )
+        ).all()
+    )
+    updated_ids = []
+    for record_id, updated_date in existing_records.items():
+        new_records.pop(record_id)
+        new_updated_date = records_values[record_id]["updated_date"]
+        if upsert and new_updated_date > updated_date.date():
+            updated_ids.append(record_id)
+    for result in results:
+        if result["error"] or result["id"] not in existing_records:
+            continue
+        if result["id"] in updated_ids:
+            result["action"] = "updated"
+            continue
+        result["action"] = "skipped"
+        if not upsert:
+            result["error"] = "Errata record already exists"
+
+    if updated_ids:
+        errata_records = models.ErrataRecord.__table__
+        await db.execute(
+            update(errata_records)
+            .where(errata_records.c.id == sqlalchemy.bindparam("record_id"))
+            .values({
+                field: sqlalchemy.bindparam(field)
+                for field in ERRATA_UPSERT_FIELDS
+            }),
+            [
+                {
+                    "record_id": record_id,
+                    **{
+                        field: records_values[record_id][field]
+                        for field in ERRATA_UPSERT_FIELDS
+                    },
+                }
+                for record_id in updated_ids
+            ],
+        )
+        await invalidate_oval_fragments(db, updated_ids)
+        invalidate_updateinfo_xml(updated_ids)
+
+    if not new_records:
+        await db.commit()
+        return results
+
+    cves = {}
+    references = []
+    errata_packages = collections.defaultdict(list)
+    for record_id, (errata, platform) in new_records.items():
+        for ref in errata.references:
+            if ref.cve:
+                cves[ref.cve.id] = ref.cve.model_dump()
+        references.extend(
+            get_errata_references_values(errata, record_id, platform)
+        )
+        for package in errata.packages:
+            errata_packages[
+                (platform.id, records_values[record_id]["module"])
+            ].append(
+                models.ErrataPackage(
+                    errata_record_id=record_id,
+                    name=package.name,
+                    version=package.version,
+                    release=package.release,
+                    epoch=package.epoch,
+                    arch=package.arch,
+                    source_srpm=None,
+                    reboot_suggested=False,
+                )
+            )
+
+    # Ids of errata packages are allocated in advance,
+    # so the matched ALBS packages can refer to them
+    packages_count = sum(len(pkgs) for pkgs in errata_packages.values())
+    packages_ids = iter(
+        (
+            await db.execute(
+                select(
+                    func.nextval(
+                        f"{models.ErrataPackage.__tablename__}_id_seq"
+                    )
+                ).select_from(func.generate_series(1, packages_count))
+            )
+        )
+        .scalars()
+        .all()
+    )
+    albs_packages = []
+    for (platform_id, module), packages in errata_packages.items():
+        for package in packages:
+            package.id = next(packages_ids)
+        prod_repos_cache = await load_platform_packages(
+            platforms[platform_id],
+            prepare_packages_search_params(packages),
+            False,
+            module,
+        )
+        for mapping in await get_matching_albs_packages(
+            db, packages, prod_repos_cache, module
+        ):
+            albs_packages.append({
+                "errata_package_id": mapping.errata_package.id,
+                "albs_artifact_id": mapping.albs_artifact_id,
+                "pulp_href": mapping.pulp_href,
+                "status": mapping.status,
+                "name": mapping.name,
+                "arch": mapping.arch,
+                "version": mapping.version,
+                "release": mapping.release,
+                "epoch": mapping.epoch,
+            })
+
+    if cves:
+        await db.execute(
+            insert(models.ErrataCVE).on_conflict_do_nothing(),
+            list(cves.values()),
+        )
+    await db.execute(
+        insert(models.ErrataRecord),
+        [records_values[record_id] for record_id in new_records],
+    )
+    await db.execute(insert(models.ErrataReference), references)
+    if packages_count:
+        await db.execute(
+            insert(models.ErrataPackage),
+            [
+                {
+                    "id": package.id,
+                    "errata_record_id": package.errata_record_id,
+                    "name": package.name,
+                    "version": package.version,
+                    "release": package.release,
+                    "epoch": package.epoch,
+                    "arch": package.arch,
+                    "source_srpm": package.source_srpm,
+                    "reboot_suggested": package.reboot_suggested,
+                }
+                for packages in errata_packages.values()
+                for package in packages
+            ],
+        )
+    if albs_packages:
+        await db.execute(insert(models.ErrataToALBSPackage), albs_packages)
+    await db.commit()
+    return results
+
+
 async def get_errata_record(
     db: AsyncSession,
     errata_record_id: str,
@@ -769,6 +1452,41 @@ async def get_errata_record(
     return (await db.execute(query)).scalars().first()
 
 
+def get_errata_search_query(search: str) -> Optional[str]:
+    """
+    Converts search string into tsquery for ErrataRecord.search_vector,
+    words should follow each other and the last typed words
+    can be incomplete, so every word is matched as a prefix.
+    """
+    words = re.findall(r"[^\W_]+", search.lower())
+    if not words:
+        return None
+    return " <-> ".join(f"'{word}':*" for word in words)
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def compile_explain(element, compiler, **kwargs):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(
+        element.statement, **kwargs
+    )
+
+
+async def estimate_query_rows(db: AsyncSession, query) -> int:
+    # Number of rows expected by the planner, much cheaper than count(*)
+    # for the large result sets, but it's only an estimate
+    plan = (await db.execute(Explain(query))).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
 async def list_errata_records(
     db: AsyncSession,
     page: Optional[int] = None,
@@ -779,7 +1497,24 @@ async def list_errata_records(
     platform: Optional[int] = None,
     cve_id: Optional[str] = None,
     status: Optional[ErrataReleaseStatus] = None,
+    search: Optional[str] = None,
+    keyset: bool = False,
+    after_updated_date: Optional[datetime.datetime] = None,
+    after_id: Optional[str] = None,
+    estimate_total: bool = False,
 ):
+    """
+    Lists errata records filtered by the given params.
+
+    Records are paginated by page number (ordered by id) or, with
+    keyset enabled, by (updated_date, id) starting after the record
+    from after_updated_date and after_id, the last record of the
+    previous page is returned as the next page cursor.
+    search looks for words of errata id and titles using
+    the search vector index and for CVE ids starting with it.
+    estimate_total replaces exact count of records with the planner
+    estimate.
+    """
     options = []
     if compact:
         options.append(
@@ -796,11 +1531,7 @@ async def list_errata_records(
             ),
         ])
 
-    def generate_query(count=False):
-        query = select(func.count(models.ErrataRecord.id))
-        if not count:
-            query = select(models.ErrataRecord).options(*options)
-            query = query.order_by(models.ErrataRecord.id.desc())
+    def apply_filters(query):
         if errata_id:
             query = query.filter(models.ErrataRecord.id.like(f"%{errata_id}%"))
         if errata_ids:
@@ -812,23 +1543,87 @@ async def list_errata_records(
                     models.ErrataRecord.original_title.like(f"%{title}%"),
                 )
             )
-        if platform:
-            query = query.filter(models.ErrataRecord.platform_id == platform)
-        if cve_id:
-            query = query.filter(models.ErrataRecord.cves.like(f"%{cve_id}%"))
-        if status:
-            query = query.filter(models.ErrataRecord.release_status == status)
-        if page and not count:
-            query = query.slice(10 * page - 10, 10 * page)
-        return query
+        if platform:
+            query = query.filter(models.ErrataRecord.platform_id == platform)
+        if cve_id:
+            query = query.filter(models.ErrataRecord.cves.like(f"%{cve_id}%"))
+        if status:
+            query = query.filter(models.ErrataRecord.release_status == status)
+        if search and search.strip():
+            # both subqueries use their own indexes, so they are combined
+            # with UNION instead of OR
+            matched_ids = select(
+                models.ErrataReference.errata_record_id,
+            ).where(
+                models.ErrataReference.cve_id.startswith(
+                    search.strip().upper(),
+                    autoescape=True,
+                )
+            )
+            search_query = get_errata_search_query(search)
+            if search_query:
+                matched_ids = sqlalchemy.union(
+                    select(models.ErrataRecord.id).where(
+                        models.ErrataRecord.search_vector.op("@@")(
+                            func.to_tsquery(
+                                sqlalchemy.literal_column(
+                                    "'simple'::regconfig"
+                                ),
+                                search_query,
+                            )
+                        )
+                    ),
+                    matched_ids,
+                )
+            query = query.filter(models.ErrataRecord.id.in_(matched_ids))
+        return query
+
+    query = apply_filters(select(models.ErrataRecord).options(*options))
+    if keyset:
+        query = query.order_by(
+            models.ErrataRecord.updated_date.desc(),
+            models.ErrataRecord.id.desc(),
+        )
+        if after_updated_date and after_id:
+            query = query.filter(
+                sqlalchemy.tuple_(
+                    models.ErrataRecord.updated_date,
+                    models.ErrataRecord.id,
+                )
+                < sqlalchemy.tuple_(
+                    sqlalchemy.literal(after_updated_date),
+                    sqlalchemy.literal(after_id),
+                )
+            )
+        query = query.limit(ERRATA_PAGE_SIZE)
+    else:
+        query = query.order_by(models.ErrataRecord.id.desc())
+        if page:
+            query = query.slice(
+                ERRATA_PAGE_SIZE * page - ERRATA_PAGE_SIZE,
+                ERRATA_PAGE_SIZE * page,
+            )
 
-    return {
-        "total_records": (
-            await db.execute(generate_query(count=True))
-        ).scalar(),
-        "records": (await db.execute(generate_query())).scalars().all(),
+    count_query = apply_filters(select(models.ErrataRecord.id))
+    if estimate_total:
+        total_records = await estimate_query_rows(db, count_query)
+    else:
+        total_records = (
+            await db.execute(
+                select(func.count()).select_from(count_query.subquery())
+            )
+        ).scalar()
+    records = (await db.execute(query)).scalars().all()
+    result = {
+        "total_records": total_records,
+        "total_records_estimated": estimate_total,
+        "records": records,
         "current_page": page,
     }
+    if keyset and len(records) == ERRATA_PAGE_SIZE:
+        result["next_updated_date"] = records[-1].updated_date
+        result["next_id"] = records[-1].id
+    return result
 
 
 async def update_package_status(
@@ -865,6 +1660,10 @@ async def update_package_status(
                         albs_pkg.status = ErrataPackageStatus.skipped
                     if albs_pkg.build_id == record.build_id:
                         albs_pkg.status = record.status
+        await invalidate_oval_fragments(
+            db,
+            [record.errata_record_id for record in request],
+        )
     return True
 
 
@@ -877,6 +1676,34 @@ async def release_errata_packages(
     repo_href: str,
     publish: bool = True,
 ):
+    pulp_record = await prepare_pulp_errata_record(
+        session,
+        pulp_client,
+        record,
+        packages,
+        platform,
+        repo_href,
+    )
+    if not pulp_record:
+        return
+    logging.info(
+        'Adding the "%s" record to the "%s" repo',
+        record.id,
+        repo_href,
+    )
+    await pulp_client.add_errata_record(pulp_record, repo_href)
+    if publish:
+        await pulp_client.create_rpm_publication(repo_href)
+
+
+async def prepare_pulp_errata_record(
+    session: AsyncSession,
+    pulp_client: PulpClient,
+    record: models.ErrataRecord,
+    packages: List[models.ErrataToALBSPackage],
+    platform: models.Platform,
+    repo_href: str,
+) -> Optional[Dict[str, Any]]:
     repo = await pulp_client.get_by_href(repo_href)
     released_record = await pulp_client.list_updateinfo_records(
         id__in=[record.id],
@@ -986,19 +1813,11 @@ async def release_errata_packages(
         ],
         "reboot_suggested": reboot_suggested,
     }
-    logging.info(
-        'Adding the "%s" record to the "%s" repo',
-        record.id,
-        repo_href,
-    )
-    await pulp_client.add_errata_record(pulp_record, repo_href)
-    if publish:
-        await pulp_client.create_rpm_publication(repo_href)
+    return pulp_record
 
 
 async def prepare_updateinfo_mapping(
     db: AsyncSession,
-    pulp: PulpClient,
     package_hrefs: List[str],
     blacklist_updateinfo: List[str],
 ) -> DefaultDict[
@@ -1006,59 +1825,101 @@ async def prepare_updateinfo_mapping(
     List[Tuple[models.BuildTaskArtifact, dict, models.ErrataToALBSPackage]],
 ]:
     updateinfo_mapping = collections.defaultdict(list)
-    for pkg_href in set(package_hrefs):
-        db_pkg_list = (
-            (
-                await db.execute(
-                    select(models.BuildTaskArtifact)
-                    .where(
-                        models.BuildTaskArtifact.href == pkg_href,
-                    )
-                    .options(
-                        selectinload(
-                            models.BuildTaskArtifact.build_task
-                        ).selectinload(models.BuildTask.rpm_module)
-                    )
+    package_hrefs = set(package_hrefs)
+    if not package_hrefs:
+        return updateinfo_mapping
+    db_pkg_list = (
+        (
+            await db.execute(
+                select(models.BuildTaskArtifact)
+                .where(models.BuildTaskArtifact.href.in_(package_hrefs))
+                .options(
+                    selectinload(
+                        models.BuildTaskArtifact.build_task
+                    ).selectinload(models.BuildTask.rpm_module)
                 )
             )
-            .scalars()
-            .all()
         )
-        for db_pkg in db_pkg_list:
-            errata_pkgs = await db.execute(
+        .scalars()
+        .all()
+    )
+    if not db_pkg_list:
+        return updateinfo_mapping
+    errata_pkgs = (
+        (
+            await db.execute(
                 select(models.ErrataToALBSPackage)
                 .where(
                     or_(
-                        models.ErrataToALBSPackage.albs_artifact_id
-                        == db_pkg.id,
-                        models.ErrataToALBSPackage.pulp_href == pkg_href,
+                        models.ErrataToALBSPackage.albs_artifact_id.in_(
+                            [db_pkg.id for db_pkg in db_pkg_list]
+                        ),
+                        models.ErrataToALBSPackage.pulp_href.in_(
+                            package_hrefs
+                        ),
                     )
                 )
                 .options(
                     selectinload(models.ErrataToALBSPackage.errata_package),
                     selectinload(models.ErrataToALBSPackage.build_artifact),
                 )
+                .order_by(models.ErrataToALBSPackage.id)
             )
-            pulp_pkg = await pulp.get_rpm_package(
-                db_pkg.href,
-                include_fields=[
-                    "name",
-                    "version",
-                    "release",
-                    "epoch",
-                    "arch",
-                    "location_href",
-                    "sha256",
-                    "rpm_sourcerpm",
-                ],
+        )
+        .scalars()
+        .all()
+    )
+    errata_pkgs_by_artifact = collections.defaultdict(list)
+    errata_pkgs_by_href = collections.defaultdict(list)
+    for errata_pkg in errata_pkgs:
+        if errata_pkg.albs_artifact_id is not None:
+            errata_pkgs_by_artifact[errata_pkg.albs_artifact_id].append(
+                errata_pkg
+            )
+        if errata_pkg.pulp_href is not None:
+            errata_pkgs_by_href[errata_pkg.pulp_href].append(errata_pkg)
+    pulp_pkgs = await get_rpm_packages_by_ids(
+        list({get_uuid_from_pulp_href(db_pkg.href) for db_pkg in db_pkg_list}),
+        [
+            RpmPackage.content_ptr_id,
+            RpmPackage.name,
+            RpmPackage.epoch,
+            RpmPackage.version,
+            RpmPackage.release,
+            RpmPackage.arch,
+            RpmPackage.location_href,
+            RpmPackage.rpm_sourcerpm,
+        ],
+    )
+    for db_pkg in db_pkg_list:
+        pulp_pkg = pulp_pkgs.get(db_pkg.href)
+        if pulp_pkg is None:
+            raise ValueError(f"Cannot find {db_pkg.href} package in Pulp")
+        pulp_pkg_info = {
+            "name": pulp_pkg.name,
+            "version": pulp_pkg.version,
+            "release": pulp_pkg.release,
+            "epoch": pulp_pkg.epoch,
+            "arch": pulp_pkg.arch,
+            "location_href": pulp_pkg.location_href,
+            "sha256": pulp_pkg.sha256,
+            "rpm_sourcerpm": pulp_pkg.rpm_sourcerpm,
+        }
+        # the same mapping can refer to both artifact and pulp href
+        matched_errata_pkgs = {
+            errata_pkg.id: errata_pkg
+            for errata_pkg in (
+                *errata_pkgs_by_artifact[db_pkg.id],
+                *errata_pkgs_by_href[db_pkg.href],
+            )
+        }
+        for errata_pkg in matched_errata_pkgs.values():
+            errata_id = errata_pkg.errata_package.errata_record_id
+            if errata_id in blacklist_updateinfo:
+                continue
+            updateinfo_mapping[errata_id].append(
+                (db_pkg, pulp_pkg_info, errata_pkg),
             )
-            for errata_pkg in errata_pkgs.scalars().all():
-                errata_id = errata_pkg.errata_package.errata_record_id
-                if errata_id in blacklist_updateinfo:
-                    continue
-                updateinfo_mapping[errata_id].append(
-                    (db_pkg, pulp_pkg, errata_pkg),
-                )
     return updateinfo_mapping
 
 
@@ -1188,18 +2049,32 @@ async def process_errata_release_for_repos(
 ) -> Optional[List[Awaitable]]:
     release_tasks = []
     publish_tasks = []
+    await invalidate_oval_fragments(session, [db_record.id])
+    invalidate_updateinfo_xml([db_record.id])
+    repos_pkg_hrefs = {}
     for repo_href, packages in repo_mapping.items():
-        pkg_hrefs = []
+        repos_pkg_hrefs[repo_href] = set()
         for pkg in packages:
             pkg.status = ErrataPackageStatus.released
-            pkg_hrefs.append(pkg.get_pulp_href())
-        logging.info("Preparing udpateinfo mapping")
-        updateinfo_mapping = await prepare_updateinfo_mapping(
-            db=session,
-            pulp=pulp,
-            package_hrefs=pkg_hrefs,
-            blacklist_updateinfo=[],
-        )
+            repos_pkg_hrefs[repo_href].add(pkg.get_pulp_href())
+    logging.info("Preparing udpateinfo mapping")
+    # packages of the record are the same in all repositories,
+    # so the mapping is prepared once and split by repositories
+    release_updateinfo_mapping = await prepare_updateinfo_mapping(
+        db=session,
+        package_hrefs=set().union(*repos_pkg_hrefs.values()),
+        blacklist_updateinfo=[],
+    )
+    for repo_href, packages in repo_mapping.items():
+        updateinfo_mapping = collections.defaultdict(list)
+        for record_id, items in release_updateinfo_mapping.items():
+            repo_items = [
+                item
+                for item in items
+                if item[0].href in repos_pkg_hrefs[repo_href]
+            ]
+            if repo_items:
+                updateinfo_mapping[record_id] = repo_items
         latest_repo_version = await pulp.get_repo_latest_version(repo_href)
         if latest_repo_version:
             errata_records = await pulp.list_updateinfo_records(
@@ -1238,7 +2113,10 @@ async def process_errata_release_for_repos(
     await asyncio.gather(*publish_tasks)
 
 
-def generate_query_for_release(records_ids: List[str]):
+def generate_query_for_release(
+    records_ids: List[str],
+    for_update: bool = True,
+):
     query = (
         select(models.ErrataRecord)
         .where(models.ErrataRecord.id.in_(records_ids))
@@ -1251,8 +2129,9 @@ def generate_query_for_release(records_ids: List[str]):
                 models.Platform.repos
             ),
         )
-        .with_for_update()
     )
+    if for_update:
+        query = query.with_for_update()
     return query
 
 
@@ -1276,7 +2155,7 @@ async def get_release_logs(
         RpmPackage.release,
         RpmPackage.arch,
     ]
-    pulp_pkgs = get_rpm_packages_by_ids(
+    pulp_pkgs = await get_rpm_packages_by_ids(
         pulp_pkg_ids=[get_uuid_from_pulp_href(pkg) for pkg in pulp_packages],
         pkg_fields=pkg_fields,
     )
@@ -1364,14 +2243,157 @@ async def release_errata_record(record_id: str, force: bool):
     logging.info("Record %s successfully released", record_id)
 
 
+async def prepare_errata_record_release(
+    record_id: str,
+    pulp: PulpClient,
+) -> Dict[str, Any]:
+    """
+    Collects everything that is needed to release the record.
+    Neither the record is locked nor Pulp is modified here.
+    """
+    async with asynccontextmanager(get_db)() as session:
+        session: AsyncSession
+        db_record = await session.execute(
+            generate_query_for_release([record_id], for_update=False),
+        )
+        db_record: Optional[models.ErrataRecord] = db_record.scalars().first()
+        if not db_record:
+            return {
+                "record_id": record_id,
+                "error": f"Record {record_id} doesn't exist",
+            }
+        search_params = prepare_search_params(db_record)
+        pulp_packages = await load_platform_packages(
+            db_record.platform,
+            search_params,
+            for_release=True,
+        )
+        repo_mapping, missing_pkg_names = get_albs_packages_from_record(
+            db_record,
+            pulp_packages,
+        )
+        updateinfo_mapping = await prepare_updateinfo_mapping(
+            db=session,
+            package_hrefs=[
+                pkg.get_pulp_href()
+                for packages in repo_mapping.values()
+                for pkg in packages
+            ],
+            blacklist_updateinfo=[],
+        )
+        record_updateinfo = updateinfo_mapping.get(db_record.id, [])
+        repos = {}
+        for repo_href, packages in repo_mapping.items():
+            pkg_hrefs = {pkg.get_pulp_href() for pkg in packages}
+            repos[repo_href] = {
+                # packages to append if the record is already in the repo
+                "updateinfo": [
+                    item
+                    for item in record_updateinfo
+                    if item[0].href in pkg_hrefs
+                ],
+                "pulp_record": await prepare_pulp_errata_record(
+                    session,
+                    pulp,
+                    db_record,
+                    packages,
+                    db_record.platform,
+                    repo_href,
+                ),
+            }
+        release_log = await get_release_logs(
+            record_id=db_record.id,
+            pulp_packages=pulp_packages,
+            session=session,
+            repo_mapping=repo_mapping,
+            db_record=db_record,
+            missing_pkg_names=missing_pkg_names,
+            force_flag=False,
+        )
+    return {
+        "record_id": record_id,
+        "error": None,
+        "repos": repos,
+        "albs_package_ids": {
+            pkg.id for packages in repo_mapping.values() for pkg in packages
+        },
+        "release_log": release_log,
+    }
+
+
+async def release_errata_records_to_repo(
+    pulp: PulpClient,
+    repo_href: str,
+    releases: List[Dict[str, Any]],
+):
+    updateinfo_mapping = {
+        release["record_id"]: release["repos"][repo_href]["updateinfo"]
+        for release in releases
+        if release["repos"][repo_href]["updateinfo"]
+    }
+    if updateinfo_mapping:
+        latest_repo_version = await pulp.get_repo_latest_version(repo_href)
+        if latest_repo_version:
+            errata_records = await pulp.list_updateinfo_records(
+                id__in=list(updateinfo_mapping),
+                repository_version=latest_repo_version,
+            )
+            with get_pulp_db() as pulp_db:
+                append_update_packages_in_update_records(
+                    pulp_db=pulp_db,
+                    errata_records=errata_records,
+                    updateinfo_mapping=updateinfo_mapping,
+                )
+    pulp_records = [
+        release["repos"][repo_href]["pulp_record"]
+        for release in releases
+        if release["repos"][repo_href]["pulp_record"]
+    ]
+    if pulp_records:
+        logging.info(
+            "Adding %d records to the %s repo",
+            len(pulp_records),
+            repo_href,
+        )
+        await pulp.add_errata_records(pulp_records, repo_href)
+    await pulp.create_rpm_publication(repo_href)
+
+
+async def finish_errata_records_release(releases: List[Dict[str, Any]]):
+    records_ids = [release["record_id"] for release in releases]
+    async with asynccontextmanager(get_db)() as session:
+        session: AsyncSession
+        db_records = await session.execute(
+            generate_query_for_release(records_ids),
+        )
+        db_records = {
+            db_record.id: db_record for db_record in db_records.scalars()
+        }
+        for release in releases:
+            db_record = db_records.get(release["record_id"])
+            if not db_record:
+                continue
+            if release["error"]:
+                db_record.release_status = ErrataReleaseStatus.FAILED
+                db_record.last_release_log = release["error"]
+                continue
+            for errata_pkg in db_record.packages:
+                for albs_pkg in errata_pkg.albs_packages:
+                    if albs_pkg.id in release["albs_package_ids"]:
+                        albs_pkg.status = ErrataPackageStatus.released
+            db_record.release_status = ErrataReleaseStatus.RELEASED
+            db_record.last_release_log = release["release_log"]
+        await invalidate_oval_fragments(session, records_ids)
+        invalidate_updateinfo_xml(records_ids)
+        await session.commit()
+
+
 async def bulk_errata_records_release(records_ids: List[str]):
     pulp = PulpClient(
         settings.pulp_host,
         settings.pulp_user,
         settings.pulp_password,
     )
-    release_tasks = []
-    repos_to_publish = []
     async with asynccontextmanager(get_db)() as session:
         await session.execute(
             update(models.ErrataRecord)
@@ -1383,162 +2405,297 @@ async def bulk_errata_records_release(records_ids: List[str]):
         )
         await session.commit()
 
-    async with asynccontextmanager(get_db)() as session:
-        session: AsyncSession
-        db_records = await session.execute(
-            generate_query_for_release(records_ids),
-        )
-        db_records: List[models.ErrataRecord] = db_records.scalars().all()
-        if not db_records:
-            logging.info(
-                "Cannot find records by the following ids: %s",
-                records_ids,
-            )
-            return
+    logging.info("Starting bulk errata release of %s", records_ids)
+    prepared_count = 0
 
+    async def prepare(record_id: str) -> Dict[str, Any]:
+        nonlocal prepared_count
+        try:
+            release = await prepare_errata_record_release(record_id, pulp)
+        except Exception as exc:
+            logging.exception("Cannot prepare data for %s:", record_id)
+            release = {"record_id": record_id, "error": str(exc)}
+        prepared_count += 1
+        if release["error"]:
+            # failed records are reported right away
+            await finish_errata_records_release([release])
         logging.info(
-            "Starting bulk errata release, the following records are"
-            " locked: %s",
-            [rec.id for rec in db_records],
+            "Record %s is %s (%d/%d)",
+            record_id,
+            "failed" if release["error"] else "prepared for release",
+            prepared_count,
+            len(records_ids),
         )
-        for db_record in db_records:
-            logging.info("Preparing data for %s", db_record.id)
-            search_params = prepare_search_params(db_record)
-            pulp_packages = await load_platform_packages(
-                db_record.platform,
-                search_params,
-                for_release=True,
-            )
-            try:
-                (
-                    repo_mapping,
-                    missing_pkg_names,
-                ) = get_albs_packages_from_record(db_record, pulp_packages)
-            except Exception as exc:
-                db_record.release_status = ErrataReleaseStatus.FAILED
-                db_record.last_release_log = str(exc)
-                logging.exception("Cannot prepare data for %s:", db_record.id)
-                continue
+        return release
 
-            tasks = await process_errata_release_for_repos(
-                db_record,
-                repo_mapping,
-                session,
+    releases = await gather_with_concurrency(
+        settings.errata_release_concurrency,
+        *(prepare(record_id) for record_id in records_ids),
+    )
+    releases = [release for release in releases if not release["error"]]
+    if not releases:
+        logging.info("Bulk errata release is finished, nothing to release")
+        return
+
+    # Pulp writes are grouped by repositories, so every repository
+    # gets one modification and one publication for the whole batch
+    repos_releases = collections.defaultdict(list)
+    for release in releases:
+        for repo_href in release["repos"]:
+            repos_releases[repo_href].append(release)
+
+    async def release_to_repo(repo_href: str):
+        repo_releases = repos_releases[repo_href]
+        try:
+            await release_errata_records_to_repo(
                 pulp,
-                publish=False,
+                repo_href,
+                repo_releases,
             )
-            db_record.release_status = ErrataReleaseStatus.RELEASED
-            db_record.last_release_log = await get_release_logs(
-                record_id=db_record.id,
-                pulp_packages=pulp_packages,
-                session=session,
-                repo_mapping=repo_mapping,
-                db_record=db_record,
-                missing_pkg_names=missing_pkg_names,
-                force_flag=False,
+        except Exception as exc:
+            logging.exception("Cannot release records to %s:", repo_href)
+            for release in repo_releases:
+                release["error"] = (
+                    f"Cannot release record to {repo_href}: {exc}"
+                )
+        else:
+            logging.info(
+                "Records %s are released to %s",
+                [release["record_id"] for release in repo_releases],
+                repo_href,
             )
-            if not tasks:
-                continue
-            repos_to_publish.extend(repo_mapping.keys())
-            release_tasks.extend(tasks)
-        await session.commit()
-    logging.info("Executing release tasks")
-    await asyncio.gather(*release_tasks)
-    logging.info("Executing publication tasks")
-    await asyncio.gather(
-        *(pulp.create_rpm_publication(href) for href in set(repos_to_publish))
+
+    logging.info("Releasing records to %d repositories", len(repos_releases))
+    await gather_with_concurrency(
+        settings.errata_release_concurrency,
+        *(release_to_repo(repo_href) for repo_href in repos_releases),
     )
+    await finish_errata_records_release(releases)
     logging.info("Bulk errata release is finished")
 
 
-async def get_updateinfo_xml_from_pulp(
+def updateinfo_record_to_xml(errata_record: dict) -> str:
+    """
+    Renders Pulp advisory into <update> element of updateinfo.xml.
+    """
+    cr_upd = cr.UpdateInfo()
+    cr_rec = cr.UpdateRecord()
+    cr_col = cr.UpdateCollection()
+    cr_mod = cr.UpdateCollectionModule()
+    cr_rec.id = errata_record["id"]
+    for key in (
+        "issued_date",
+        "pushcount",
+        "release",
+        "rights",
+        "severity",
+        "summary",
+        "title",
+        "description",
+        "fromstr",
+        "type",
+        "status",
+        "version",
+        "rights",
+        "updated_date",
+    ):
+        if key not in errata_record:
+            continue
+        value = errata_record[key]
+        if key in (
+            "issued_date",
+            "updated_date",
+        ):
+            value = datetime.datetime.fromisoformat(value)
+        setattr(cr_rec, key, value)
+    for ref in errata_record.get("references", []):
+        cr_ref = cr.UpdateReference()
+        cr_ref.href = ref["href"]
+        cr_ref.type = ref["type"]
+        cr_ref.id = ref["id"]
+        cr_ref.title = ref["title"]
+        cr_rec.append_reference(cr_ref)
+    collection = errata_record["pkglist"][0]
+    cr_col.name = collection["name"]
+    cr_col.shortname = collection["shortname"]
+    if collection["module"]:
+        for key in (
+            "stream",
+            "name",
+            "version",
+            "arch",
+            "context",
+        ):
+            setattr(cr_mod, key, collection["module"][key])
+        cr_col.module = cr_mod
+    for package in collection["packages"]:
+        cr_pkg = cr.UpdateCollectionPackage()
+        for key in (
+            "name",
+            "src",
+            "version",
+            "release",
+            "arch",
+            "filename",
+            "sum",
+            "epoch",
+            "reboot_suggested",
+        ):
+            if key not in package:
+                continue
+            setattr(cr_pkg, key, package[key])
+        if package["sum_type"] == "sha256":
+            cr_pkg.sum_type = cr.SHA256
+        else:
+            cr_pkg.sum_type = package["sum_type"]
+        cr_col.append(cr_pkg)
+    cr_rec.append_collection(cr_col)
+    cr_upd.append(cr_rec)
+    updateinfo_xml = cr_upd.xml_dump()
+    return updateinfo_xml[
+        len(UPDATEINFO_XML_HEADER) : -len(UPDATEINFO_XML_FOOTER)
+    ]
+
+
+def invalidate_updateinfo_xml(record_ids: List[str]):
+    for record_id in record_ids:
+        _updateinfo_xml_cache.pop(record_id, None)
+
+
+def get_cached_updateinfo_xml(
     record_id: str,
+    state: Tuple[Tuple[str, str, str], ...],
 ) -> Optional[str]:
+    cached = _updateinfo_xml_cache.get(record_id)
+    if not cached or cached[0] != state:
+        return
+    _updateinfo_xml_cache.move_to_end(record_id)
+    return cached[1]
+
+
+def cache_updateinfo_xml(
+    record_id: str,
+    state: Tuple[Tuple[str, str, str], ...],
+    updateinfo_xml: str,
+):
+    _updateinfo_xml_cache[record_id] = (state, updateinfo_xml)
+    _updateinfo_xml_cache.move_to_end(record_id)
+    while len(_updateinfo_xml_cache) > UPDATEINFO_XML_CACHE_SIZE:
+        _updateinfo_xml_cache.popitem(last=False)
+
+
+async def list_updateinfo_records(
+    pulp_client: PulpClient,
+    record_ids: List[str],
+    include_fields: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    advisories = []
+    for start in range(0, len(record_ids), UPDATEINFO_PULP_IDS_CHUNK_SIZE):
+        advisories.extend(
+            await pulp_client.list_updateinfo_records(
+                id__in=record_ids[
+                    start : start + UPDATEINFO_PULP_IDS_CHUNK_SIZE
+                ],
+                include_fields=include_fields,
+            )
+        )
+    return advisories
+
+
+async def get_updateinfo_records_state(
+    pulp_client: PulpClient,
+    record_ids: List[str],
+) -> Dict[str, Tuple[Tuple[str, str, str], ...]]:
+    # Pulp advisories of errata records with their last updates,
+    # rendered XML is valid while they are the same.
+    # Released packages are appended to advisories right in the Pulp DB
+    # without touching pulp_last_updated, only updated_date is bumped
+    advisories = await list_updateinfo_records(
+        pulp_client,
+        record_ids,
+        include_fields=[
+            "id",
+            "pulp_href",
+            "pulp_last_updated",
+            "updated_date",
+        ],
+    )
+    states = collections.defaultdict(list)
+    for advisory in advisories:
+        states[advisory["id"]].append(
+            (
+                advisory.get("pulp_href", ""),
+                advisory.get("pulp_last_updated", ""),
+                advisory.get("updated_date", ""),
+            )
+        )
+    return {
+        record_id: tuple(sorted(state))
+        for record_id, state in states.items()
+    }
+
+
+async def get_updateinfo_xml_fragments(
+    record_ids: List[str],
+) -> Dict[str, str]:
     pulp_client = PulpClient(
         settings.pulp_host,
         settings.pulp_user,
         settings.pulp_password,
     )
-    errata_records = await pulp_client.list_updateinfo_records(
-        id__in=[record_id],
-    )
-    if not errata_records:
+    record_ids = list(dict.fromkeys(record_ids))
+    states = await get_updateinfo_records_state(pulp_client, record_ids)
+    fragments = {}
+    stale_ids = []
+    for record_id, state in states.items():
+        cached = get_cached_updateinfo_xml(record_id, state)
+        if cached is not None:
+            fragments[record_id] = cached
+            continue
+        stale_ids.append(record_id)
+    if not stale_ids:
+        return fragments
+    advisories = collections.defaultdict(list)
+    for advisory in await list_updateinfo_records(pulp_client, stale_ids):
+        advisories[advisory["id"]].append(advisory)
+    for record_id, record_advisories in advisories.items():
+        record_advisories.sort(
+            key=lambda advisory: advisory.get("pulp_href", "")
+        )
+        fragments[record_id] = "".join(
+            updateinfo_record_to_xml(advisory)
+            for advisory in record_advisories
+        )
+        if record_id in states:
+            cache_updateinfo_xml(
+                record_id,
+                states[record_id],
+                fragments[record_id],
+            )
+    return fragments
+
+
+async def get_updateinfo_xml_from_pulp(
+    record_id: str,
+) -> Optional[str]:
+    return await get_bulk_updateinfo_xml_from_pulp([record_id])
+
+
+async def get_bulk_updateinfo_xml_from_pulp(
+    record_ids: List[str],
+) -> Optional[str]:
+    fragments = await get_updateinfo_xml_fragments(record_ids)
+    if not fragments:
         return
-    cr_upd = cr.UpdateInfo()
-    for errata_record in errata_records:
-        cr_ref = cr.UpdateReference()
-        cr_rec = cr.UpdateRecord()
-        cr_col = cr.UpdateCollection()
-        cr_mod = cr.UpdateCollectionModule()
-        cr_rec.id = errata_record["id"]
-        for key in (
-            "issued_date",
-            "pushcount",
-            "release",
-            "rights",
-            "severity",
-            "summary",
-            "title",
-            "description",
-            "fromstr",
-            "type",
-            "status",
-            "version",
-            "rights",
-            "updated_date",
-        ):
-            if key not in errata_record:
-                continue
-            value = errata_record[key]
-            if key in (
-                "issued_date",
-                "updated_date",
-            ):
-                value = datetime.datetime.fromisoformat(value)
-            setattr(cr_rec, key, value)
-        for ref in errata_record.get("references", []):
-            cr_ref.href = ref["href"]
-            cr_ref.type = ref["type"]
-            cr_ref.id = ref["id"]
-            cr_ref.title = ref["title"]
-            cr_rec.append_reference(cr_ref)
-        collection = errata_record["pkglist"][0]
-        cr_col.name = collection["name"]
-        cr_col.shortname = collection["shortname"]
-        if collection["module"]:
-            for key in (
-                "stream",
-                "name",
-                "version",
-                "arch",
-                "context",
-            ):
-                setattr(cr_mod, key, collection["module"][key])
-            cr_col.module = cr_mod
-        for package in collection["packages"]:
-            cr_pkg = cr.UpdateCollectionPackage()
-            for key in (
-                "name",
-                "src",
-                "version",
-                "release",
-                "arch",
-                "filename",
-                "sum",
-                "epoch",
-                "reboot_suggested",
-            ):
-                if key not in package:
-                    continue
-                setattr(cr_pkg, key, package[key])
-            if package["sum_type"] == "sha256":
-                cr_pkg.sum_type = cr.SHA256
-            else:
-                cr_pkg.sum_type = package["sum_type"]
-            cr_col.append(cr_pkg)
-        cr_rec.append_collection(cr_col)
-        cr_upd.append(cr_rec)
-    return cr_upd.xml_dump()
+    return "".join((
+        UPDATEINFO_XML_HEADER,
+        *(
+            fragments[record_id]
+            for record_id in dict.fromkeys(record_ids)
+            if record_id in fragments
+        ),
+        UPDATEINFO_XML_FOOTER,
+    ))
 
 
 async def reset_matched_errata_packages(record_id: str, session: AsyncSession):
@@ -1578,14 +2735,14 @@ async def reset_matched_errata_packages(record_id: str, session: AsyncSession):
             )
         )
     )
-    for package in record.packages:
-        items_to_insert.extend(
-            await get_matching_albs_packages(
-                session,
-                package,
-                prod_repos_cache,
-                record.module,
-            )
+    items_to_insert.extend(
+        await get_matching_albs_packages(
+            session,
+            record.packages,
+            prod_repos_cache,
+            record.module,
         )
+    )
     session.add_all(items_to_insert)
+    await invalidate_oval_fragments(session, [record.id])
     await session.commit()
@@ -5,7 +5,7 @@ import typing
 import urllib.parse
 from collections import defaultdict
 
-from sqlalchemy import or_, update
+from sqlalchemy import func, literal, or_, union_all, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
@@ -30,6 +30,7 @@ from alws.utils.copr import create_product_sign_key_repo
 from alws.utils.debuginfo import is_debuginfo_rpm
 from alws.utils.pulp_client import PulpClient
 from alws.utils.pulp_utils import get_rpm_packages_by_checksums
+from alws.utils.task_notifier import get_notify_query, get_sign_topics
 
 
 async def __get_build_repos(
@@ -179,6 +180,7 @@ async def create_sign_task(
             sign_key_id=payload.sign_key_id,
         )
         db.add(sign_task)
+        await db.execute(get_notify_query(get_sign_topics([sign_key.keyid])))
         await db.commit()
     await db.refresh(sign_task)
     sign_tasks = await db.execute(
@@ -541,7 +543,7 @@ async def complete_sign_task(
                 package_arches_mapping[package.name].add(package.arch)
                 if package.name not in packages_to_convert:
                     packages_to_convert[package.name] = package
-            pulp_db_packages = get_rpm_packages_by_checksums(
+            pulp_db_packages = await get_rpm_packages_by_checksums(
                 [pkg.sha256 for pkg in packages_to_convert.values()],
             )
             logging.info("Start processing packages for task %s", sign_task_id)
@@ -686,3 +688,84 @@ async def verify_signed_build(
                 f"by sign key for platform ID {platform_id}"
             )
     return True
+
+
+async def verify_signed_builds(
+    db: AsyncSession,
+    build_ids: typing.List[int],
+    platform_id: int,
+) -> typing.Dict[int, typing.Dict[str, typing.Any]]:
+    """
+    Does the checks of verify_signed_build for all builds at once,
+    with one query for the platform sign key and one aggregate query
+    over packages of all builds.
+    Returns a verdict for every build: whether it's verified
+    and the reason if it isn't.
+    """
+    sign_key_id = (
+        await db.execute(
+            select(models.SignKey.id)
+            .where(models.SignKey.platform_id == platform_id)
+            .order_by(models.SignKey.id)
+            .limit(1)
+        )
+    ).scalar()
+    if sign_key_id is None:
+        reason = f"platform with ID {platform_id} connects with no keys"
+        return {
+            build_id: {"verified": False, "reason": reason}
+            for build_id in build_ids
+        }
+    rpms = union_all(
+        select(
+            models.SourceRpm.id,
+            models.SourceRpm.build_id,
+            models.SourceRpm.artifact_id,
+            literal(True).label("is_source"),
+        ),
+        select(
+            models.BinaryRpm.id,
+            models.BinaryRpm.build_id,
+            models.BinaryRpm.artifact_id,
+            literal(False).label("is_source"),
+        ),
+    ).subquery()
+    wrong_key = or_(
+        models.BuildTaskArtifact.sign_key_id.is_(None),
+        models.BuildTaskArtifact.sign_key_id != sign_key_id,
+    )
+    query = (
+        select(
+            models.Build.id,
+            models.Build.signed,
+            func.count(rpms.c.id).filter(rpms.c.is_source.is_(True)),
+            func.count(rpms.c.id).filter(rpms.c.is_source.is_(False)),
+            func.min(rpms.c.id).filter(wrong_key),
+        )
+        .outerjoin(rpms, rpms.c.build_id == models.Build.id)
+        .outerjoin(
+            models.BuildTaskArtifact,
+            models.BuildTaskArtifact.id == rpms.c.artifact_id,
+        )
+        .where(models.Build.id.in_(build_ids))
+        .group_by(models.Build.id)
+    )
+    builds = {row[0]: row[1:] for row in (await db.execute(query)).all()}
+    verdicts = {}
+    for build_id in build_ids:
+        reason = None
+        if build_id not in builds:
+            reason = f"Build with ID {build_id} does not exist"
+        else:
+            signed, src_count, binary_count, wrong_rpm_id = builds[build_id]
+            if not signed:
+                reason = f"Build with ID {build_id} has not already signed"
+            elif not src_count or not binary_count:
+                reason = f"No built packages in build with ID {build_id}"
+            elif wrong_rpm_id is not None:
+                reason = (
+                    f"Sign key with for pkg ID {wrong_rpm_id} is not matched "
+                    f"by sign key for platform ID {platform_id}"
+                )
+        verdicts[build_id] = {"verified": reason is None, "reason": reason}
+    return verdicts
@@ -25,6 +25,7 @@ from alws.utils.pulp_utils import (
     get_rpm_packages_by_ids,
     get_uuid_from_pulp_href,
 )
+from alws.utils.task_notifier import get_notify_query, get_test_topics
 
 
 def get_repos_for_test_task(task: models.TestTask) -> List[dict]:
@@ -188,10 +189,10 @@ async def create_test_tasks_for_build_id(db: AsyncSession, build_id: int):
         await create_test_tasks(db, build_task_id, test_log_repository.id)
 
 
-def get_pulp_packages(
+async def get_pulp_packages(
     artifacts: List[models.BuildTaskArtifact],
 ) -> Dict[str, RpmPackage]:
-    return get_rpm_packages_by_ids(
+    return await get_rpm_packages_by_ids(
         [get_uuid_from_pulp_href(artifact.href) for artifact in artifacts],
         [
             RpmPackage.name,
@@ -230,7 +231,7 @@ async def create_test_tasks(
             new_revision = latest_revision + 1
 
         test_tasks = []
-        pulp_packages = get_pulp_packages(build_task.artifacts)
+        pulp_packages = await get_pulp_packages(build_task.artifacts)
         for artifact in build_task.artifacts:
             if artifact.type != 'rpm':
                 continue
@@ -258,6 +259,7 @@ async def create_test_tasks(
             test_tasks.append(task)
         if test_tasks:
             db.add_all(test_tasks)
+            await db.execute(get_notify_query(get_test_topics()))
             await db.commit()
 
 
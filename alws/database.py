@@ -2,6 +2,7 @@
 # author: Vyacheslav Potoropin <vpotoropin@almalinux.org>
 # created: 2021-06-22
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import scoped_session, sessionmaker
@@ -9,7 +10,14 @@ from sqlalchemy.pool import NullPool
 
 from alws.config import settings
 
-__all__ = ['Base', 'Session', 'SyncSession', 'PulpSession', 'engine']
+__all__ = [
+    'AsyncPulpSession',
+    'Base',
+    'Session',
+    'SyncSession',
+    'PulpSession',
+    'engine',
+]
 
 
 DATABASE_URL = settings.database_url
@@ -29,3 +37,16 @@ pulp_engine = create_engine(
 )
 pulp_session_factory = sessionmaker(pulp_engine, expire_on_commit=False)
 PulpSession = scoped_session(pulp_session_factory)
+
+# Read-only Pulp queries from async code go through asyncpg,
+# so they don't block the event loop
+pulp_async_engine = create_async_engine(
+    make_url(settings.pulp_database_url).set(drivername='postgresql+asyncpg'),
+    pool_pre_ping=True,
+    pool_recycle=3600,
+)
+AsyncPulpSession = sessionmaker(
+    pulp_async_engine,
+    expire_on_commit=False,
+    class_=AsyncSession,
+)
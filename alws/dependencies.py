@@ -1,7 +1,8 @@
 import asyncio
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
 
 import aioredis
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from alws import database
@@ -9,6 +10,7 @@ from alws.config import settings
 
 
 __all__ = [
+    'get_async_pulp_db',
     'get_async_session',
     'get_db',
     'get_pulp_db',
@@ -51,6 +53,15 @@ def get_pulp_db() -> Session:
             session.close()
 
 
+@asynccontextmanager
+async def get_async_pulp_db() -> AsyncSession:
+    async with database.AsyncPulpSession() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
 async def get_redis() -> aioredis.Redis:
     client = aioredis.from_url(settings.redis_url)
     try:
@@ -17,6 +17,7 @@ import dramatiq
 from dramatiq.brokers.rabbitmq import RabbitmqBroker
 
 from alws.config import settings
+from alws.utils.pulp_client import PulpClient
 
 rabbitmq_broker = RabbitmqBroker(
     url=f"amqp://"
@@ -28,6 +29,19 @@ rabbitmq_broker = RabbitmqBroker(
 dramatiq.set_broker(rabbitmq_broker)
 event_loop = asyncio.get_event_loop()
 
+
+class PulpSessionMiddleware(dramatiq.Middleware):
+    """
+    Closes the Pulp connection pool shared by the worker tasks
+    when the worker process is stopped.
+    """
+
+    def after_worker_shutdown(self, broker, worker):
+        event_loop.run_until_complete(PulpClient.close_session())
+
+
+rabbitmq_broker.add_middleware(PulpSessionMiddleware())
+
 # Tasks import started from here
 from alws.dramatiq.build import start_build, build_done
 
@@ -35,6 +49,11 @@ from alws.dramatiq.build import start_build, build_done
 from alws.dramatiq.products import perform_product_modification
 from alws.dramatiq.user import perform_user_removal
 from alws.dramatiq.releases import execute_release_plan, revert_release
-from alws.dramatiq.errata import bulk_errata_release, release_errata
+from alws.dramatiq.errata import (
+    bulk_errata_create,
+    bulk_errata_release,
+    regenerate_oval,
+    release_errata,
+)
 from alws.dramatiq.sign_task import complete_sign_task
 from alws.dramatiq.tests import complete_test_task
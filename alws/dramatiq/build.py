@@ -25,6 +25,7 @@ from alws.errors import (
     SrpmProvisionError,
 )
 from alws.schemas import build_node_schema, build_schema
+from alws.utils.task_notifier import get_build_topics, get_notify_query
 
 __all__ = ['start_build', 'build_done']
 
@@ -97,6 +98,11 @@ async def _start_build(build_id: int, build_request: build_schema.BuildCreate):
                     await planner.add_linked_builds(linked_build)
             db.flush()
             await planner.init_build_repos()
+            db.execute(
+                get_notify_query(
+                    get_build_topics(task.arch for task in build.tasks)
+                )
+            )
             db.commit()
         db.close()
 
@@ -1,13 +1,58 @@
+import logging
 import typing
+from contextlib import asynccontextmanager
 
 import dramatiq
 
 from alws.constants import DRAMATIQ_TASK_TIMEOUT
-from alws.crud.errata import release_errata_record, bulk_errata_records_release
+from alws.crud.errata import (
+    bulk_create_errata_records,
+    bulk_errata_records_release,
+    regenerate_oval_fragments,
+    release_errata_record,
+)
+from alws.dependencies import get_db
 from alws.dramatiq import event_loop
+from alws.schemas.errata_schema import BaseErrataRecord
 
 __all__ = ["release_errata"]
 
+# Number of errata records imported in one transaction
+ERRATA_IMPORT_CHUNK_SIZE = 500
+
+
+async def _bulk_errata_create(
+    records: typing.List[dict],
+    upsert: bool,
+):
+    for start in range(0, len(records), ERRATA_IMPORT_CHUNK_SIZE):
+        chunk = records[start : start + ERRATA_IMPORT_CHUNK_SIZE]
+        async with asynccontextmanager(get_db)() as db:
+            results = await bulk_create_errata_records(
+                db,
+                [BaseErrataRecord(**record) for record in chunk],
+                upsert=upsert,
+            )
+        for result in results:
+            if result["error"]:
+                logging.warning(
+                    "Cannot import errata record %s: %s",
+                    result["id"],
+                    result["error"],
+                )
+        logging.info(
+            "Imported errata records %d-%d of %d",
+            start + 1,
+            start + len(chunk),
+            len(records),
+        )
+
+
+async def _regenerate_oval(platform_names: typing.Optional[typing.List[str]]):
+    async with asynccontextmanager(get_db)() as db:
+        rendered = await regenerate_oval_fragments(db, platform_names)
+    logging.info("Regenerated OVAL fragments of %d errata records", rendered)
+
 
 @dramatiq.actor(
     max_retries=0,
@@ -27,3 +72,23 @@ def release_errata(record_id: str, force: bool):
 )
 def bulk_errata_release(records_ids: typing.List[str]):
     event_loop.run_until_complete(bulk_errata_records_release(records_ids))
+
+
+@dramatiq.actor(
+    max_retries=0,
+    priority=0,
+    queue_name="errata",
+    time_limit=DRAMATIQ_TASK_TIMEOUT,
+)
+def bulk_errata_create(records: typing.List[dict], upsert: bool):
+    event_loop.run_until_complete(_bulk_errata_create(records, upsert))
+
+
+@dramatiq.actor(
+    max_retries=0,
+    priority=0,
+    queue_name="errata",
+    time_limit=DRAMATIQ_TASK_TIMEOUT,
+)
+def regenerate_oval(platform_names: typing.Optional[typing.List[str]] = None):
+    event_loop.run_until_complete(_regenerate_oval(platform_names))
@@ -32,10 +32,13 @@ async def get_existing_packages(
         "location_href",
         "arch",
     ]
-    return await pulp_client.get_rpm_repository_packages(
-        repository.pulp_href,
-        include_fields=pulp_fields,
-    )
+    return [
+        package
+        async for package in pulp_client.iter_rpm_repository_packages(
+            repository.pulp_href,
+            include_fields=pulp_fields,
+        )
+    ]
 
 
 async def get_packages(
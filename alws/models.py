@@ -1,7 +1,7 @@
 import asyncio
 import datetime
 import re
-from typing import Dict, List
+from typing import Any, Dict, List, Optional
 
 import sqlalchemy
 from fastapi_users.db import (
@@ -11,12 +11,18 @@ from fastapi_users.db import (
 from fastapi_users_db_sqlalchemy.access_token import (
     SQLAlchemyBaseAccessTokenTable,
 )
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.ext.associationproxy import association_proxy
-from sqlalchemy.orm import declarative_mixin, declared_attr, relationship
+from sqlalchemy.orm import (
+    declarative_mixin,
+    declared_attr,
+    deferred,
+    relationship,
+)
 from sqlalchemy.sql import func
 
 from alws.constants import (
+    BuildTaskStatus,
     ErrataPackageStatus,
     ErrataReferenceType,
     ErrataReleaseStatus,
@@ -27,6 +33,7 @@ from alws.constants import (
     GenKeyStatus,
 )
 from alws.database import Base, engine
+from alws.utils.parsing import clean_release
 
 __all__ = [
     "Build",
@@ -552,6 +559,42 @@ class BuildTaskArtifact(Base):
         nullable=True,
     )
     sign_key = relationship("SignKey", back_populates="build_task_artifacts")
+    # Parsed NEVRA of RPM artifacts, used to match them with errata packages
+    rpm_name = sqlalchemy.Column(sqlalchemy.Text, nullable=True)
+    rpm_epoch = sqlalchemy.Column(sqlalchemy.Integer, nullable=True)
+    rpm_version = sqlalchemy.Column(sqlalchemy.Text, nullable=True)
+    rpm_clean_release = sqlalchemy.Column(sqlalchemy.Text, nullable=True)
+    rpm_arch = sqlalchemy.Column(sqlalchemy.Text, nullable=True)
+
+    __table_args__ = (
+        sqlalchemy.Index(
+            "build_artifacts_rpm_nevra_idx",
+            "rpm_name",
+            "rpm_version",
+            "rpm_clean_release",
+            "rpm_arch",
+        ),
+    )
+
+    def set_nevra(self, rpm_info: Optional[Dict[str, Any]] = None):
+        """
+        Fills parsed NEVRA columns from Pulp package info
+        or from the artifact file name, which doesn't include epoch.
+        """
+        if self.type != "rpm":
+            return
+        if rpm_info is None:
+            rpm_info = self.name_as_dict()
+            if not rpm_info:
+                return
+            rpm_info["epoch"] = None
+        self.rpm_name = rpm_info["name"]
+        self.rpm_epoch = (
+            int(rpm_info["epoch"]) if rpm_info["epoch"] is not None else None
+        )
+        self.rpm_version = rpm_info["version"]
+        self.rpm_clean_release = clean_release(rpm_info["release"])
+        self.rpm_arch = rpm_info["arch"]
 
     def name_as_dict(self) -> dict:
         result = re.search(
@@ -1255,6 +1298,34 @@ class ErrataRecord(Base):
 
     cves = association_proxy("references", "cve_id")
 
+    # Words of errata id and titles for the errata listing search,
+    # dashes and colons are replaced so "ALSA-2022:0123" gives
+    # "alsa", "2022" and "0123" lexemes
+    search_vector = deferred(
+        sqlalchemy.Column(
+            TSVECTOR,
+            sqlalchemy.Computed(
+                "to_tsvector('simple'::regconfig, translate("
+                "id || ' ' || coalesce(title, '') || ' ' || original_title, "
+                "'-:', '  '))",
+                persisted=True,
+            ),
+        )
+    )
+
+    __table_args__ = (
+        sqlalchemy.Index(
+            "errata_records_search_vector_idx",
+            "search_vector",
+            postgresql_using="gin",
+        ),
+        sqlalchemy.Index(
+            "errata_records_updated_date_id_idx",
+            "updated_date",
+            "id",
+        ),
+    )
+
     def get_description(self):
         if self.description:
             return self.description
@@ -1277,6 +1348,45 @@ class ErrataRecord(Base):
         }[self.id[2:4]]
 
 
+class ErrataOvalFragment(Base):
+    """
+    Rendered OVAL definition, tests, objects, states and variables
+    of a single errata record, used to assemble the platform OVAL
+    document without rendering every record again.
+    """
+
+    __tablename__ = "errata_oval_fragments"
+
+    errata_record_id = sqlalchemy.Column(
+        sqlalchemy.Text,
+        sqlalchemy.ForeignKey(
+            "errata_records.id",
+            name="errata_oval_fragment_errata_record_id_fk",
+            ondelete="CASCADE",
+        ),
+        primary_key=True,
+    )
+    platform_id = sqlalchemy.Column(
+        sqlalchemy.Integer,
+        sqlalchemy.ForeignKey(
+            "platforms.id",
+            name="errata_oval_fragment_platform_id_fk",
+            ondelete="CASCADE",
+        ),
+        nullable=False,
+        index=True,
+    )
+    # updated_date of the errata record at the moment of rendering
+    updated_date = sqlalchemy.Column(sqlalchemy.DateTime, nullable=False)
+    rendered_at = sqlalchemy.Column(
+        sqlalchemy.DateTime,
+        nullable=False,
+        default=func.current_timestamp(),
+    )
+    # NULL means the record doesn't go to OVAL at all
+    fragment = sqlalchemy.Column(JSONB, nullable=True)
+
+
 class ErrataReference(Base):
     __tablename__ = "errata_references"
 
@@ -1308,6 +1418,15 @@ class ErrataReference(Base):
         nullable=True,
     )
 
+    __table_args__ = (
+        # Allows prefix search of CVE ids with LIKE 'CVE-2022-%'
+        sqlalchemy.Index(
+            "errata_references_cve_id_pattern_idx",
+            "cve_id",
+            postgresql_ops={"cve_id": "text_pattern_ops"},
+        ),
+    )
+
 
 class ErrataCVE(Base):
     __tablename__ = "errata_cves"
@@ -1461,6 +1580,12 @@ idx_build_tasks_status_arch_ts = sqlalchemy.Index(
     BuildTask.arch,
     BuildTask.ts,
 )
+idx_build_tasks_ready_arch_id = sqlalchemy.Index(
+    "idx_build_tasks_ready_arch_id",
+    BuildTask.arch,
+    BuildTask.id,
+    postgresql_where=BuildTask.status < BuildTaskStatus.COMPLETED,
+)
 idx_build_tasks_build_id_index = sqlalchemy.Index(
     "idx_build_tasks_build_id_index",
     BuildTask.build_id,
@@ -41,6 +41,7 @@ from alws.perms import actions
 from alws.perms.authorization import can_perform
 from alws.pulp_models import RpmPackage
 from alws.schemas import release_schema
+from alws.utils.asyncio_utils import gather_with_concurrency
 from alws.utils.beholder_client import BeholderClient
 from alws.utils.debuginfo import clean_debug_name, is_debuginfo_rpm
 from alws.utils.measurements import class_measure_work_time_async
@@ -49,7 +50,7 @@ from alws.utils.parsing import get_clean_distr_name
 from alws.utils.pulp_client import PulpClient
 from alws.utils.pulp_utils import (
     get_rpm_packages_by_ids,
-    get_rpm_packages_from_repositories,
+    get_rpm_packages_by_nevras,
     get_rpm_packages_from_repository,
     get_uuid_from_pulp_href,
 )
@@ -216,7 +217,7 @@ class BaseReleasePlanner(metaclass=ABCMeta):
             RpmPackage.release,
             RpmPackage.arch,
         ]
-        pulp_packages = get_rpm_packages_by_ids(
+        pulp_packages = await get_rpm_packages_by_ids(
             [
                 get_uuid_from_pulp_href(rpm.artifact.href)
                 for rpm in build_rpms
@@ -237,15 +238,11 @@ class BaseReleasePlanner(metaclass=ABCMeta):
             for _, package in pulp_packages.items()
         ]
 
-    @class_measure_work_time_async("get_packages_info_pulp_and_db")
-    async def get_pulp_packages(
+    @class_measure_work_time_async("get_packages_info_db")
+    async def get_builds_for_release(
         self,
         build_ids: typing.List[int],
-        build_tasks: typing.Optional[typing.List[int]] = None,
-    ) -> typing.Tuple[typing.List[dict], typing.List[str], typing.List[dict]]:
-        src_rpm_names = []
-        pulp_packages = []
-
+    ) -> typing.List[models.Build]:
         builds_q = (
             select(models.Build)
             .where(models.Build.id.in_(build_ids))
@@ -266,87 +263,125 @@ class BaseReleasePlanner(metaclass=ABCMeta):
                 selectinload(models.Build.repos),
             )
         )
-        build_result = await self.db.execute(builds_q)
-        modules_to_release = defaultdict(list)
-        for build in build_result.scalars().all():
-            build_rpms = build.source_rpms + build.binary_rpms
-            pulp_artifacts = await self.get_pulp_packages_info(
-                build_rpms,
-                build_tasks,
-            )
-            pulp_artifacts = {
-                artifact_dict.pop("pulp_href"): artifact_dict
-                for artifact_dict in pulp_artifacts
-            }
-            for rpm in build_rpms:
+        return (await self.db.execute(builds_q)).scalars().all()
+
+    @class_measure_work_time_async("get_packages_info_modules_templates")
+    async def get_pulp_rpm_modules(
+        self,
+        builds: typing.List[models.Build],
+        build_tasks: typing.Collection[int],
+    ) -> typing.List[dict]:
+        modules_repos = {}
+        for build in builds:
+            build_repos = {}
+            for build_repo in build.repos:
+                if build_repo.debug or build_repo.type != "rpm":
+                    continue
+                build_repos.setdefault(build_repo.arch, build_repo)
+            for task in build.tasks:
+                if not task.rpm_module or task.id not in build_tasks:
+                    continue
+                key = (
+                    task.rpm_module.name,
+                    task.rpm_module.stream,
+                    task.rpm_module.version,
+                    task.rpm_module.arch,
+                )
+                if key in modules_repos:
+                    continue
+                modules_repos[key] = (build.id, build_repos[task.arch])
+        templates = await gather_with_concurrency(
+            settings.release_modules_concurrency,
+            *(
+                self.pulp_client.get_repo_modules_yaml(module_repo.url)
+                for _, module_repo in modules_repos.values()
+            ),
+        )
+        pulp_rpm_modules = []
+        for (build_id, _), template in zip(modules_repos.values(), templates):
+            module_index = IndexWrapper()
+            if template:
+                module_index = IndexWrapper.from_template(template)
+            for module in module_index.iter_modules():
+                # in some cases we have also devel module in template,
+                # we should add all modules from template
+                pulp_rpm_modules.append(
+                    {
+                        "build_id": build_id,
+                        "name": module.name,
+                        "stream": module.stream,
+                        "version": module.version,
+                        "context": module.context,
+                        "arch": module.arch,
+                        "template": module.render(),
+                    }
+                )
+        return pulp_rpm_modules
+
+    @class_measure_work_time_async("get_packages_info_pulp_and_db")
+    async def get_pulp_packages(
+        self,
+        build_ids: typing.List[int],
+        build_tasks: typing.Optional[typing.List[int]] = None,
+    ) -> typing.Tuple[typing.List[dict], typing.List[str], typing.List[dict]]:
+        src_rpm_names = []
+        pulp_packages = []
+
+        builds = await self.get_builds_for_release(build_ids)
+        # without explicit build tasks the whole builds are released,
+        # both their packages and module templates
+        if build_tasks is None:
+            build_tasks = {task.id for build in builds for task in build.tasks}
+        build_tasks = set(build_tasks)
+        builds_rpms = {
+            build.id: build.source_rpms + build.binary_rpms
+            for build in builds
+        }
+        # artifacts of all builds are requested at once,
+        # their ids are bound as a single array parameter
+        pulp_artifacts = await self.get_pulp_packages_info(
+            [rpm for build_rpms in builds_rpms.values() for rpm in build_rpms],
+            build_tasks,
+        )
+        pulp_artifacts = {
+            artifact_dict.pop("pulp_href"): artifact_dict
+            for artifact_dict in pulp_artifacts
+        }
+        for build in builds:
+            is_beta = self.is_beta_build(build)
+            tasks_arches = {task.id: task.arch for task in build.tasks}
+            for rpm in builds_rpms[build.id]:
                 artifact_task_id = rpm.artifact.build_task_id
-                if build_tasks and artifact_task_id not in build_tasks:
+                if artifact_task_id not in build_tasks:
                     continue
                 artifact_name = rpm.artifact.name
                 source_name = None
-                pkg_info = copy.deepcopy(pulp_artifacts[rpm.artifact.href])
-                pkg_info["is_beta"] = self.is_beta_build(build)
-                pkg_info["build_id"] = build.id
-                pkg_info["artifact_href"] = rpm.artifact.href
-                pkg_info["cas_hash"] = rpm.artifact.cas_hash
-                pkg_info["href_from_repo"] = None
-                pkg_info["full_name"] = artifact_name
-                build_task = next(
-                    task for task in build.tasks if task.id == artifact_task_id
-                )
-                pkg_info["task_arch"] = build_task.arch
-                pkg_info["force"] = False
-                pkg_info["force_not_notarized"] = False
                 source_rpm = getattr(rpm, "source_rpm", None)
                 if source_rpm:
                     source_name = source_rpm.artifact.name
                 if ".src.rpm" in artifact_name:
                     src_rpm_names.append(artifact_name)
                     source_name = artifact_name
-                pkg_info["source"] = source_name
-                pulp_packages.append(pkg_info)
-            for task in build.tasks:
-                if task.rpm_module and task.id in build_tasks:
-                    key = (
-                        task.rpm_module.name,
-                        task.rpm_module.stream,
-                        task.rpm_module.version,
-                        task.rpm_module.arch,
-                    )
-                    if key in modules_to_release:
-                        continue
-                    module_repo = next(
-                        build_repo
-                        for build_repo in task.build.repos
-                        if build_repo.arch == task.arch
-                        and not build_repo.debug
-                        and build_repo.type == "rpm"
-                    )
-                    template = await self.pulp_client.get_repo_modules_yaml(
-                        module_repo.url
-                    )
-                    module_index = IndexWrapper()
-                    if template:
-                        module_index = IndexWrapper.from_template(template)
-                    for module in module_index.iter_modules():
-                        # in some cases we have also devel module in template,
-                        # we should add all modules from template
-                        modules_to_release[key].append(
-                            {
-                                "build_id": build.id,
-                                "name": module.name,
-                                "stream": module.stream,
-                                "version": module.version,
-                                "context": module.context,
-                                "arch": module.arch,
-                                "template": module.render(),
-                            }
-                        )
-        pulp_rpm_modules = [
-            module_dict
-            for module_list in modules_to_release.values()
-            for module_dict in module_list
-        ]
+                # artifact dicts hold only scalars, a shallow copy is enough
+                pulp_packages.append(
+                    {
+                        **pulp_artifacts[rpm.artifact.href],
+                        "is_beta": is_beta,
+                        "build_id": build.id,
+                        "artifact_href": rpm.artifact.href,
+                        "cas_hash": rpm.artifact.cas_hash,
+                        "href_from_repo": None,
+                        "full_name": artifact_name,
+                        "task_arch": tasks_arches[artifact_task_id],
+                        "force": False,
+                        "force_not_notarized": False,
+                        "source": source_name,
+                    }
+                )
+        pulp_rpm_modules = await self.get_pulp_rpm_modules(
+            builds,
+            build_tasks,
+        )
         return pulp_packages, src_rpm_names, pulp_rpm_modules
 
     async def get_final_release(self, release_id: int) -> models.Release:
@@ -706,7 +741,7 @@ class CommunityReleasePlanner(BaseReleasePlanner):
             if repo.arch == "x86_64"
         ]
         for repo_id in x86_64_build_repos_ids:
-            for rpm_pkg in get_rpm_packages_from_repository(
+            for rpm_pkg in await get_rpm_packages_from_repository(
                 repo_id,
                 pkg_arches=["i686"],
             ):
@@ -947,42 +982,26 @@ class AlmaLinuxReleasePlanner(BaseReleasePlanner):
             pulp_repo_id = get_uuid_from_pulp_href(repo.pulp_href)
             repo_mapping[pulp_repo_id] = (repo.id, repo.arch)
 
-        pkg_names = []
-        pkg_epochs = []
-        pkg_versions = []
-        pkg_releases = []
-        pkg_arches = []
         pkgs_mapping = {}
         for package_info in packages_list:
             package = package_info["package"]
             nevra = PackageNevra(
                 package["name"],
-                package["epoch"],
+                str(package["epoch"]),
                 package["version"],
                 package["release"],
                 package["arch"],
             )
             pkgs_mapping[nevra] = package["full_name"]
-            for collection, key in (
-                (pkg_names, "name"),
-                (pkg_epochs, "epoch"),
-                (pkg_versions, "version"),
-                (pkg_releases, "release"),
-                (pkg_arches, "arch"),
-            ):
-                collection.append(package[key])
 
         packages_presence_info = defaultdict(list)
-        pulp_packages = get_rpm_packages_from_repositories(
-            repo_ids=list(repo_mapping),
-            pkg_names=pkg_names,
-            pkg_epochs=pkg_epochs,
-            pkg_versions=pkg_versions,
-            pkg_releases=pkg_releases,
-            pkg_arches=pkg_arches,
+        # only exact NEVRAs are matched, so every row is a real hit
+        pulp_packages = await get_rpm_packages_by_nevras(
+            list(repo_mapping),
+            pkgs_mapping,
         )
-        for pulp_pkg in pulp_packages:
-            full_name = pkgs_mapping.get(
+        for pulp_pkg, repo_id in pulp_packages:
+            full_name = pkgs_mapping[
                 PackageNevra(
                     pulp_pkg.name,
                     pulp_pkg.epoch,
@@ -990,16 +1009,10 @@ class AlmaLinuxReleasePlanner(BaseReleasePlanner):
                     pulp_pkg.release,
                     pulp_pkg.arch,
                 )
+            ]
+            packages_presence_info[full_name].append(
+                (pulp_pkg.pulp_href, *repo_mapping[repo_id]),
             )
-            if full_name is None:
-                continue
-            for repo_id in pulp_pkg.repo_ids:
-                repo_info = repo_mapping.get(repo_id)
-                if not repo_info:
-                    continue
-                packages_presence_info[full_name].append(
-                    (pulp_pkg.pulp_href, *repo_info),
-                )
 
         packages_from_repos = defaultdict(list)
         packages_in_repos = defaultdict(list)
@@ -1161,11 +1174,18 @@ class AlmaLinuxReleasePlanner(BaseReleasePlanner):
                     and priority >= cache_item["priority"]
                 ):
                     continue
-                replaced_pkg = copy.deepcopy(pkg)
-                for repo in replaced_pkg["repositories"]:
-                    if repo["arch"] == pkg["arch"]:
-                        repo["arch"] = weak_arch
-                beholder_cache[second_key] = replaced_pkg
+                # only repositories are changed, other values are shared
+                beholder_cache[second_key] = {
+                    **pkg,
+                    "repositories": [
+                        (
+                            {**repo, "arch": weak_arch}
+                            if repo["arch"] == pkg["arch"]
+                            else repo
+                        )
+                        for repo in pkg["repositories"]
+                    ],
+                }
 
     def find_release_repos(
         self,
@@ -1243,6 +1263,50 @@ class AlmaLinuxReleasePlanner(BaseReleasePlanner):
             release_repositories.add((release_repo, trustness, matched))
         return release_repositories
 
+    @class_measure_work_time_async("get_beholder_responses")
+    async def get_beholder_responses(
+        self,
+        platforms_list: typing.List[models.Platform],
+        modules_lookups: typing.List[
+            typing.Tuple[str, str, typing.Tuple[str, ...]]
+        ],
+        src_rpm_names: typing.List[str],
+    ) -> typing.Tuple[typing.List[typing.List[dict]], typing.List[dict]]:
+        """
+        Asks Beholder about all modules and source RPMs of the release
+        at once. Identical module lookups are sent once and all source RPMs
+        go in a single bulk request per reference platform.
+        Returns module responses in the order of lookups
+        and source RPMs responses.
+        """
+        unique_lookups = list(dict.fromkeys(modules_lookups))
+        *lookups_responses, src_responses = await gather_with_concurrency(
+            settings.beholder_concurrency,
+            *(
+                self._beholder_client.retrieve_responses(
+                    platforms_list,
+                    module_name=module_name,
+                    module_stream=module_stream,
+                    module_arch_list=list(module_arch_list),
+                )
+                for module_name, module_stream, module_arch_list in (
+                    unique_lookups
+                )
+            ),
+            self._beholder_client.retrieve_responses(
+                platforms_list,
+                data={
+                    "source_rpms": list(dict.fromkeys(src_rpm_names)),
+                    "match": BeholderMatchMethod.all(),
+                },
+            ),
+        )
+        responses_by_lookup = dict(zip(unique_lookups, lookups_responses))
+        return (
+            [responses_by_lookup[lookup] for lookup in modules_lookups],
+            src_responses,
+        )
+
     @staticmethod
     def _beholder_matched_to_priority(matched: str) -> int:
         priority = LOWEST_PRIORITY
@@ -1310,24 +1374,32 @@ class AlmaLinuxReleasePlanner(BaseReleasePlanner):
                 prod_repos=prod_repos,
             )
 
+        platforms_list = base_platform.reference_platforms + [base_platform]
+        modules_lookups = []
         for module in pulp_rpm_modules:
-            module_name = module["name"]
-            module_stream = module["stream"]
             module_arch_list = [module["arch"]]
-            module_nvsca = (
-                f"{module_name}:{module['version']}:{module_stream}:"
-                f"{module['context']}:{module['arch']}"
-            )
             for strong_arch, weak_arches in strong_arches.items():
                 if module["arch"] in weak_arches:
                     module_arch_list.append(strong_arch)
+            modules_lookups.append(
+                (module["name"], module["stream"], tuple(module_arch_list))
+            )
+        (
+            modules_responses,
+            beholder_responses,
+        ) = await self.get_beholder_responses(
+            platforms_list,
+            modules_lookups,
+            src_rpm_names,
+        )
 
-            platforms_list = base_platform.reference_platforms + [base_platform]
-            module_responses = await self._beholder_client.retrieve_responses(
-                platforms_list,
-                module_name=module_name,
-                module_stream=module_stream,
-                module_arch_list=module_arch_list,
+        for module, module_responses in zip(
+            pulp_rpm_modules,
+            modules_responses,
+        ):
+            module_nvsca = (
+                f"{module['name']}:{module['version']}:{module['stream']}:"
+                f"{module['context']}:{module['arch']}"
             )
             module_info = {"module": module, "repositories": []}
             if not module_responses:
@@ -1400,12 +1472,6 @@ class AlmaLinuxReleasePlanner(BaseReleasePlanner):
                     continue
                 module_info["repositories"].append(module_repo_dict)
 
-        platforms_list = base_platform.reference_platforms + [base_platform]
-        beholder_responses = await self._beholder_client.retrieve_responses(
-            platforms_list,
-            data={"source_rpms": src_rpm_names, "match": BeholderMatchMethod.all()},
-        )
-
         for beholder_response in beholder_responses:
             distr = beholder_response["distribution"]
             is_beta = distr["version"].endswith("-beta")
@@ -1577,17 +1643,18 @@ class AlmaLinuxReleasePlanner(BaseReleasePlanner):
                 "Cannot execute plan with empty packages or repositories: "
                 "{packages}, {repositories}".format_map(release.plan)
             )
-        for build_id in release.build_ids:
-            try:
-                verified = await sign_task.verify_signed_build(
-                    self.db, build_id, release.platform.id
-                )
-            except (DataNotFoundError, ValueError, SignError) as e:
-                msg = f"The build {build_id} was not verified, because\n{e}"
-                raise SignError(msg)
-            if not verified:
-                msg = f"Cannot execute plan with wrong singing of {build_id}"
-                raise SignError(msg)
+        verdicts = await sign_task.verify_signed_builds(
+            self.db, release.build_ids, release.platform.id
+        )
+        # all builds are checked, so the report lists every failed one
+        not_verified = [
+            f"The build {build_id} was not verified, because\n"
+            f"{verdict['reason']}"
+            for build_id, verdict in verdicts.items()
+            if not verdict["verified"]
+        ]
+        if not_verified:
+            raise SignError("\n".join(not_verified))
 
         # check packages presence in prod repos
         self.base_platform = release.platform
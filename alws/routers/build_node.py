@@ -1,3 +1,4 @@
+import copy
 import datetime
 import itertools
 import typing
@@ -5,13 +6,15 @@ import typing
 from fastapi import APIRouter, Depends, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from alws import dramatiq
+from alws import dramatiq, models
 from alws.auth import get_current_user
 from alws.config import settings
 from alws.constants import BuildTaskRefType, BuildTaskStatus
 from alws.crud import build_node
 from alws.dependencies import get_db
 from alws.schemas import build_node_schema
+from alws.utils.heartbeat import heartbeat_writer
+from alws.utils.task_notifier import get_build_topics, wait_for_tasks
 
 router = APIRouter(
     prefix="/build_node",
@@ -27,6 +30,9 @@ async def ping(
 ):
     if not node_status.active_tasks:
         return {}
+    if heartbeat_writer.is_running:
+        heartbeat_writer.add(node_status.active_tasks)
+        return {}
     await build_node.ping_tasks(db, node_status.active_tasks)
     return {}
 
@@ -51,17 +57,50 @@ async def build_done(
     return {"ok": True}
 
 
-@router.post(
-    "/get_task",
-    response_model=typing.Optional[build_node_schema.Task],
-)
-async def get_task(
-    request: build_node_schema.RequestTask,
-    db: AsyncSession = Depends(get_db),
-):
-    task = await build_node.get_available_build_task(db, request)
-    if not task:
-        return
+def get_build_context(
+    task: models.BuildTask,
+) -> typing.Dict[str, typing.Any]:
+    # Parts of the task payload which depend only on a build,
+    # so they can be shared between tasks from the same build
+    build = task.build
+    repositories = [repo for repo in build.repos if repo.type != "build_log"]
+    for linked_build in build.linked_builds:
+        repositories.extend(
+            repo for repo in linked_build.repos if repo.type != "build_log"
+        )
+    flavour_repositories = []
+    mock_macros = {}
+    definitions = {}
+    for flavour in build.platform_flavors or []:
+        if flavour.data:
+            for key in ("macros", "secure_boot_macros"):
+                if (
+                    "mock" not in flavour.data
+                    or key not in flavour.data["mock"]
+                ):
+                    continue
+                mock_macros.setdefault(key, {}).update(
+                    flavour.data["mock"][key]
+                )
+            if "definitions" in flavour.data:
+                definitions.update(flavour.data["definitions"])
+        flavour_repositories.extend(flavour.repos)
+    return {
+        "repositories": repositories,
+        "flavour_repositories": flavour_repositories,
+        "mock_macros": mock_macros,
+        "definitions": definitions,
+        "created_by": {
+            "name": build.owner.username,
+            "email": build.owner.email,
+        },
+    }
+
+
+def get_task_response(
+    task: models.BuildTask,
+    build_context: typing.Dict[str, typing.Any],
+) -> typing.Dict[str, typing.Any]:
     # generate full url to builted SRPM for using less memory in database
     built_srpm_url = task.built_srpm_url
     srpm_hash = None
@@ -77,50 +116,41 @@ async def get_task(
             ),
             None,
         )
+    # platform data is modified below, so tasks of the same platform
+    # shouldn't share it
+    platform = build_node_schema.TaskPlatform(
+        name=task.platform.name,
+        type=task.platform.type,
+        data=copy.deepcopy(task.platform.data),
+    )
     response = {
         "id": task.id,
         "arch": task.arch,
         "build_id": task.build_id,
         "ref": task.ref,
-        "platform": build_node_schema.TaskPlatform.from_orm(task.platform),
+        "platform": platform,
         "repositories": [],
         "built_srpm_url": built_srpm_url,
         "is_secure_boot": task.is_secure_boot,
         "alma_commit_cas_hash": task.alma_commit_cas_hash,
         "srpm_hash": srpm_hash,
-        "created_by": {
-            "name": task.build.owner.username,
-            "email": task.build.owner.email,
-        },
+        "created_by": build_context["created_by"],
     }
-    for repo in itertools.chain(task.platform.repos, task.build.repos):
+    for repo in itertools.chain(
+        task.platform.repos,
+        build_context["repositories"],
+    ):
         if repo.arch == task.arch and repo.type != "build_log":
             response["repositories"].append(repo)
-    for build in task.build.linked_builds:
-        for repo in build.repos:
-            if repo.arch == task.arch and repo.type != "build_log":
-                response["repositories"].append(repo)
-    if task.build.platform_flavors:
-        for flavour in task.build.platform_flavors:
-            if flavour.data:
-                for key in ("macros", "secure_boot_macros"):
-                    if (
-                        "mock" not in flavour.data
-                        or key not in flavour.data["mock"]
-                    ):
-                        continue
-                    if key not in response["platform"].data["mock"]:
-                        response["platform"].data["mock"][key] = {}
-                    response["platform"].data["mock"][key].update(
-                        flavour.data["mock"][key]
-                    )
-                if "definitions" in flavour.data:
-                    response["platform"].data["definitions"].update(
-                        flavour.data["definitions"]
-                    )
-            for repo in flavour.repos:
-                if repo.arch == task.arch:
-                    response["repositories"].append(repo)
+    for key, macros in build_context["mock_macros"].items():
+        if key not in platform.data["mock"]:
+            platform.data["mock"][key] = {}
+        platform.data["mock"][key].update(macros)
+    if build_context["definitions"]:
+        platform.data["definitions"].update(build_context["definitions"])
+    for repo in build_context["flavour_repositories"]:
+        if repo.arch == task.arch:
+            response["repositories"].append(repo)
 
     # TODO: Get rid of this fixes when all affected builds would be processed
     # mock_enabled flag can be None for old build/flavour/platform repos
@@ -132,9 +162,9 @@ async def get_task(
         task.ref.ref_type = BuildTaskRefType.GIT_BRANCH
 
     if task.build.mock_options:
-        response["platform"].add_mock_options(task.build.mock_options)
+        platform.add_mock_options(task.build.mock_options)
     if task.mock_options:
-        response["platform"].add_mock_options(task.mock_options)
+        platform.add_mock_options(task.mock_options)
     if task.rpm_module:
         module = task.rpm_module
         module_build_options = {
@@ -148,5 +178,47 @@ async def get_task(
                 ]),
             }
         }
-        response["platform"].add_mock_options(module_build_options)
+        platform.add_mock_options(module_build_options)
+    return response
+
+
+@router.post(
+    "/get_task",
+    response_model=typing.Optional[build_node_schema.Task],
+)
+async def get_task(
+    request: build_node_schema.RequestTask,
+):
+    task = await wait_for_tasks(
+        lambda db: build_node.get_available_build_task(db, request),
+        get_build_topics(request.supported_arches),
+        timeout=request.wait_timeout,
+    )
+    if not task:
+        return
+    return get_task_response(task, get_build_context(task))
+
+
+@router.post(
+    "/get_tasks",
+    response_model=typing.List[build_node_schema.Task],
+)
+async def get_tasks(
+    request: build_node_schema.RequestTasks,
+):
+    tasks = await wait_for_tasks(
+        lambda db: build_node.get_available_build_tasks(
+            db,
+            request.supported_arches,
+            max_tasks=request.max_tasks,
+        ),
+        get_build_topics(request.supported_arches),
+        timeout=request.wait_timeout,
+    )
+    build_contexts = {}
+    response = []
+    for task in tasks:
+        if task.build_id not in build_contexts:
+            build_contexts[task.build_id] = get_build_context(task)
+        response.append(get_task_response(task, build_contexts[task.build_id]))
     return response
@@ -1,14 +1,20 @@
+import datetime
 from typing import Annotated, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from alws.auth import get_current_user
 from alws.constants import ErrataReleaseStatus
 from alws.crud import errata as errata_crud
 from alws.dependencies import get_db
-from alws.dramatiq import bulk_errata_release, release_errata
+from alws.dramatiq import (
+    bulk_errata_create,
+    bulk_errata_release,
+    release_errata,
+)
+from alws.dramatiq.errata import ERRATA_IMPORT_CHUNK_SIZE
 from alws.schemas import errata_schema
 
 router = APIRouter(
@@ -30,6 +36,40 @@ async def create_errata_record(
     return {"ok": bool(record)}
 
 
+@router.post(
+    "/bulk_create/",
+    response_model=List[errata_schema.BulkCreateErrataResult],
+)
+async def bulk_create_errata_records(
+    records: List[errata_schema.BaseErrataRecord],
+    upsert: bool = False,
+    db: AsyncSession = Depends(get_db),
+):
+    return await errata_crud.bulk_create_errata_records(
+        db,
+        records,
+        upsert=upsert,
+    )
+
+
+@router.post("/bulk_create_async/")
+async def bulk_create_errata_records_async(
+    records: List[errata_schema.BaseErrataRecord],
+    upsert: bool = False,
+):
+    # every chunk goes in its own message,
+    # so a large import doesn't become a single huge one
+    for start in range(0, len(records), ERRATA_IMPORT_CHUNK_SIZE):
+        bulk_errata_create.send(
+            [
+                record.model_dump(mode="json")
+                for record in records[start : start + ERRATA_IMPORT_CHUNK_SIZE]
+            ],
+            upsert,
+        )
+    return {"message": f"{len(records)} errata records are scheduled"}
+
+
 @router.get("/", response_model=errata_schema.ErrataRecord)
 async def get_errata_record(
     errata_id: str,
@@ -52,7 +92,11 @@ async def get_oval_xml(
     platform_name: str,
     db: AsyncSession = Depends(get_db),
 ):
-    return await errata_crud.get_oval_xml(db, platform_name)
+    oval_xml = await errata_crud.get_oval_xml(db, platform_name)
+    return StreamingResponse(
+        errata_crud.iter_oval_xml_json(oval_xml),
+        media_type="application/json",
+    )
 
 
 @router.get("/query/", response_model=errata_schema.ErrataListResponse)
@@ -64,6 +108,11 @@ async def list_errata_records(
     platformId: Optional[int] = None,
     cveId: Optional[str] = None,
     status: Optional[ErrataReleaseStatus] = None,
+    search: Optional[str] = None,
+    keyset: bool = False,
+    afterUpdatedDate: Optional[datetime.datetime] = None,
+    afterId: Optional[str] = None,
+    estimateTotal: bool = False,
     db: AsyncSession = Depends(get_db),
 ):
     return await errata_crud.list_errata_records(
@@ -75,9 +124,38 @@ async def list_errata_records(
         platform=platformId,
         cve_id=cveId,
         status=status,
+        search=search,
+        keyset=keyset,
+        after_updated_date=afterUpdatedDate,
+        after_id=afterId,
+        estimate_total=estimateTotal,
     )
 
 
+@router.get(
+    "/updateinfo/",
+    response_class=PlainTextResponse,
+)
+async def get_bulk_updateinfo_xml(
+    ids: Annotated[List[str], Query()],
+):
+    if len(ids) > errata_crud.UPDATEINFO_MAX_RECORDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=(
+                "Cannot get updateinfo.xml for more than "
+                f"{errata_crud.UPDATEINFO_MAX_RECORDS} records at once"
+            ),
+        )
+    updateinfo_xml = await errata_crud.get_bulk_updateinfo_xml_from_pulp(ids)
+    if updateinfo_xml is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unable to find errata records with {ids=} in pulp",
+        )
+    return updateinfo_xml
+
+
 @router.get(
     "/{record_id}/updateinfo/",
     response_class=PlainTextResponse,
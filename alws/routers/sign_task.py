@@ -11,6 +11,7 @@ from alws.auth import get_current_user
 from alws.crud import sign_task
 from alws.dependencies import get_db, get_redis
 from alws.schemas import sign_schema
+from alws.utils.task_notifier import get_sign_topics, wait_for_tasks
 
 router = APIRouter(
     prefix='/sign-tasks',
@@ -44,10 +45,12 @@ async def create_sign_task(
     '/get_sign_task/',
     response_model=typing.Union[dict, sign_schema.AvailableSignTask],
 )
-async def get_available_sign_task(
-    payload: sign_schema.SignTaskGet, db: database.Session = Depends(get_db)
-):
-    result = await sign_task.get_available_sign_task(db, payload.key_ids)
+async def get_available_sign_task(payload: sign_schema.SignTaskGet):
+    result = await wait_for_tasks(
+        lambda db: sign_task.get_available_sign_task(db, payload.key_ids),
+        get_sign_topics(payload.key_ids),
+        timeout=payload.wait_timeout,
+    )
     if any([
         not result.get(item)
         for item in ['build_id', 'id', 'keyid', 'packages']
@@ -8,6 +8,7 @@ from alws.auth import get_current_user
 from alws.crud import test
 from alws.dependencies import get_db
 from alws.schemas import test_schema
+from alws.utils.task_notifier import get_test_topics, wait_for_tasks
 
 router = APIRouter(
     prefix='/tests',
@@ -34,8 +35,12 @@ async def update_test_task_result(
     '/get_test_tasks/',
     response_model=List[test_schema.TestTaskPayload],
 )
-async def get_test_tasks(session: AsyncSession = Depends(get_db)):
-    return await test.get_available_test_tasks(session)
+async def get_test_tasks(wait_timeout: int = 0):
+    return await wait_for_tasks(
+        test.get_available_test_tasks,
+        get_test_topics(),
+        timeout=wait_timeout,
+    )
 
 
 @router.put('/build/{build_id}/restart')
@@ -1,7 +1,8 @@
 import typing
 
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 
+from alws.config import settings
 from alws.utils.debuginfo import is_debuginfo_rpm
 
 __all__ = ['Task']
@@ -121,3 +122,20 @@ class BuildDone(BaseModel):
 
 class RequestTask(BaseModel):
     supported_arches: typing.List[str]
+    # seconds to wait for a task if there are no available ones right now
+    wait_timeout: int = 0
+
+
+class RequestTasks(RequestTask):
+    max_tasks: int = 1
+
+    @field_validator('max_tasks')
+    def max_tasks_validator(cls, value: int) -> int:
+        if value < 1:
+            raise ValueError('max_tasks should be a positive number')
+        if value > settings.build_node_max_tasks_per_request:
+            raise ValueError(
+                'max_tasks should not exceed '
+                f'{settings.build_node_max_tasks_per_request}'
+            )
+        return value
@@ -116,7 +116,11 @@ class ErrataRecord(BaseErrataRecord):
 class ErrataListResponse(BaseModel):
     records: List[ErrataRecord]
     total_records: Optional[int] = None
+    total_records_estimated: bool = False
     current_page: Optional[int] = None
+    # Cursor of the next page for the keyset pagination
+    next_updated_date: Optional[datetime.datetime] = None
+    next_id: Optional[str] = None
 
 
 class CompactErrataRecord(BaseModel):
@@ -128,6 +132,13 @@ class CreateErrataResponse(BaseModel):
     ok: bool
 
 
+class BulkCreateErrataResult(BaseModel):
+    id: str
+    # created, updated or skipped
+    action: str
+    error: Optional[str] = None
+
+
 class ChangeErrataPackageStatusResponse(BaseModel):
     ok: bool
     error: Optional[str] = None
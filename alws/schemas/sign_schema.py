@@ -61,6 +61,7 @@ class SignTaskCreate(BaseModel):
 
 class SignTaskGet(BaseModel):
     key_ids: typing.List[str]
+    wait_timeout: int = 0
 
 
 class SignRpmInfo(BaseModel):
@@ -1,23 +1,39 @@
+import asyncio
+import collections
 import copy
+import hashlib
 import json
 import logging
 import typing
 import urllib.parse
 
 import aiohttp
+import aioredis
 
+from alws.config import settings
 from alws.constants import REQUEST_TIMEOUT, LOWEST_PRIORITY
 from alws.models import Platform
 from alws.utils.parsing import get_clean_distr_name
 
 
 class BeholderClient:
+    # Responses are shared between all clients through Redis,
+    # identical requests running at the same time are sent once
+    _redis: typing.Optional[aioredis.Redis] = None
+    _redis_loop: typing.Optional[asyncio.AbstractEventLoop] = None
+    _in_flight: typing.Dict[str, asyncio.Future] = {}
+    cache_stats: typing.Counter[str] = collections.Counter()
+
     def __init__(
         self,
         host: str,
         token: str = "",
+        cache_ttl: typing.Optional[int] = None,
     ):
         self._host = host
+        if cache_ttl is None:
+            cache_ttl = settings.beholder_cache_ttl
+        self._cache_ttl = cache_ttl
         self._headers = {}
         if token:
             self._headers.update(
@@ -49,39 +65,88 @@ class BeholderClient:
             )
         return endpoints
 
+    async def _request_endpoints(
+        self,
+        endpoints: typing.Iterable[str],
+        data: typing.Optional[typing.Union[dict, list]] = None,
+        concurrency: typing.Optional[int] = None,
+        timeout: typing.Optional[float] = None,
+    ) -> typing.AsyncIterable[typing.Tuple[int, dict]]:
+        semaphore = asyncio.Semaphore(
+            concurrency or settings.beholder_concurrency
+        )
+        timeout = timeout or settings.beholder_endpoint_timeout
+
+        async def request(idx: int, endpoint: str):
+            async with semaphore:
+                try:
+                    if data:
+                        coro = self.post(endpoint, data)
+                    else:
+                        coro = self.get(endpoint)
+                    return idx, await asyncio.wait_for(coro, timeout)
+                except Exception:
+                    logging.error(
+                        "Cannot retrieve beholder info from %s, "
+                        "trying next reference platform",
+                        endpoint,
+                    )
+                    return idx, None
+
+        tasks = [
+            asyncio.ensure_future(request(idx, endpoint))
+            for idx, endpoint in enumerate(endpoints)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                idx, response = await next_done
+                if response is not None:
+                    yield idx, response
+        finally:
+            # the caller has stopped consuming responses
+            for task in tasks:
+                task.cancel()
+
     async def iter_endpoints(
         self,
         endpoints: typing.Iterable[str],
         data: typing.Optional[typing.Union[dict, list]] = None,
+        concurrency: typing.Optional[int] = None,
+        timeout: typing.Optional[float] = None,
     ) -> typing.AsyncIterable[dict]:
-        for endpoint in endpoints:
-            try:
-                coro = self.get(endpoint)
-                if data:
-                    coro = self.post(endpoint, data)
-                yield await coro
-            except Exception:
-                logging.error(
-                    "Cannot retrieve beholder info, "
-                    "trying next reference platform"
-                )
+        """
+        Requests endpoints concurrently and yields responses as soon as
+        they arrive. Endpoints which fail or don't answer within
+        the timeout are skipped.
+        """
+        async for _, response in self._request_endpoints(
+            endpoints, data, concurrency, timeout
+        ):
+            yield response
 
-    async def retrieve_responses(
+    async def iter_responses(
         self,
         platforms: typing.List[Platform],
         module_name: str = "",
         module_stream: str = "",
         module_arch_list: typing.Optional[typing.List[str]] = None,
         data: typing.Optional[typing.Union[dict, list]] = None,
-    ) -> typing.List[dict]:
+        concurrency: typing.Optional[int] = None,
+        timeout: typing.Optional[float] = None,
+    ) -> typing.AsyncIterable[typing.Tuple[int, dict]]:
+        """
+        Yields responses of reference platforms in the order they arrive,
+        along with the index of the endpoint they come from.
+        """
         endpoints = self.create_endpoints(
             platforms,
             module_name,
             module_stream,
             module_arch_list,
         )
-        responses = []
-        async for response in self.iter_endpoints(endpoints, data):
+        async for idx, response in self._request_endpoints(
+            endpoints, data, concurrency, timeout
+        ):
             response_distr_name = response["distribution"]["name"]
             response_distr_ver = response["distribution"]["version"]
             response["priority"] = next(
@@ -92,8 +157,29 @@ class BeholderClient:
             )
             # we have priority only in ref platforms
             response["priority"] = response.get("priority") or LOWEST_PRIORITY
-            responses.append(response)
-        return sorted(responses, key=lambda x: x["priority"], reverse=True)
+            yield idx, response
+
+    async def retrieve_responses(
+        self,
+        platforms: typing.List[Platform],
+        module_name: str = "",
+        module_stream: str = "",
+        module_arch_list: typing.Optional[typing.List[str]] = None,
+        data: typing.Optional[typing.Union[dict, list]] = None,
+    ) -> typing.List[dict]:
+        responses = [
+            item
+            async for item in self.iter_responses(
+                platforms,
+                module_name,
+                module_stream,
+                module_arch_list,
+                data,
+            )
+        ]
+        # responses of the same priority keep the endpoints order
+        responses.sort(key=lambda item: (-item[1]["priority"], item[0]))
+        return [response for _, response in responses]
 
     def _get_url(self, endpoint: str) -> str:
         return urllib.parse.urljoin(self._host, endpoint)
@@ -136,6 +222,71 @@ class BeholderClient:
                 pass
         return result
 
+    @classmethod
+    def get_redis(cls) -> aioredis.Redis:
+        loop = asyncio.get_running_loop()
+        if cls._redis is None or cls._redis_loop is not loop:
+            # connections can't be used from another event loop
+            cls._redis = aioredis.from_url(settings.redis_url)
+            cls._redis_loop = loop
+            cls._in_flight = {}
+        return cls._redis
+
+    def _get_cache_key(
+        self,
+        method: str,
+        endpoint: str,
+        payload: typing.Any = None,
+    ) -> str:
+        request_hash = hashlib.sha256(
+            json.dumps(payload, sort_keys=True).encode()
+        ).hexdigest()
+        return f"beholder:{method}:{self._get_url(endpoint)}:{request_hash}"
+
+    async def _load_or_send(
+        self,
+        key: str,
+        send: typing.Callable[[], typing.Awaitable[bytes]],
+    ) -> bytes:
+        redis = None
+        content = None
+        try:
+            redis = self.get_redis()
+            content = await redis.get(key)
+        except Exception:
+            logging.exception("Cannot load beholder response from cache")
+        if content is not None:
+            self.cache_stats["hits"] += 1
+            return content
+        self.cache_stats["misses"] += 1
+        content = await send()
+        if redis is not None:
+            try:
+                await redis.set(key, content, ex=self._cache_ttl)
+            except Exception:
+                logging.exception("Cannot save beholder response to cache")
+        return content
+
+    async def _cached_request(
+        self,
+        key: str,
+        send: typing.Callable[[], typing.Awaitable[bytes]],
+    ):
+        if not self._cache_ttl:
+            return json.loads(await send())
+        self.get_redis()
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._load_or_send(key, send))
+            self._in_flight[key] = future
+            future.add_done_callback(
+                lambda _: self._in_flight.pop(key, None)
+            )
+        else:
+            self.cache_stats["coalesced"] += 1
+        # every caller gets its own copy of the response to modify
+        return json.loads(await asyncio.shield(future))
+
     async def get(
         self,
         endpoint: str,
@@ -146,33 +297,42 @@ class BeholderClient:
         if headers:
             req_headers.update(**headers)
         full_url = self._get_url(endpoint)
-        async with aiohttp.ClientSession(
-            headers=req_headers,
-            raise_for_status=True,
-        ) as session:
-            async with session.get(
-                full_url,
-                params=params,
-                timeout=self.__timeout,
-            ) as response:
-                data = await response.read()
-                json_data = json.loads(data)
-                return json_data
+
+        async def send() -> bytes:
+            async with aiohttp.ClientSession(
+                headers=req_headers,
+                raise_for_status=True,
+            ) as session:
+                async with session.get(
+                    full_url,
+                    params=params,
+                    timeout=self.__timeout,
+                ) as response:
+                    return await response.read()
+
+        return await self._cached_request(
+            self._get_cache_key("get", endpoint, params),
+            send,
+        )
 
     async def post(
         self,
         endpoint: str,
         data: typing.Union[dict, list],
     ):
-        async with aiohttp.ClientSession(
-            headers=self._headers,
-            raise_for_status=True,
-        ) as session:
-            async with session.post(
-                self._get_url(endpoint),
-                json=data,
-                timeout=self.__timeout,
-            ) as response:
-                content = await response.read()
-                json_data = json.loads(content)
-                return json_data
+        async def send() -> bytes:
+            async with aiohttp.ClientSession(
+                headers=self._headers,
+                raise_for_status=True,
+            ) as session:
+                async with session.post(
+                    self._get_url(endpoint),
+                    json=data,
+                    timeout=self.__timeout,
+                ) as response:
+                    return await response.read()
+
+        return await self._cached_request(
+            self._get_cache_key("post", endpoint, data),
+            send,
+        )
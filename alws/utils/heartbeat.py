@@ -0,0 +1,75 @@
+import asyncio
+import contextlib
+import datetime
+import logging
+import typing
+from contextlib import asynccontextmanager
+
+from alws.config import settings
+from alws.crud import build_node
+from alws.dependencies import get_db
+
+__all__ = ['HeartbeatWriter', 'heartbeat_writer']
+
+
+class HeartbeatWriter:
+    """
+    Collects build nodes pings in memory and writes them to the database
+    once per flush interval, so every ping doesn't become
+    a separate write transaction on the build_tasks table.
+    Each web server worker keeps its own buffer.
+    """
+
+    def __init__(self, flush_interval: typing.Optional[int] = None):
+        self._flush_interval = flush_interval
+        self._pings: typing.Dict[int, datetime.datetime] = {}
+        self._flush_task: typing.Optional[asyncio.Task] = None
+
+    @property
+    def flush_interval(self) -> int:
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return settings.build_task_ping_flush_interval
+
+    @property
+    def is_running(self) -> bool:
+        return self._flush_task is not None
+
+    def add(self, task_ids: typing.Iterable[int]):
+        now = datetime.datetime.utcnow()
+        for task_id in task_ids:
+            self._pings[task_id] = now
+
+    async def flush(self):
+        if not self._pings:
+            return
+        pings, self._pings = self._pings, {}
+        try:
+            async with asynccontextmanager(get_db)() as db:
+                await build_node.bulk_ping_tasks(db, pings)
+        except Exception:
+            logging.exception('Cannot write %d build tasks pings', len(pings))
+            # keep the pings for the next flush unless newer ones arrived
+            for task_id, ts in pings.items():
+                self._pings.setdefault(task_id, ts)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self):
+        if self._flush_task is None and self.flush_interval > 0:
+            self._flush_task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._flush_task is None:
+            return
+        self._flush_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._flush_task
+        self._flush_task = None
+        await self.flush()
+
+
+heartbeat_writer = HeartbeatWriter()
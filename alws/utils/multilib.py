@@ -15,7 +15,7 @@ from alws.pulp_models import RpmPackage
 from alws.utils.beholder_client import BeholderClient
 from alws.utils.debuginfo import is_debuginfo_rpm
 from alws.utils.modularity import IndexWrapper
-from alws.utils.parsing import get_clean_distr_name
+from alws.utils.parsing import clean_release, get_clean_distr_name
 from alws.utils.pulp_client import PulpClient
 from alws.utils.pulp_utils import (
     get_rpm_packages_by_ids,
@@ -244,7 +244,7 @@ class MultilibProcessor:
         db_artifacts = await get_build_task_artifacts(
             self._db, self._build_task
         )
-        pulp_packages = self.get_packages_info_from_pulp(db_artifacts)
+        pulp_packages = await self.get_packages_info_from_pulp(db_artifacts)
         for artifact in db_artifacts:
             href = artifact.href
             rpm_pkg = pulp_packages[artifact.href]
@@ -262,6 +262,11 @@ class MultilibProcessor:
                             type=artifact.type,
                             href=href,
                             cas_hash=artifact.cas_hash,
+                            rpm_name=rpm_pkg.name,
+                            rpm_epoch=int(rpm_pkg.epoch),
+                            rpm_version=rpm_pkg.version,
+                            rpm_clean_release=clean_release(rpm_pkg.release),
+                            rpm_arch=rpm_pkg.arch,
                         )
                     )
                     targer_arr = (
@@ -291,11 +296,11 @@ class MultilibProcessor:
             ),
         )
 
-    def get_packages_info_from_pulp(
+    async def get_packages_info_from_pulp(
         self,
         rpm_packages: typing.List[models.BuildTaskArtifact],
     ) -> typing.Dict[str, RpmPackage]:
-        return get_rpm_packages_by_ids(
+        return await get_rpm_packages_by_ids(
             [get_uuid_from_pulp_href(rpm.href) for rpm in rpm_packages],
             [
                 RpmPackage.content_ptr_id,
@@ -360,8 +365,10 @@ class MultilibProcessor:
         try:
             packages = [
                 pkg.as_dict()
-                for pkg in self.get_packages_info_from_pulp(
-                    packages_to_process.values()
+                for pkg in (
+                    await self.get_packages_info_from_pulp(
+                        packages_to_process.values()
+                    )
                 ).values()
             ]
             module_name = self._build_task.rpm_module.name
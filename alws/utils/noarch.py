@@ -119,6 +119,7 @@ async def save_noarch_packages(
                 href=href,
                 cas_hash=cas_hash,
             )
+            artifact.set_nevra()
             new_noarch_artifacts.append(artifact)
             if task.id != build_task.id:
                 binary_rpm = models.BinaryRpm()
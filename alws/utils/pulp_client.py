@@ -1,4 +1,5 @@
 import asyncio
+import collections
 import io
 import json
 import logging
@@ -23,10 +24,156 @@ from alws.utils.file_utils import hash_content, hash_file
 from alws.utils.ids import get_random_unique_version
 
 
-PULP_SEMAPHORE = asyncio.Semaphore(5)
+PULP_MAX_CONNECTIONS = 5
+PULP_SEMAPHORE = asyncio.Semaphore(PULP_MAX_CONNECTIONS)
+# Idle connections are kept for reuse between Pulp requests
+PULP_KEEPALIVE_TIMEOUT = 60
+# Pending Pulp tasks are polled with an exponential backoff
+# between these delays (in seconds), up to PULP_TASKS_POLL_BATCH
+# tasks are checked with one request
+PULP_TASKS_POLL_MIN_DELAY = 0.05
+PULP_TASKS_POLL_MAX_DELAY = 5
+PULP_TASKS_POLL_BATCH = 100
+# Waiters of a task fail only after this many polls in a row have failed
+PULP_TASKS_POLL_MAX_ERRORS = 5
+PULP_TASK_FINAL_STATES = ("failed", "completed")
+
+
+class PulpTaskWaiter:
+    """
+    Keeps all pending Pulp tasks in one place and checks them together
+    with the pulp_href__in filter of the tasks list.
+    Every task is polled with its own exponential backoff starting
+    from PULP_TASKS_POLL_MIN_DELAY, so short tasks are noticed quickly
+    while long ones don't generate extra requests.
+    A failed poll only postpones the next check of its tasks, waiters
+    get an error after PULP_TASKS_POLL_MAX_ERRORS failed polls in a row.
+    Tasks missing from the list are requested one by one after
+    as many polls, their waiters get the error of that request.
+    """
+
+    def __init__(self, pulp_client: "PulpClient"):
+        self._pulp_client = pulp_client
+        # task href -> [futures, current delay, next poll time, poll errors]
+        self._pending: Dict[str, list] = {}
+        self._wakeup = asyncio.Event()
+        self._poller: typing.Optional[asyncio.Task] = None
+
+    def wait(self, task_href: str) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if task_href in self._pending:
+            self._pending[task_href][0].append(future)
+        else:
+            self._pending[task_href] = [
+                [future],
+                PULP_TASKS_POLL_MIN_DELAY,
+                loop.time() + PULP_TASKS_POLL_MIN_DELAY,
+                0,
+            ]
+        self._wakeup.set()
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll())
+        return future
+
+    def _resolve(self, task_href: str, result=None, exception=None):
+        futures, *_ = self._pending.pop(task_href)
+        for future in futures:
+            if future.done():
+                continue
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+
+    def _postpone(self, task_href: str):
+        pending = self._pending[task_href]
+        pending[1] = min(pending[1] * 2, PULP_TASKS_POLL_MAX_DELAY)
+        pending[2] = asyncio.get_running_loop().time() + pending[1]
+
+    async def _check_tasks(self, task_hrefs: List[str]):
+        response = await self._pulp_client.request(
+            "GET",
+            "pulp/api/v3/tasks/",
+            params={
+                "pulp_href__in": ",".join(task_hrefs),
+                "limit": len(task_hrefs),
+            },
+        )
+        tasks = {task["pulp_href"]: task for task in response["results"]}
+        for task_href in task_hrefs:
+            task = tasks.get(task_href)
+            pending = self._pending[task_href]
+            if task is None:
+                # a task missing from the list counts as a failed poll,
+                # after too many of them it's requested directly,
+                # so a deleted task fails its waiters
+                pending[3] += 1
+                if pending[3] < PULP_TASKS_POLL_MAX_ERRORS:
+                    self._postpone(task_href)
+                    continue
+                try:
+                    task = await self._pulp_client.request("GET", task_href)
+                except Exception as exc:
+                    self._resolve(task_href, exception=exc)
+                    continue
+            if task["state"] in PULP_TASK_FINAL_STATES:
+                self._resolve(task_href, result=task)
+                continue
+            pending[3] = 0
+            self._postpone(task_href)
+
+    async def _poll(self):
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            # forget tasks nobody waits for anymore
+            for task_href, (futures, *_) in list(self._pending.items()):
+                if all(future.done() for future in futures):
+                    self._pending.pop(task_href)
+            if not self._pending:
+                break
+            now = loop.time()
+            next_poll = min(pending[2] for pending in self._pending.values())
+            if next_poll > now:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(),
+                        timeout=next_poll - now,
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            due_hrefs = [
+                task_href
+                for task_href, pending in self._pending.items()
+                if pending[2] <= now
+            ]
+            for i in range(0, len(due_hrefs), PULP_TASKS_POLL_BATCH):
+                batch = due_hrefs[i : i + PULP_TASKS_POLL_BATCH]
+                try:
+                    await self._check_tasks(batch)
+                except Exception as exc:
+                    logging.warning("Cannot check Pulp tasks: %s", exc)
+                    for task_href in batch:
+                        if task_href not in self._pending:
+                            continue
+                        pending = self._pending[task_href]
+                        pending[3] += 1
+                        if pending[3] >= PULP_TASKS_POLL_MAX_ERRORS:
+                            self._resolve(task_href, exception=exc)
+                        else:
+                            self._postpone(task_href)
 
 
 class PulpClient:
+    # One connection pool per process (and event loop) is shared
+    # by all clients, so Pulp calls reuse already opened connections
+    _session: typing.Optional[aiohttp.ClientSession] = None
+    _retry_client: typing.Optional[RetryClient] = None
+    _session_loop: typing.Optional[asyncio.AbstractEventLoop] = None
+    _task_waiters: Dict[typing.Tuple[str, str], PulpTaskWaiter] = {}
+
     def __init__(self, host: str, username: str, password: str):
         self._host = host
         self._username = username
@@ -339,19 +486,63 @@ class PulpClient:
 
     async def get_repo_modules_yaml(self, url: str):
         repomd_url = urllib.parse.urljoin(url, "repodata/repomd.xml")
-        async with aiohttp.ClientSession(auth=self._auth) as session:
-            async with session.get(repomd_url) as response:
-                repomd_xml = await response.text()
-                response.raise_for_status()
-            res = re.search(r"repodata/[\w\d]+-modules.yaml", repomd_xml)
-            if not res:
-                return
-            modules_path = res.group()
-            modules_url = urllib.parse.urljoin(url, modules_path)
-            async with session.get(modules_url) as response:
-                modules_yaml = await response.text()
-                response.raise_for_status()
-                return modules_yaml
+        session = self.get_session()
+        async with session.get(repomd_url, auth=self._auth) as response:
+            repomd_xml = await response.text()
+            response.raise_for_status()
+        res = re.search(r"repodata/[\w\d]+-modules.yaml", repomd_xml)
+        if not res:
+            return
+        modules_path = res.group()
+        modules_url = urllib.parse.urljoin(url, modules_path)
+        async with session.get(modules_url, auth=self._auth) as response:
+            modules_yaml = await response.text()
+            response.raise_for_status()
+            return modules_yaml
+
+    @classmethod
+    def get_session(cls) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if (
+            cls._session is None
+            or cls._session.closed
+            or cls._session_loop is not loop
+        ):
+            # a session can't be used from another event loop,
+            # so the previous one is just dropped in that case
+            cls._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit_per_host=PULP_MAX_CONNECTIONS,
+                    keepalive_timeout=PULP_KEEPALIVE_TIMEOUT,
+                ),
+            )
+            cls._retry_client = RetryClient(client_session=cls._session)
+            cls._session_loop = loop
+            cls._task_waiters = {}
+        return cls._session
+
+    @classmethod
+    def get_retry_client(cls) -> RetryClient:
+        cls.get_session()
+        return cls._retry_client
+
+    @classmethod
+    async def close_session(cls):
+        if cls._retry_client is not None and not cls._session.closed:
+            await cls._retry_client.close()
+        cls._session = None
+        cls._retry_client = None
+        cls._session_loop = None
+        cls._task_waiters = {}
+
+    def _get_task_waiter(self) -> PulpTaskWaiter:
+        # task waiters live as long as the shared session,
+        # one per Pulp host and user
+        self.get_session()
+        key = (self._host, self._username)
+        if key not in self._task_waiters:
+            self._task_waiters[key] = PulpTaskWaiter(self)
+        return self._task_waiters[key]
 
     def begin(self):
         return self
@@ -557,6 +748,70 @@ class PulpClient:
             package_href, include_fields=include_fields, exclude_fields=exclude_fields
         )
 
+    async def iter_pages(
+        self,
+        endpoint: str,
+        params: typing.Optional[dict] = None,
+        concurrency: int = PULP_MAX_CONNECTIONS,
+    ) -> typing.AsyncIterator[typing.List[typing.Dict[str, typing.Any]]]:
+        """
+        Yields results of every page of the endpoint.
+        The first page gives the total count and the page size,
+        the remaining pages are requested by offset, up to `concurrency`
+        of them at once, and yielded in their order.
+        """
+        params = dict(params or {})
+        first_page = await self.request("GET", endpoint, params=params)
+        yield first_page["results"]
+        page_size = len(first_page["results"])
+        if not first_page.get("next") or not page_size:
+            return
+        offsets = iter(range(page_size, first_page["count"], page_size))
+        pending = collections.deque()
+
+        def schedule_next_page():
+            offset = next(offsets, None)
+            if offset is None:
+                return
+            pending.append(asyncio.ensure_future(self.request(
+                "GET",
+                endpoint,
+                params={**params, "offset": offset, "limit": page_size},
+            )))
+
+        for _ in range(concurrency):
+            schedule_next_page()
+        try:
+            while pending:
+                page = await pending.popleft()
+                schedule_next_page()
+                yield page["results"]
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def iter_entities(
+        self,
+        endpoint: str,
+        include_fields: typing.Optional[typing.List[str]] = None,
+        exclude_fields: typing.Optional[typing.List[str]] = None,
+        concurrency: int = PULP_MAX_CONNECTIONS,
+        **search_params,
+    ) -> typing.AsyncIterator[typing.Dict[str, typing.Any]]:
+        params = {}
+        if include_fields:
+            params["fields"] = ','.join(include_fields)
+        if exclude_fields:
+            params["exclude_fields"] = ','.join(exclude_fields)
+        params.update(**search_params)
+        async for page in self.iter_pages(
+            endpoint,
+            params=params,
+            concurrency=concurrency,
+        ):
+            for entity in page:
+                yield entity
+
     async def __get_entities(
         self,
         endpoint,
@@ -564,29 +819,15 @@ class PulpClient:
         exclude_fields: typing.Optional[typing.List[str]] = None,
         **search_params
     ) -> typing.List[typing.Dict[str, typing.Any]]:
-        all_entities = []
-
-        result = await self.__get_content_info(
-            endpoint,
-            include_fields=include_fields,
-            exclude_fields=exclude_fields,
-            **search_params,
-        )
-        if result["count"] == 0:
-            return []
-        all_entities.extend(result["results"])
-        while result.get("next"):
-            new_url = result.get("next")
-            parsed_url = urllib.parse.urlsplit(new_url)
-            new_url = parsed_url.path + "?" + parsed_url.query
-            result = await self.__get_content_info(
-                new_url,
+        return [
+            entity
+            async for entity in self.iter_entities(
+                endpoint,
                 include_fields=include_fields,
                 exclude_fields=exclude_fields,
                 **search_params,
             )
-            all_entities.extend(result["results"])
-        return all_entities
+        ]
 
     async def get_rpm_packages(
         self,
@@ -605,6 +846,24 @@ class PulpClient:
             **search_params
         )
 
+    async def iter_rpm_repository_packages(
+        self,
+        repository_href: str,
+        include_fields: typing.Optional[typing.List[str]] = None,
+        exclude_fields: typing.Optional[typing.List[str]] = None,
+        **search_params,
+    ) -> typing.AsyncIterator[typing.Dict[str, typing.Any]]:
+        latest_version = await self.get_repo_latest_version(repository_href)
+        params = {"repository_version": latest_version, "limit": 1000}
+        params.update(**search_params)
+        async for package in self.iter_entities(
+            "pulp/api/v3/content/rpm/packages/",
+            include_fields=include_fields,
+            exclude_fields=exclude_fields,
+            **params,
+        ):
+            yield package
+
     async def get_rpm_repository_packages(
         self,
         repository_href: str,
@@ -769,16 +1028,11 @@ class PulpClient:
             payload["fields"] = fields
         if search_params:
             payload.update(search_params)
-        response = await self.request(
-            "get", "pulp/api/v3/content/rpm/packages/", params=payload
-        )
-        for pkg in response["results"]:
-            yield pkg
-        while response.get("next"):
-            parsed_next = urllib.parse.urlparse(response.get("next"))
-            next_path = parsed_next.path + "?" + parsed_next.query
-            response = await self.request("get", next_path)
-            for pkg in response["results"]:
+        async for page in self.iter_pages(
+            "pulp/api/v3/content/rpm/packages/",
+            params=payload,
+        ):
+            for pkg in page:
                 yield pkg
 
     async def get_rpm_publications(
@@ -812,10 +1066,7 @@ class PulpClient:
         return entity_href, info["sha256"], artifact
 
     async def wait_for_task(self, task_href: str):
-        task = await self.request("GET", task_href)
-        while task["state"] not in ("failed", "completed"):
-            await asyncio.sleep(5)
-            task = await self.request("GET", task_href)
+        task = await self._get_task_waiter().wait(task_href)
         if task["state"] == "failed":
             error = task.get("error")
             error_msg = ""
@@ -830,13 +1081,23 @@ class PulpClient:
         return task
 
     async def list_updateinfo_records(
-        self, id__in: List[str], repository_version: typing.Optional[str] = None
+        self,
+        id__in: List[str],
+        repository_version: typing.Optional[str] = None,
+        include_fields: typing.Optional[typing.List[str]] = None,
     ):
         endpoint = "pulp/api/v3/content/rpm/advisories/"
-        payload = {"id__in": id__in}
+        payload = {"id__in": ",".join(id__in)}
         if repository_version:
             payload["repository_version"] = repository_version
-        return (await self.request("GET", endpoint, params=payload))["results"]
+        return [
+            record
+            async for record in self.iter_entities(
+                endpoint,
+                include_fields=include_fields,
+                **payload,
+            )
+        ]
 
     async def add_errata_record(self, record: dict, repo_href: str):
         endpoint = "pulp/api/v3/content/rpm/advisories/"
@@ -848,11 +1109,33 @@ class PulpClient:
         response = await self.wait_for_task(task["task"])
         return response
 
+    async def upload_errata_record(self, record: dict) -> str:
+        # Advisory is uploaded as a standalone content unit,
+        # it isn't added to any repository yet
+        endpoint = "pulp/api/v3/content/rpm/advisories/"
+        payload = {"file": io.StringIO(json.dumps(record))}
+        task = await self.request("POST", endpoint, data=payload)
+        task_result = await self.wait_for_task(task["task"])
+        hrefs = [
+            item
+            for item in task_result["created_resources"]
+            if "rpm/advisories" in item
+        ]
+        if not hrefs:
+            raise ValueError(
+                f"Pulp hasn't returned advisory for record {record['id']}"
+            )
+        return hrefs[0]
+
     async def add_errata_records(self, records: List[dict], repo_href: str):
-        tasks = []
-        for record in records:
-            tasks.append(self.add_errata_record(record, repo_href))
-        await asyncio.gather(*tasks)
+        # Advisories are uploaded concurrently and added to the repository
+        # with a single modify, so only one repository version is created
+        if not records:
+            return
+        content_hrefs = await asyncio.gather(
+            *(self.upload_errata_record(record) for record in records)
+        )
+        await self.modify_repository(repo_href, add=list(content_hrefs))
 
     async def request(
         self,
@@ -871,20 +1154,20 @@ class PulpClient:
             full_url = urllib.parse.urljoin(self._host, endpoint)
         async with PULP_SEMAPHORE:
             if method.lower() == "get":
-                async with RetryClient(retry_options=self._retry_options) as client:
-                    response = await client.get(
-                        full_url,
-                        params=params,
-                        json=json,
-                        data=data,
-                        headers=headers,
-                        auth=self._auth,
-                    )
+                async with self.get_retry_client().get(
+                    full_url,
+                    params=params,
+                    json=json,
+                    data=data,
+                    headers=headers,
+                    auth=self._auth,
+                    retry_options=self._retry_options,
+                ) as response:
                     if raw:
                         return {"result": await response.text()}
                     response_json = await response.json()
             else:
-                async with aiohttp.request(
+                async with self.get_session().request(
                     method,
                     full_url,
                     params=params,
@@ -1,10 +1,13 @@
+import asyncio
 import typing
 import uuid
 
+import sqlalchemy
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import joinedload, load_only
 
-from alws.dependencies import get_pulp_db
+from alws.dependencies import get_async_pulp_db
 from alws.pulp_models import (
     CoreArtifact,
     CoreContent,
@@ -21,27 +24,21 @@ def get_uuid_from_pulp_href(pulp_href: str) -> uuid.UUID:
     return uuid.UUID(pulp_href.split("/")[-2])
 
 
-# TODO: After ALBS-1012 is fixed, we can refactor this function
-# to get module packages from pulp without having to grab the actual
-# modules.yaml file from the repository
-def get_rpm_module_packages_from_repository(
-    repo_id: uuid.UUID,
-    module: str,
-    pkg_names: typing.Optional[typing.List[str]] = None,
-    pkg_versions: typing.Optional[typing.List[str]] = None,
-    pkg_epochs: typing.Optional[typing.List[str]] = None,
-) -> typing.List[RpmPackage]:
-    result = []
-    repo_query = select(CoreRepository).where(
-        CoreRepository.pulp_id == repo_id
+def in_array(column, values: typing.Iterable[typing.Any]):
+    """
+    Renders "column = ANY(:values)" with the values bound as one array,
+    so long lists don't run into the 32767 bind parameters limit
+    of asyncpg like "column IN (...)" does.
+    """
+    return column == sqlalchemy.any_(
+        sqlalchemy.literal(list(values), ARRAY(column.type))
     )
-    with get_pulp_db() as pulp_db:
-        repo = pulp_db.execute(repo_query).scalars().first()
-        repo_name = repo.name
 
-    if not repo_name:
-        return []
 
+def get_module_packages_releases(
+    repo_name: str,
+    module: str,
+) -> typing.Set[str]:
     # TODO: Getting modules.yaml files from BS production repos is not right.
     # The problem here is that we need a way to get packages from
     # the provided module:stream, and pulp actually doesn't have an artifact
@@ -50,79 +47,155 @@ def get_rpm_module_packages_from_repository(
     # them added into pulp, and we should do it.
     # At this moment, we can only trust the modules that are in production
     # repositories.
+    pkg_releases = set()
     try:
         repo_modules_yaml = get_modules_yaml_from_repo(repo_name)
     except Exception:
-        return result
+        return pkg_releases
     if not repo_modules_yaml:
-        return result
+        return pkg_releases
 
     module_name, module_stream = module.split(":")
     devel_module_name = (
         f"{module_name}-devel" if not module_name.endswith("-devel") else ""
     )
-    repo_modules = []
     try:
         repo_index = IndexWrapper.from_template(repo_modules_yaml)
     except Exception:
-        return result
+        return pkg_releases
     for repo_module in repo_index.iter_modules():
         if (
             repo_module.name not in (module_name, devel_module_name)
             or repo_module.stream != module_stream
         ):
             continue
-        repo_modules.append(repo_module)
-    if not repo_modules:
-        return result
-
-    pkg_releases = []
-    for repo_module in repo_modules:
         for pkg in repo_module.get_rpm_artifacts():
-            pkg_release = parse_rpm_nevra(pkg).release
-            if pkg_release not in pkg_releases:
-                pkg_releases.append(pkg_release)
-
-    conditions = []
+            pkg_releases.add(parse_rpm_nevra(pkg).release)
+    return pkg_releases
 
-    if pkg_names:
-        conditions.append(RpmPackage.name.in_(pkg_names))
-    if pkg_versions:
-        conditions.append(RpmPackage.version.in_(pkg_versions))
-    if pkg_epochs:
-        conditions.append(RpmPackage.epoch.in_(pkg_epochs))
 
-    first_subq = (
-        select(CoreRepositoryContent.content_id)
-        .where(
-            CoreRepositoryContent.repository_id == repo.pulp_id,
-            CoreRepositoryContent.version_removed_id.is_(None),
+# TODO: After ALBS-1012 is fixed, we can refactor this function
+# to get module packages from pulp without having to grab the actual
+# modules.yaml file from the repository
+async def get_rpm_module_packages_from_repository(
+    repo_id: uuid.UUID,
+    module: str,
+    pkg_names: typing.Optional[typing.List[str]] = None,
+    pkg_versions: typing.Optional[typing.List[str]] = None,
+    pkg_epochs: typing.Optional[typing.List[str]] = None,
+) -> typing.List[RpmPackage]:
+    return [
+        pkg
+        for pkg, _ in await get_rpm_module_packages_by_repositories(
+            repo_ids=[repo_id],
+            module=module,
+            pkg_names=pkg_names,
+            pkg_versions=pkg_versions,
+            pkg_epochs=pkg_epochs,
         )
-        .scalar_subquery()
+    ]
+
+
+async def get_rpm_module_packages_by_repositories(
+    repo_ids: typing.List[uuid.UUID],
+    module: str,
+    pkg_names: typing.Optional[typing.List[str]] = None,
+    pkg_versions: typing.Optional[typing.List[str]] = None,
+    pkg_epochs: typing.Optional[typing.List[str]] = None,
+) -> typing.List[typing.Tuple[RpmPackage, uuid.UUID]]:
+    repo_query = select(CoreRepository.pulp_id, CoreRepository.name).where(
+        in_array(CoreRepository.pulp_id, repo_ids)
     )
-    last_subq = (
-        select(CoreContent.pulp_id)
-        .where(
-            CoreContent.pulp_id.in_(first_subq),
-            CoreContent.pulp_type == "rpm.package",
+    async with get_async_pulp_db() as pulp_db:
+        repo_names = dict((await pulp_db.execute(repo_query)).all())
+    repo_names = {
+        repo_id: repo_name
+        for repo_id, repo_name in repo_names.items()
+        if repo_name
+    }
+    if not repo_names:
+        return []
+
+    repos_releases = dict(
+        zip(
+            repo_names,
+            await asyncio.gather(*(
+                asyncio.to_thread(
+                    get_module_packages_releases,
+                    repo_name,
+                    module,
+                )
+                for repo_name in repo_names.values()
+            )),
         )
-        .scalar_subquery()
     )
+    repos_releases = {
+        repo_id: pkg_releases
+        for repo_id, pkg_releases in repos_releases.items()
+        if pkg_releases
+    }
+    if not repos_releases:
+        return []
 
-    conditions.extend(
-        [
-            RpmPackage.content_ptr_id.in_(last_subq),
-            RpmPackage.release.in_(pkg_releases),
-        ]
+    pkgs = await get_rpm_packages_by_repositories(
+        repo_ids=list(repos_releases),
+        pkg_names=pkg_names,
+        pkg_versions=pkg_versions,
+        pkg_epochs=pkg_epochs,
+        pkg_releases=list(set().union(*repos_releases.values())),
     )
+    # module releases are different in every repository
+    return [
+        (pkg, repo_id)
+        for pkg, repo_id in pkgs
+        if pkg.release in repos_releases[repo_id]
+    ]
 
-    query = select(RpmPackage).where(*conditions)
-    with get_pulp_db() as pulp_db:
-        result = pulp_db.execute(query).scalars().all()
-    return result
+
+async def get_rpm_packages_by_repositories(
+    repo_ids: typing.List[uuid.UUID],
+    pkg_names: typing.Optional[typing.List[str]] = None,
+    pkg_versions: typing.Optional[typing.List[str]] = None,
+    pkg_epochs: typing.Optional[typing.List[str]] = None,
+    pkg_arches: typing.Optional[typing.List[str]] = None,
+    pkg_releases: typing.Optional[typing.List[str]] = None,
+) -> typing.List[typing.Tuple[RpmPackage, uuid.UUID]]:
+    """
+    Returns packages from the latest versions of the repositories
+    together with the id of the repository that contains the package,
+    a package that is present in several repositories is returned
+    once for each of them.
+    """
+    conditions = [
+        in_array(CoreRepositoryContent.repository_id, repo_ids),
+        CoreRepositoryContent.version_removed_id.is_(None),
+    ]
+    if pkg_names:
+        conditions.append(in_array(RpmPackage.name, pkg_names))
+    if pkg_versions:
+        conditions.append(in_array(RpmPackage.version, pkg_versions))
+    if pkg_epochs:
+        conditions.append(in_array(RpmPackage.epoch, pkg_epochs))
+    if pkg_arches:
+        conditions.append(in_array(RpmPackage.arch, pkg_arches))
+    if pkg_releases:
+        conditions.append(in_array(RpmPackage.release, pkg_releases))
+    query = (
+        select(RpmPackage, CoreRepositoryContent.repository_id)
+        .join(
+            CoreRepositoryContent,
+            CoreRepositoryContent.content_id == RpmPackage.content_ptr_id,
+        )
+        .where(*conditions)
+    )
+    async with get_async_pulp_db() as pulp_db:
+        return [
+            (pkg, repo_id)
+            for pkg, repo_id in (await pulp_db.execute(query)).all()
+        ]
 
 
-def get_rpm_packages_from_repositories(
+async def get_rpm_packages_from_repositories(
     repo_ids: typing.List[uuid.UUID],
     pkg_names: typing.Optional[typing.List[str]] = None,
     pkg_versions: typing.Optional[typing.List[str]] = None,
@@ -131,19 +204,19 @@ def get_rpm_packages_from_repositories(
     pkg_releases: typing.Optional[typing.List[str]] = None,
 ) -> typing.List[RpmPackage]:
     conditions = [
-        CoreRepository.pulp_id.in_(repo_ids),
+        in_array(CoreRepository.pulp_id, repo_ids),
         CoreRepositoryContent.version_removed_id.is_(None),
     ]
     if pkg_names:
-        conditions.append(RpmPackage.name.in_(pkg_names))
+        conditions.append(in_array(RpmPackage.name, pkg_names))
     if pkg_versions:
-        conditions.append(RpmPackage.version.in_(pkg_versions))
+        conditions.append(in_array(RpmPackage.version, pkg_versions))
     if pkg_epochs:
-        conditions.append(RpmPackage.epoch.in_(pkg_epochs))
+        conditions.append(in_array(RpmPackage.epoch, pkg_epochs))
     if pkg_arches:
-        conditions.append(RpmPackage.arch.in_(pkg_arches))
+        conditions.append(in_array(RpmPackage.arch, pkg_arches))
     if pkg_releases:
-        conditions.append(RpmPackage.release.in_(pkg_releases))
+        conditions.append(in_array(RpmPackage.release, pkg_releases))
     query = (
         select(RpmPackage)
         .join(CoreContent)
@@ -153,16 +226,71 @@ def get_rpm_packages_from_repositories(
         .options(
             joinedload(RpmPackage.content).joinedload(
                 CoreContent.core_repositorycontent.and_(
-                    CoreRepositoryContent.repository_id.in_(repo_ids)
+                    in_array(CoreRepositoryContent.repository_id, repo_ids)
                 )
             )
         )
     )
-    with get_pulp_db() as pulp_db:
-        return pulp_db.execute(query).scalars().unique().all()
+    async with get_async_pulp_db() as pulp_db:
+        return (await pulp_db.execute(query)).scalars().unique().all()
 
 
-def get_rpm_packages_from_repository(
+async def get_rpm_packages_by_nevras(
+    repo_ids: typing.List[uuid.UUID],
+    nevras: typing.Iterable[typing.Tuple[str, str, str, str, str]],
+) -> typing.List[typing.Tuple[RpmPackage, uuid.UUID]]:
+    """
+    Returns packages with exactly the given (name, epoch, version,
+    release, arch) tuples from the latest versions of the repositories,
+    together with the id of the repository that contains the package.
+    NEVRAs are joined as a table of five unnested arrays, so separate
+    IN lists of names, versions, etc. don't match their cartesian
+    product and the number of bind parameters doesn't grow with them.
+    """
+    nevras = sorted(set(nevras))
+    if not repo_ids or not nevras:
+        return []
+    fields = ("name", "epoch", "version", "release", "arch")
+    values = (
+        sqlalchemy.func.unnest(*(
+            sqlalchemy.cast(
+                sqlalchemy.literal(list(field_values)),
+                ARRAY(sqlalchemy.Text),
+            )
+            for field_values in zip(*nevras)
+        ))
+        .table_valued(*fields)
+        .render_derived(name="nevras")
+    )
+    query = (
+        select(RpmPackage, CoreRepositoryContent.repository_id)
+        .join(
+            values,
+            sqlalchemy.and_(
+                RpmPackage.name == values.c.name,
+                RpmPackage.epoch == values.c.epoch,
+                RpmPackage.version == values.c.version,
+                RpmPackage.release == values.c.release,
+                RpmPackage.arch == values.c.arch,
+            ),
+        )
+        .join(
+            CoreRepositoryContent,
+            CoreRepositoryContent.content_id == RpmPackage.content_ptr_id,
+        )
+        .where(
+            in_array(CoreRepositoryContent.repository_id, repo_ids),
+            CoreRepositoryContent.version_removed_id.is_(None),
+        )
+    )
+    async with get_async_pulp_db() as pulp_db:
+        return [
+            (pkg, repo_id)
+            for pkg, repo_id in (await pulp_db.execute(query)).all()
+        ]
+
+
+async def get_rpm_packages_from_repository(
     repo_id: uuid.UUID,
     pkg_names: typing.Optional[typing.List[str]] = None,
     pkg_versions: typing.Optional[typing.List[str]] = None,
@@ -195,69 +323,67 @@ def get_rpm_packages_from_repository(
         RpmPackage.content_ptr_id.in_(last_subq),
     ]
     if pkg_names:
-        conditions.append(RpmPackage.name.in_(pkg_names))
+        conditions.append(in_array(RpmPackage.name, pkg_names))
     if pkg_versions:
-        conditions.append(RpmPackage.version.in_(pkg_versions))
+        conditions.append(in_array(RpmPackage.version, pkg_versions))
     if pkg_epochs:
-        conditions.append(RpmPackage.epoch.in_(pkg_epochs))
+        conditions.append(in_array(RpmPackage.epoch, pkg_epochs))
     if pkg_arches:
-        conditions.append(RpmPackage.arch.in_(pkg_arches))
+        conditions.append(in_array(RpmPackage.arch, pkg_arches))
 
     query = select(RpmPackage).where(*conditions)
-    with get_pulp_db() as pulp_db:
-        return pulp_db.execute(query).scalars().all()
+    async with get_async_pulp_db() as pulp_db:
+        return (await pulp_db.execute(query)).scalars().all()
 
 
-def get_rpm_packages_by_ids(
+async def get_rpm_packages_by_ids(
     pulp_pkg_ids: typing.List[uuid.UUID],
     pkg_fields: typing.List[typing.Any],
 ) -> typing.Dict[str, RpmPackage]:
-    result = {}
-    with get_pulp_db() as pulp_db:
+    async with get_async_pulp_db() as pulp_db:
         pulp_pkgs = (
-            pulp_db.execute(
-                select(RpmPackage)
-                .where(
-                    RpmPackage.content_ptr_id.in_(pulp_pkg_ids),
-                )
-                .options(
-                    joinedload(RpmPackage.content)
-                    .joinedload(CoreContent.core_contentartifact)
-                    .joinedload(CoreContentArtifact.artifact),
-                    load_only(*pkg_fields),
+            (
+                await pulp_db.execute(
+                    select(RpmPackage)
+                    .where(
+                        in_array(RpmPackage.content_ptr_id, pulp_pkg_ids),
+                    )
+                    .options(
+                        joinedload(RpmPackage.content)
+                        .joinedload(CoreContent.core_contentartifact)
+                        .joinedload(CoreContentArtifact.artifact),
+                        load_only(*pkg_fields),
+                    )
                 )
             )
             .unique()
             .scalars()
             .all()
         )
-        for pkg in pulp_pkgs:
-            result[pkg.pulp_href] = pkg
-        return result
+    return {pkg.pulp_href: pkg for pkg in pulp_pkgs}
 
 
-def get_rpm_packages_by_checksums(
+async def get_rpm_packages_by_checksums(
     pkg_checksums: typing.List[str],
 ) -> typing.Dict[str, RpmPackage]:
-    result = {}
-    with get_pulp_db() as pulp_db:
+    async with get_async_pulp_db() as pulp_db:
         pulp_pkgs = (
-            pulp_db.execute(
-                select(RpmPackage)
-                .join(CoreContent)
-                .join(CoreContentArtifact)
-                .join(CoreArtifact)
-                .where(CoreArtifact.sha256.in_(pkg_checksums))
-                .options(
-                    joinedload(RpmPackage.content)
-                    .joinedload(CoreContent.core_contentartifact)
-                    .joinedload(CoreContentArtifact.artifact),
-                ),
+            (
+                await pulp_db.execute(
+                    select(RpmPackage)
+                    .join(CoreContent)
+                    .join(CoreContentArtifact)
+                    .join(CoreArtifact)
+                    .where(in_array(CoreArtifact.sha256, pkg_checksums))
+                    .options(
+                        joinedload(RpmPackage.content)
+                        .joinedload(CoreContent.core_contentartifact)
+                        .joinedload(CoreContentArtifact.artifact),
+                    ),
+                )
             )
             .unique()
             .scalars()
             .all()
         )
-        for package in pulp_pkgs:
-            result[package.sha256] = package
-        return result
+    return {package.sha256: package for package in pulp_pkgs}
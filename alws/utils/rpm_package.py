@@ -10,7 +10,7 @@ from alws.utils.pulp_utils import (
 __all__ = ["get_rpm_packages_info"]
 
 
-def get_rpm_packages_info(
+async def get_rpm_packages_info(
     artifacts: typing.List[BuildTaskArtifact],
 ) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
     pkg_fields = [
@@ -22,7 +22,7 @@ def get_rpm_packages_info(
         RpmPackage.arch,
         RpmPackage.rpm_sourcerpm,
     ]
-    pulp_packages = get_rpm_packages_by_ids(
+    pulp_packages = await get_rpm_packages_by_ids(
         [get_uuid_from_pulp_href(artifact.href) for artifact in artifacts],
         pkg_fields,
     )
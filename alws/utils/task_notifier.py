@@ -0,0 +1,178 @@
+import asyncio
+import contextlib
+import logging
+import typing
+from collections import defaultdict
+
+import asyncpg
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from alws import database, dependencies
+from alws.config import settings
+
+__all__ = [
+    'TASKS_CHANNEL',
+    'TaskNotifier',
+    'get_build_topics',
+    'get_notify_query',
+    'get_sign_topics',
+    'get_test_topics',
+    'task_notifier',
+    'wait_for_tasks',
+]
+
+
+# Every task producer sends a NOTIFY to this channel with a topic
+# as a payload, e.g. "build:x86_64", "sign:<keyid>" or "test".
+# A topic without a key ("build", "sign") wakes up all waiters of that kind.
+TASKS_CHANNEL = 'albs_tasks'
+BUILD_TOPIC = 'build'
+SIGN_TOPIC = 'sign'
+TEST_TOPIC = 'test'
+
+
+def get_build_topics(
+    arches: typing.Optional[typing.Iterable[str]] = None,
+) -> typing.Set[str]:
+    return {BUILD_TOPIC, *(f'{BUILD_TOPIC}:{arch}' for arch in arches or ())}
+
+
+def get_sign_topics(
+    key_ids: typing.Optional[typing.Iterable[str]] = None,
+) -> typing.Set[str]:
+    return {SIGN_TOPIC, *(f'{SIGN_TOPIC}:{key}' for key in key_ids or ())}
+
+
+def get_test_topics() -> typing.Set[str]:
+    return {TEST_TOPIC}
+
+
+def get_notify_query(topics: typing.Iterable[str]):
+    """
+    Returns a statement that notifies waiters about the given topics.
+    It works for both sync and async sessions and, because NOTIFY
+    is transactional, waiters are woken up only after a commit.
+    """
+    return select(
+        *(func.pg_notify(TASKS_CHANNEL, topic) for topic in sorted(topics))
+    )
+
+
+class TaskNotifier:
+    def __init__(
+        self,
+        channel: str = TASKS_CHANNEL,
+        reconnect_delay: int = 5,
+    ):
+        self._channel = channel
+        self._reconnect_delay = reconnect_delay
+        self._waiters: typing.Dict[str, typing.Set[asyncio.Event]] = (
+            defaultdict(set)
+        )
+        self._listener_task: typing.Optional[asyncio.Task] = None
+
+    @property
+    def dsn(self) -> str:
+        url = make_url(settings.database_url).set(drivername='postgresql')
+        return url.render_as_string(hide_password=False)
+
+    def publish(self, topic: str):
+        for event in self._waiters.get(topic, ()):
+            event.set()
+
+    @contextlib.contextmanager
+    def subscribe(
+        self,
+        topics: typing.Iterable[str],
+    ) -> typing.Iterator[asyncio.Event]:
+        topics = set(topics)
+        event = asyncio.Event()
+        for topic in topics:
+            self._waiters[topic].add(event)
+        try:
+            yield event
+        finally:
+            for topic in topics:
+                self._waiters[topic].discard(event)
+                if not self._waiters[topic]:
+                    self._waiters.pop(topic)
+
+    def _on_notification(self, connection, pid, channel, payload):
+        self.publish(payload)
+
+    async def _listen(self):
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(
+                    self._channel,
+                    self._on_notification,
+                )
+                logging.info('Listening for tasks on "%s"', self._channel)
+                # Tasks could appear while we were reconnecting
+                for topic in list(self._waiters):
+                    self.publish(topic)
+                await closed.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logging.exception('Cannot listen for tasks notifications')
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(self._reconnect_delay)
+
+    async def start(self):
+        if self._listener_task is None:
+            self._listener_task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener_task is None:
+            return
+        self._listener_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._listener_task
+        self._listener_task = None
+
+
+task_notifier = TaskNotifier()
+
+
+async def wait_for_tasks(
+    claim: typing.Callable[[AsyncSession], typing.Awaitable[typing.Any]],
+    topics: typing.Iterable[str],
+    timeout: int = 0,
+):
+    """
+    Tries to claim tasks and, if there are none, parks until one of the
+    topics is notified or the timeout expires.
+    Every claim attempt opens its own short-lived session under
+    DB_SEMAPHORE, so a parked request holds neither a database connection
+    nor a semaphore slot and doesn't starve other requests.
+    Waiters also recheck the database every task_long_poll_recheck_interval
+    seconds, that covers tasks which become available by timestamp
+    and notifications lost on a listener reconnect.
+    """
+    loop = asyncio.get_running_loop()
+    timeout = min(max(timeout, 0), settings.task_long_poll_max_timeout)
+    deadline = loop.time() + timeout
+    while True:
+        # subscribe before the claim, so a task created
+        # in between doesn't get lost
+        with task_notifier.subscribe(topics) as event:
+            async with dependencies.DB_SEMAPHORE:
+                async with database.Session() as db:
+                    result = await claim(db)
+            remaining = deadline - loop.time()
+            if result or remaining <= 0:
+                return result
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    event.wait(),
+                    min(remaining, settings.task_long_poll_recheck_interval),
+                )
@@ -26,21 +26,14 @@ class MetadataUploader:
         self.repo_name = repo_name
 
     async def iter_repo(self, repo_href: str) -> typing.AsyncIterator[dict]:
-        next_page = repo_href
-        while True:
-            if (
-                "limit" in next_page
-                and re.search(r"limit=(\d+)", next_page).groups()[0] == "100"
-            ):
-                next_page = next_page.replace("limit=100", "limit=1000")
-            parsed_url = urllib.parse.urlsplit(next_page)
-            path = parsed_url.path + "?" + parsed_url.query
-            page = await self.pulp.get_by_href(path)
-            for pkg in page["results"]:
+        parsed_url = urllib.parse.urlsplit(repo_href)
+        params = dict(urllib.parse.parse_qsl(parsed_url.query))
+        # default page size of 100 entities is too small for repositories
+        if params.get("limit", "100") == "100":
+            params["limit"] = 1000
+        async for page in self.pulp.iter_pages(parsed_url.path, params=params):
+            for pkg in page:
                 yield pkg
-            next_page = page.get("next")
-            if not next_page:
-                break
 
     async def upload_comps(self, repo_href: str, comps_content: str) -> None:
         data = {
@@ -0,0 +1,216 @@
+"""
+Simulates N build nodes polling /build_node/get_task at the same time
+and reports how fast build tasks are handed out by the dispatcher.
+
+The script creates a throwaway platform, build and build tasks, so
+it should be pointed to a test database (test_database_url by default).
+Build tasks of other builds in the same database can be claimed too.
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import statistics
+import sys
+import time
+import typing
+import uuid
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+)
+
+from alws import models
+from alws.config import settings
+from alws.constants import BuildTaskStatus
+from alws.crud import build_node
+from alws.database import Base
+from alws.schemas import build_node_schema
+
+MODES = {
+    'for_update': False,
+    'skip_locked': True,
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        'build_task_dispatch',
+        description='Benchmark for build tasks dispatching',
+    )
+    parser.add_argument(
+        '-n', '--nodes', type=int, default=100,
+        help='Number of concurrently polling build nodes',
+    )
+    parser.add_argument(
+        '-t', '--tasks', type=int, default=2000,
+        help='Number of build tasks to dispatch',
+    )
+    parser.add_argument(
+        '-a', '--arches', nargs='+',
+        default=['x86_64', 'i686', 'aarch64', 'ppc64le', 's390x'],
+        help='Build tasks architectures',
+    )
+    parser.add_argument(
+        '-m', '--mode', choices=[*MODES, 'all'], default='all',
+        help='Dispatch mode to benchmark',
+    )
+    parser.add_argument(
+        '-d', '--database-url', type=str,
+        default=settings.test_database_url,
+        help='Database URL, test database is used by default',
+    )
+    return parser.parse_args()
+
+
+async def create_build_tasks(
+    db: AsyncSession,
+    tasks_count: int,
+    arches: typing.List[str],
+) -> typing.Tuple[int, int, int]:
+    name = f'dispatch-benchmark-{uuid.uuid4().hex[:8]}'
+    platform = models.Platform(
+        name=name,
+        type='rpm',
+        distr_type='rhel',
+        distr_version='9',
+        test_dist_name='almalinux',
+        arch_list=arches,
+        data={'mock': {}, 'yum': {}, 'definitions': {}},
+    )
+    ref = models.BuildTaskRef(url=f'https://example.com/{name}.git')
+    build = models.Build()
+    db.add_all([platform, ref, build])
+    await db.flush()
+    await db.execute(
+        insert(models.BuildTask),
+        [
+            {
+                'build_id': build.id,
+                'platform_id': platform.id,
+                'ref_id': ref.id,
+                'status': BuildTaskStatus.IDLE,
+                'index': idx // len(arches),
+                'arch': arches[idx % len(arches)],
+            }
+            for idx in range(tasks_count)
+        ],
+    )
+    await db.commit()
+    return platform.id, ref.id, build.id
+
+
+async def reset_build_tasks(db: AsyncSession, build_id: int):
+    await db.execute(
+        update(models.BuildTask)
+        .where(models.BuildTask.build_id == build_id)
+        .values(status=BuildTaskStatus.IDLE, ts=None)
+    )
+    await db.commit()
+
+
+async def remove_build_tasks(
+    db: AsyncSession,
+    platform_id: int,
+    ref_id: int,
+    build_id: int,
+):
+    await db.execute(
+        delete(models.BuildTask).where(models.BuildTask.build_id == build_id)
+    )
+    await db.execute(delete(models.Build).where(models.Build.id == build_id))
+    await db.execute(
+        delete(models.BuildTaskRef).where(models.BuildTaskRef.id == ref_id)
+    )
+    await db.execute(
+        delete(models.Platform).where(models.Platform.id == platform_id)
+    )
+    await db.commit()
+
+
+async def build_node_loop(
+    session_factory: sessionmaker,
+    request: build_node_schema.RequestTask,
+    latencies: typing.List[float],
+    claimed: typing.List[int],
+):
+    while True:
+        async with session_factory() as db:
+            start = time.perf_counter()
+            task = await build_node.get_available_build_task(db, request)
+            latencies.append(time.perf_counter() - start)
+        if task is None:
+            return
+        claimed.append(task.id)
+
+
+async def run_mode(
+    session_factory: sessionmaker,
+    mode: str,
+    nodes: int,
+    arches: typing.List[str],
+):
+    settings.build_task_skip_locked = MODES[mode]
+    request = build_node_schema.RequestTask(supported_arches=arches)
+    latencies = []
+    claimed = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        build_node_loop(session_factory, request, latencies, claimed)
+        for _ in range(nodes)
+    ))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(
+        f'{mode:>12}: {len(claimed)} tasks in {elapsed:.2f}s '
+        f'({len(claimed) / elapsed:.1f} tasks/s), '
+        f'p50 {statistics.median(latencies) * 1000:.1f}ms, '
+        f'p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f}ms, '
+        f'max {latencies[-1] * 1000:.1f}ms, '
+        f'duplicated claims: {len(claimed) - len(set(claimed))}'
+    )
+
+
+async def main():
+    args = parse_args()
+    engine = create_async_engine(
+        args.database_url,
+        pool_size=args.nodes,
+        max_overflow=0,
+    )
+    session_factory = sessionmaker(
+        engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with session_factory() as db:
+        platform_id, ref_id, build_id = await create_build_tasks(
+            db,
+            args.tasks,
+            args.arches,
+        )
+    print(
+        f'{args.nodes} build nodes, {args.tasks} build tasks, '
+        f'arches: {", ".join(args.arches)}, '
+        f'started at {datetime.datetime.utcnow()}'
+    )
+    modes = list(MODES) if args.mode == 'all' else [args.mode]
+    try:
+        for mode in modes:
+            async with session_factory() as db:
+                await reset_build_tasks(db, build_id)
+            await run_mode(session_factory, mode, args.nodes, args.arches)
+    finally:
+        async with session_factory() as db:
+            await remove_build_tasks(db, platform_id, ref_id, build_id)
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,273 @@
+"""
+Compares errata production packages lookup done with a query per
+production repository (as it was done before) and with a single
+query for all repositories of the platform.
+
+The script fills a throwaway schema with synthetic Pulp repositories
+and packages, so it should be pointed to a test database
+(test_database_url by default). The schema is dropped afterwards.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import types
+import typing
+import uuid
+
+from sqlalchemy import insert, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+)
+
+from alws import database
+from alws.config import settings
+from alws.crud.errata import load_platform_packages
+from alws.pulp_models import (
+    CoreContent,
+    CoreRepository,
+    CoreRepositoryContent,
+    CoreRepositoryVersion,
+    RpmPackage,
+)
+from alws.utils.parsing import clean_release
+from alws.utils.pulp_utils import (
+    get_rpm_packages_from_repository,
+    get_uuid_from_pulp_href,
+)
+
+SCHEMA = 'load_platform_packages_benchmark'
+ARCHES = ['x86_64', 'i686', 'aarch64', 'ppc64le', 's390x', 'noarch']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        'load_platform_packages',
+        description='Benchmark for errata production packages lookup',
+    )
+    parser.add_argument(
+        '-r', '--repos', type=int, default=20,
+        help='Number of production repositories of the platform',
+    )
+    parser.add_argument(
+        '-p', '--packages', type=int, default=20000,
+        help='Number of distinct packages in all repositories',
+    )
+    parser.add_argument(
+        '-c', '--copies', type=int, default=2,
+        help='Number of repositories every package is added to',
+    )
+    parser.add_argument(
+        '-s', '--searched', type=int, default=300,
+        help='Number of package names in the errata record',
+    )
+    parser.add_argument(
+        '-i', '--iterations', type=int, default=5,
+        help='Number of lookups in every mode',
+    )
+    parser.add_argument(
+        '-d', '--database-url', type=str,
+        default=settings.test_database_url,
+        help='Database URL, test database is used by default',
+    )
+    return parser.parse_args()
+
+
+async def legacy_load_platform_packages(
+    platform,
+    search_params: typing.Dict[str, typing.List[str]],
+    for_release: bool = False,
+) -> typing.Dict[str, typing.Any]:
+    cache = {}
+    for repo in platform.repos:
+        if not repo.production:
+            continue
+        pkgs = await get_rpm_packages_from_repository(
+            repo_id=get_uuid_from_pulp_href(repo.pulp_href),
+            pkg_names=search_params["name"],
+            pkg_versions=search_params["version"],
+            pkg_epochs=search_params["epoch"],
+        )
+        for pkg in pkgs:
+            if for_release:
+                cache.setdefault(pkg.pulp_href, []).append(repo.pulp_href)
+                continue
+            short_pkg_name = "-".join(
+                (pkg.name, pkg.version, clean_release(pkg.release))
+            )
+            cache.setdefault(short_pkg_name, {})
+            arch_list = [pkg.arch]
+            if pkg.arch == "noarch":
+                arch_list = platform.arch_list
+            for arch in arch_list:
+                cache[short_pkg_name].setdefault(arch, [])
+                if pkg in cache[short_pkg_name][arch]:
+                    continue
+                cache[short_pkg_name][arch].append(pkg)
+    return cache
+
+
+async def fill_pulp_data(
+    db: AsyncSession,
+    repos_count: int,
+    packages_count: int,
+    copies: int,
+) -> typing.List[uuid.UUID]:
+    repo_ids = [uuid.uuid4() for _ in range(repos_count)]
+    version_ids = [uuid.uuid4() for _ in range(repos_count)]
+    await db.execute(
+        insert(CoreRepository),
+        [
+            {
+                'pulp_id': repo_id,
+                'name': f'benchmark-{idx}',
+                'pulp_type': 'rpm.rpm',
+            }
+            for idx, repo_id in enumerate(repo_ids)
+        ],
+    )
+    await db.execute(
+        insert(CoreRepositoryVersion),
+        [
+            {'pulp_id': version_id, 'repository_id': repo_id, 'number': 1}
+            for repo_id, version_id in zip(repo_ids, version_ids)
+        ],
+    )
+    content_ids = [uuid.uuid4() for _ in range(packages_count)]
+    await db.execute(
+        insert(CoreContent),
+        [
+            {'pulp_id': content_id, 'pulp_type': 'rpm.package'}
+            for content_id in content_ids
+        ],
+    )
+    await db.execute(
+        insert(RpmPackage),
+        [
+            {
+                'content_ptr_id': content_id,
+                'name': f'package-{idx // len(ARCHES)}',
+                'epoch': '0',
+                'version': f'1.{idx % 7}',
+                'release': f'{idx % 3}.el9',
+                'arch': ARCHES[idx % len(ARCHES)],
+            }
+            for idx, content_id in enumerate(content_ids)
+        ],
+    )
+    repo_content = []
+    for content_id in content_ids:
+        for repo_idx in random.sample(range(repos_count), copies):
+            repo_content.append({
+                'content_id': content_id,
+                'repository_id': repo_ids[repo_idx],
+                'version_added_id': version_ids[repo_idx],
+            })
+    await db.execute(insert(CoreRepositoryContent), repo_content)
+    await db.commit()
+    return repo_ids
+
+
+async def run_mode(name: str, func, iterations: int, *args, **kwargs):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = await func(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    print(
+        f'{name:>24}: {len(result)} keys, '
+        f'min {min(timings):.3f}s, avg {sum(timings) / iterations:.3f}s'
+    )
+    return result
+
+
+async def main():
+    args = parse_args()
+    engine = create_async_engine(
+        make_url(args.database_url).set(drivername='postgresql+asyncpg'),
+        connect_args={'server_settings': {'search_path': SCHEMA}},
+    )
+    async with engine.begin() as conn:
+        await conn.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+        await conn.execute(text(f'CREATE SCHEMA {SCHEMA}'))
+        # Pulp models declare DATETIME columns, which PostgreSQL lacks
+        await conn.execute(
+            text(f'CREATE DOMAIN {SCHEMA}.datetime AS timestamp')
+        )
+        await conn.run_sync(
+            database.PulpBase.metadata.create_all,
+            tables=[
+                CoreRepository.__table__,
+                CoreRepositoryVersion.__table__,
+                CoreContent.__table__,
+                CoreRepositoryContent.__table__,
+                RpmPackage.__table__,
+            ],
+        )
+    database.AsyncPulpSession = sessionmaker(
+        engine,
+        expire_on_commit=False,
+        class_=AsyncSession,
+    )
+    try:
+        async with database.AsyncPulpSession() as db:
+            repo_ids = await fill_pulp_data(
+                db, args.repos, args.packages, args.copies
+            )
+        async with engine.begin() as conn:
+            await conn.execute(text('ANALYZE'))
+        platform = types.SimpleNamespace(
+            arch_list=ARCHES[:-1],
+            repos=[
+                types.SimpleNamespace(
+                    production=True,
+                    pulp_href=f'/pulp/api/v3/repositories/rpm/rpm/{repo_id}/',
+                )
+                for repo_id in repo_ids
+            ],
+        )
+        names = sorted({
+            f'package-{idx // len(ARCHES)}' for idx in range(args.packages)
+        })
+        search_params = {
+            'name': random.sample(names, min(args.searched, len(names))),
+            'version': [f'1.{idx}' for idx in range(7)],
+            'epoch': ['0'],
+        }
+        print(
+            f'{args.repos} repositories, {args.packages} packages, '
+            f'{args.copies} copies of every package, '
+            f'{len(search_params["name"])} searched names'
+        )
+        for for_release in (False, True):
+            legacy = await run_mode(
+                f'per_repo for_release={for_release}',
+                legacy_load_platform_packages,
+                args.iterations,
+                platform,
+                search_params,
+                for_release=for_release,
+            )
+            single = await run_mode(
+                f'single for_release={for_release}',
+                load_platform_packages,
+                args.iterations,
+                platform,
+                search_params,
+                for_release=for_release,
+            )
+            assert legacy.keys() == single.keys()
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,219 @@
+"""
+Measures OVAL fragments rendering throughput for a growing number
+of worker processes, as done by regenerate_oval_fragments.
+
+Records are snapshots shaped like errata_record_to_oval_input output,
+so no database is needed. They are made from errata_create_payload
+of tests/fixtures/errata.py, which has no OVAL data itself, so every
+record gets a criteria tree of several levels and a set of tests,
+objects and states for its packages.
+The almalinux liboval package has to be installed.
+"""
+import argparse
+import concurrent.futures
+import datetime
+import inspect
+import multiprocessing
+import os
+import sys
+import time
+import types
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+)
+
+from alws.constants import ErrataPackageStatus, ErrataReferenceType
+from alws.crud.errata import render_oval_fragments
+from tests.fixtures.errata import errata_create_payload
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        'oval_regeneration',
+        description='Benchmark for OVAL fragments rendering in processes',
+    )
+    parser.add_argument(
+        '-r', '--records', type=int, default=5000,
+        help='Number of rendered errata records',
+    )
+    parser.add_argument(
+        '-p', '--packages', type=int, default=10,
+        help='Number of packages in every errata record',
+    )
+    parser.add_argument(
+        '-c', '--chunk-size', type=int, default=100,
+        help='Number of errata records rendered in one task',
+    )
+    parser.add_argument(
+        '-w', '--max-workers', type=int, default=os.cpu_count(),
+        help='Maximum number of worker processes',
+    )
+    return parser.parse_args()
+
+
+def get_fixture_payload(idx: int) -> dict:
+    request = types.SimpleNamespace(param={'id': f'ALSA-2023:{idx:05d}'})
+    return inspect.unwrap(errata_create_payload)(request)
+
+
+def make_record(idx: int, packages_count: int) -> types.SimpleNamespace:
+    payload = get_fixture_payload(idx)
+    definition_id = f'oval:com.redhat.rhsa:def:2023{idx:05d}'
+    packages = []
+    criterion = []
+    tests = []
+    objects = []
+    states = []
+    for pkg_idx in range(packages_count):
+        fixture_pkg = payload['packages'][
+            pkg_idx % len(payload['packages'])
+        ]
+        name = f'{fixture_pkg["name"]}-{pkg_idx}'
+        evr = (
+            f'{fixture_pkg["epoch"]}:{fixture_pkg["version"]}-'
+            f'{fixture_pkg["release"]}'
+        )
+        test_id = f'oval:com.redhat.rhsa:tst:2023{idx:05d}{pkg_idx:03d}'
+        object_id = f'oval:com.redhat.rhsa:obj:2023{idx:05d}{pkg_idx:03d}'
+        state_id = f'oval:com.redhat.rhsa:ste:2023{idx:05d}{pkg_idx:03d}'
+        packages.append(types.SimpleNamespace(
+            epoch=str(fixture_pkg['epoch']),
+            version=fixture_pkg['version'],
+            release=fixture_pkg['release'],
+            arch=fixture_pkg['arch'],
+            albs_packages=[
+                types.SimpleNamespace(
+                    name=name,
+                    epoch=str(fixture_pkg['epoch']),
+                    version=fixture_pkg['version'],
+                    release=fixture_pkg['release'],
+                    arch=fixture_pkg['arch'],
+                    status=ErrataPackageStatus.released,
+                ),
+            ],
+        ))
+        criterion.append({
+            'ref': test_id,
+            'comment': f'{name} is earlier than {evr}',
+        })
+        tests.append({
+            'id': test_id,
+            'type': 'rpminfo_test',
+            'comment': f'{name} is earlier than {evr}',
+            'check': 'at least one',
+            'version': 1,
+            'object_ref': object_id,
+            'state_ref': state_id,
+        })
+        objects.append({
+            'id': object_id,
+            'type': 'rpminfo_object',
+            'name': name,
+            'version': 1,
+        })
+        states.append({
+            'id': state_id,
+            'type': 'rpminfo_state',
+            'arch': '',
+            'evr': evr,
+            'signature_keyid': '199e2f91fd431d51',
+            'version': 1,
+        })
+    return types.SimpleNamespace(
+        id=payload['id'],
+        freezed=payload['freezed'],
+        oval_title=None,
+        title=None,
+        original_title=f'{payload["id"]}: benchmark update',
+        description=None,
+        original_description='Synthetic errata record',
+        definition_id=definition_id,
+        definition_version=payload['definition_version'],
+        definition_class=payload['definition_class'],
+        contact_mail='packager@almalinux.org',
+        severity=payload['severity'],
+        rights=payload['rights'],
+        issued_date=datetime.datetime.fromisoformat(payload['issued_date']),
+        updated_date=datetime.datetime.fromisoformat(
+            payload['updated_date']
+        ),
+        affected_cpe=payload['affected_cpe'],
+        platform=types.SimpleNamespace(distr_version='8'),
+        packages=packages,
+        references=[
+            types.SimpleNamespace(
+                ref_id=ref['ref_id'],
+                ref_type=ErrataReferenceType(ref['ref_type']),
+                href=ref['href'],
+                title=ref['title'],
+                cve=types.SimpleNamespace(**ref['cve']),
+            )
+            for ref in payload['references']
+        ],
+        original_criteria=[{
+            'operator': 'OR',
+            'criterion': [],
+            'criteria': [{
+                'operator': 'AND',
+                'criterion': [{
+                    'ref': 'oval:com.redhat.rhba:tst:20191992005',
+                    'comment': 'Red Hat Enterprise Linux 8 is installed',
+                }],
+                'criteria': [{
+                    'operator': 'OR',
+                    'criterion': criterion,
+                    'criteria': [],
+                }],
+            }],
+        }],
+        original_tests=tests,
+        original_objects=objects,
+        original_states=states,
+        original_variables=[],
+    )
+
+
+def main():
+    args = parse_args()
+    try:
+        import almalinux.liboval  # noqa: F401
+    except ImportError:
+        sys.exit('almalinux liboval is required to render OVAL fragments')
+    records = [
+        make_record(idx, args.packages) for idx in range(args.records)
+    ]
+    chunks = [
+        records[start:start + args.chunk_size]
+        for start in range(0, len(records), args.chunk_size)
+    ]
+    start = time.perf_counter()
+    render_oval_fragments(records)
+    baseline = time.perf_counter() - start
+    print(
+        f'{"in process":>12}: {baseline:.3f}s, '
+        f'{len(records) / baseline:.0f} records/s'
+    )
+    workers = 1
+    while True:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+        ) as pool:
+            # start processes before timing
+            list(pool.map(render_oval_fragments, [[]] * workers))
+            start = time.perf_counter()
+            list(pool.map(render_oval_fragments, chunks))
+            elapsed = time.perf_counter() - start
+        print(
+            f'{workers:>4} workers: {elapsed:.3f}s, '
+            f'{len(records) / elapsed:.0f} records/s, '
+            f'speedup {baseline / elapsed:.2f}x'
+        )
+        if workers >= args.max_workers:
+            break
+        workers = min(workers * 2, args.max_workers)
+
+
+if __name__ == '__main__':
+    main()
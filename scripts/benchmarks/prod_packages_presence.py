@@ -0,0 +1,240 @@
+"""
+Compares production packages presence check of the release planner done
+with separate IN lists of names, epochs, versions, releases and arches
+(as it was done before) and with a join on exact NEVRA tuples.
+
+The script fills a throwaway schema with synthetic Pulp repositories
+and packages, so it should be pointed to a test database
+(test_database_url by default). The schema is dropped afterwards.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sys
+import time
+import uuid
+
+from sqlalchemy import insert, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+)
+
+from alws import database
+from alws.config import settings
+from alws.pulp_models import (
+    CoreContent,
+    CoreRepository,
+    CoreRepositoryContent,
+    CoreRepositoryVersion,
+    RpmPackage,
+)
+from alws.utils.pulp_utils import (
+    get_rpm_packages_by_nevras,
+    get_rpm_packages_from_repositories,
+)
+
+SCHEMA = 'prod_packages_presence_benchmark'
+ARCHES = ['x86_64', 'i686', 'aarch64', 'ppc64le', 's390x', 'noarch']
+VERSIONS = ['1.0', '1.1', '2.0']
+RELEASES = ['1.el9', '2.el9']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        'prod_packages_presence',
+        description='Benchmark for production packages presence check',
+    )
+    parser.add_argument(
+        '-r', '--repos', type=int, default=20,
+        help='Number of production repositories of the platform',
+    )
+    parser.add_argument(
+        '-n', '--names', type=int, default=2000,
+        help='Number of package names, every name has '
+             f'{len(ARCHES) * len(VERSIONS) * len(RELEASES)} NEVRAs',
+    )
+    parser.add_argument(
+        '-p', '--plan-packages', type=int, default=2000,
+        help='Number of packages in the release plan',
+    )
+    parser.add_argument(
+        '-i', '--iterations', type=int, default=3,
+        help='Number of checks in every mode',
+    )
+    parser.add_argument(
+        '-d', '--database-url', type=str,
+        default=settings.test_database_url,
+        help='Database URL, test database is used by default',
+    )
+    return parser.parse_args()
+
+
+async def fill_pulp_data(db: AsyncSession, repos_count: int, names: int):
+    repo_ids = [uuid.uuid4() for _ in range(repos_count)]
+    version_ids = [uuid.uuid4() for _ in range(repos_count)]
+    await db.execute(
+        insert(CoreRepository),
+        [
+            {
+                'pulp_id': repo_id,
+                'name': f'benchmark-{idx}',
+                'pulp_type': 'rpm.rpm',
+            }
+            for idx, repo_id in enumerate(repo_ids)
+        ],
+    )
+    await db.execute(
+        insert(CoreRepositoryVersion),
+        [
+            {'pulp_id': version_id, 'repository_id': repo_id, 'number': 1}
+            for repo_id, version_id in zip(repo_ids, version_ids)
+        ],
+    )
+    nevras = [
+        (f'package-{idx}', '0', version, release, arch)
+        for idx, version, release, arch in itertools.product(
+            range(names), VERSIONS, RELEASES, ARCHES,
+        )
+    ]
+    content_ids = [uuid.uuid4() for _ in nevras]
+    await db.execute(
+        insert(CoreContent),
+        [
+            {'pulp_id': content_id, 'pulp_type': 'rpm.package'}
+            for content_id in content_ids
+        ],
+    )
+    await db.execute(
+        insert(RpmPackage),
+        [
+            {
+                'content_ptr_id': content_id,
+                'name': name,
+                'epoch': epoch,
+                'version': version,
+                'release': release,
+                'arch': arch,
+            }
+            for content_id, (name, epoch, version, release, arch) in zip(
+                content_ids, nevras
+            )
+        ],
+    )
+    await db.execute(
+        insert(CoreRepositoryContent),
+        [
+            {
+                'content_id': content_id,
+                'repository_id': repo_ids[repo_idx],
+                'version_added_id': version_ids[repo_idx],
+            }
+            for content_id in content_ids
+            for repo_idx in random.sample(range(repos_count), 2)
+        ],
+    )
+    await db.commit()
+    return repo_ids, nevras
+
+
+async def legacy_check(repo_ids, nevras):
+    names, epochs, versions, releases, arches = zip(*nevras)
+    pkgs = await get_rpm_packages_from_repositories(
+        repo_ids=repo_ids,
+        pkg_names=list(names),
+        pkg_epochs=list(epochs),
+        pkg_versions=list(versions),
+        pkg_releases=list(releases),
+        pkg_arches=list(arches),
+    )
+    rows = sum(len(pkg.repo_ids) for pkg in pkgs)
+    searched = set(nevras)
+    hits = {
+        (pkg.pulp_href, repo_id)
+        for pkg in pkgs
+        if (pkg.name, pkg.epoch, pkg.version, pkg.release, pkg.arch)
+        in searched
+        for repo_id in pkg.repo_ids
+    }
+    return rows, hits
+
+
+async def nevras_check(repo_ids, nevras):
+    pkgs = await get_rpm_packages_by_nevras(repo_ids, nevras)
+    return len(pkgs), {(pkg.pulp_href, repo_id) for pkg, repo_id in pkgs}
+
+
+async def run_mode(name: str, func, iterations: int, *args):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        rows, hits = await func(*args)
+        timings.append(time.perf_counter() - start)
+    print(
+        f'{name:>8}: {rows} rows, {len(hits)} hits, '
+        f'min {min(timings):.3f}s, avg {sum(timings) / iterations:.3f}s'
+    )
+    return rows, hits
+
+
+async def main():
+    args = parse_args()
+    engine = create_async_engine(
+        make_url(args.database_url).set(drivername='postgresql+asyncpg'),
+        connect_args={'server_settings': {'search_path': SCHEMA}},
+    )
+    async with engine.begin() as conn:
+        await conn.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+        await conn.execute(text(f'CREATE SCHEMA {SCHEMA}'))
+        # Pulp models declare DATETIME columns, which PostgreSQL lacks
+        await conn.execute(
+            text(f'CREATE DOMAIN {SCHEMA}.datetime AS timestamp')
+        )
+        await conn.run_sync(
+            database.PulpBase.metadata.create_all,
+            tables=[
+                CoreRepository.__table__,
+                CoreRepositoryVersion.__table__,
+                CoreContent.__table__,
+                CoreRepositoryContent.__table__,
+                RpmPackage.__table__,
+            ],
+        )
+    database.AsyncPulpSession = sessionmaker(
+        engine,
+        expire_on_commit=False,
+        class_=AsyncSession,
+    )
+    try:
+        async with database.AsyncPulpSession() as db:
+            repo_ids, nevras = await fill_pulp_data(
+                db, args.repos, args.names
+            )
+        async with engine.begin() as conn:
+            await conn.execute(text('ANALYZE'))
+        plan_nevras = random.sample(nevras, args.plan_packages)
+        print(
+            f'{args.repos} repositories, {len(nevras)} packages, '
+            f'{len(plan_nevras)} packages in the release plan'
+        )
+        legacy_rows, legacy_hits = await run_mode(
+            'in_lists', legacy_check, args.iterations, repo_ids, plan_nevras,
+        )
+        rows, hits = await run_mode(
+            'nevras', nevras_check, args.iterations, repo_ids, plan_nevras,
+        )
+        assert hits == legacy_hits
+        print(f'rows reduced {legacy_rows / rows:.1f}x')
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,160 @@
+"""
+Compares PulpClient requests per second with a client per request
+(as it was done before) and with the shared connection pool.
+
+A local stub Pulp server is started by the script, so neither Pulp
+nor a database is needed. The stub answers every GET with a small
+JSON document and every other method with a task href.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import urllib.parse
+
+import aiohttp
+from aiohttp import web
+from aiohttp_retry import RetryClient
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+)
+
+from alws.utils.pulp_client import PULP_SEMAPHORE, PulpClient
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        'pulp_client_session',
+        description='Benchmark for PulpClient HTTP connections handling',
+    )
+    parser.add_argument(
+        '-r', '--requests', type=int, default=2000,
+        help='Number of requests to send in every mode',
+    )
+    parser.add_argument(
+        '-c', '--concurrency', type=int, default=50,
+        help='Number of concurrently running callers',
+    )
+    parser.add_argument(
+        '-p', '--port', type=int, default=0,
+        help='Stub server port, random free port by default',
+    )
+    return parser.parse_args()
+
+
+async def stub_handler(request: web.Request) -> web.Response:
+    if request.method == 'GET':
+        return web.json_response({
+            'pulp_href': request.path,
+            'state': 'completed',
+            'count': 0,
+            'results': [],
+        })
+    return web.json_response({'task': '/pulp/api/v3/tasks/1/'})
+
+
+async def start_stub_server(port: int) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_route('*', '/{tail:.*}', stub_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', port)
+    await site.start()
+    return runner
+
+
+class PerRequestPulpClient(PulpClient):
+    """
+    Opens a new client for every request like PulpClient did before
+    the shared connection pool was introduced.
+    """
+
+    async def request(
+        self,
+        method: str,
+        endpoint: str,
+        params: dict = None,
+        json: dict = None,
+        **kwargs,
+    ) -> dict:
+        full_url = urllib.parse.urljoin(self._host, endpoint)
+        async with PULP_SEMAPHORE:
+            if method.lower() == 'get':
+                async with RetryClient(
+                    retry_options=self._retry_options,
+                ) as client:
+                    response = await client.get(
+                        full_url,
+                        params=params,
+                        auth=self._auth,
+                    )
+                    response_json = await response.json()
+            else:
+                async with aiohttp.request(
+                    method,
+                    full_url,
+                    params=params,
+                    json=json,
+                    auth=self._auth,
+                ) as response:
+                    response_json = await response.json()
+            response.raise_for_status()
+            return response_json
+
+
+async def run_mode(
+    name: str,
+    client: PulpClient,
+    requests: int,
+    concurrency: int,
+):
+    queue = asyncio.Queue()
+    for i in range(requests):
+        method = 'GET' if i % 4 else 'POST'
+        queue.put_nowait((method, f'pulp/api/v3/content/rpm/packages/{i}/'))
+
+    async def caller():
+        while not queue.empty():
+            method, endpoint = queue.get_nowait()
+            await client.request(method, endpoint, json={})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    print(
+        f'{name:>12}: {requests} requests in {elapsed:.2f}s '
+        f'({requests / elapsed:.1f} requests/s)'
+    )
+
+
+async def main():
+    args = parse_args()
+    runner = await start_stub_server(args.port)
+    port = runner.addresses[0][1]
+    host = f'http://127.0.0.1:{port}'
+    print(
+        f'Stub Pulp server at {host}, {args.requests} requests, '
+        f'{args.concurrency} callers'
+    )
+    try:
+        await run_mode(
+            'per_request',
+            PerRequestPulpClient(host, 'admin', 'admin'),
+            args.requests,
+            args.concurrency,
+        )
+        await run_mode(
+            'pooled',
+            PulpClient(host, 'admin', 'admin'),
+            args.requests,
+            args.concurrency,
+        )
+    finally:
+        await PulpClient.close_session()
+        await runner.cleanup()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,251 @@
+"""
+Compares Beholder lookups and beholder_cache building of the release
+planner as they were done before (a lookup per module one after another,
+deep copies for every weak arch) and in the batched mode.
+
+Beholder is replaced by a local stand-in answering with packages from
+tests/fixtures/beholder.py, renamed and scaled to the requested number
+of source packages. Every response is delayed to emulate the network.
+"""
+import argparse
+import asyncio
+import copy
+import inspect
+import itertools
+import os
+import sys
+import time
+import types
+from collections import defaultdict
+
+from aiohttp import web
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+)
+
+# planners have to be imported through dramatiq actors
+import alws.dramatiq  # noqa: F401
+from alws.config import settings
+from alws.constants import BeholderKey, BeholderMatchMethod
+from alws.release_planner import AlmaLinuxReleasePlanner
+from alws.utils.beholder_client import BeholderClient
+from tests.fixtures import beholder as beholder_fixtures
+
+PLATFORMS = [
+    types.SimpleNamespace(name='AlmaLinux-8', distr_version='8', priority=0),
+    types.SimpleNamespace(name='RHEL-8', distr_version='8', priority=10),
+    types.SimpleNamespace(name='CentOS-8', distr_version='8', priority=5),
+]
+STRONG_ARCHES = defaultdict(list, {'x86_64': ['i686'], 'noarch': []})
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        'release_plan_beholder',
+        description='Benchmark for Beholder lookups of the release planner',
+    )
+    parser.add_argument(
+        '-s', '--src-packages', type=int, default=1000,
+        help='Number of source packages in the release',
+    )
+    parser.add_argument(
+        '-m', '--modules', type=int, default=20,
+        help='Number of modules in the release',
+    )
+    parser.add_argument(
+        '-l', '--latency', type=float, default=0.05,
+        help='Beholder response delay in seconds',
+    )
+    parser.add_argument(
+        '-i', '--iterations', type=int, default=3,
+        help='Number of runs in every mode',
+    )
+    return parser.parse_args()
+
+
+def load_fixture_packages():
+    packages = []
+    for name, fixture in inspect.getmembers(beholder_fixtures):
+        if not name.startswith('beholder_') or not name.endswith('response'):
+            continue
+        response = inspect.unwrap(fixture)()
+        if isinstance(response.get('packages'), dict):
+            for pkgs in response['packages'].values():
+                packages.extend(pkgs)
+        for artifact in response.get('artifacts', []):
+            packages.extend(artifact['packages'])
+    return [pkg for pkg in packages if pkg['arch'] != 'src']
+
+
+def make_packages_response(src_count: int) -> dict:
+    fixture_packages = itertools.cycle(load_fixture_packages())
+    return {
+        'packages': [
+            {
+                'packages': {
+                    BeholderMatchMethod.EXACT.value: [
+                        {**pkg, 'name': f'{pkg["name"]}-{idx}'}
+                        for pkg in itertools.islice(fixture_packages, 8)
+                    ],
+                },
+            }
+            for idx in range(src_count)
+        ],
+    }
+
+
+def legacy_update_beholder_cache(
+    beholder_cache, packages, strong_arches, is_beta, is_devel,
+    priority, matched,
+):
+    def generate_key(pkg_arch: str) -> BeholderKey:
+        return BeholderKey(
+            pkg['name'], pkg['version'], pkg_arch, is_beta, is_devel,
+        )
+
+    for pkg in packages:
+        key = generate_key(pkg['arch'])
+        pkg['priority'] = priority
+        pkg['matched'] = matched
+        beholder_cache[key] = pkg
+        for weak_arch in strong_arches[pkg['arch']]:
+            second_key = generate_key(weak_arch)
+            cache_item = beholder_cache.get(second_key, {})
+            if (
+                cache_item.get('repositories', [])
+                and weak_arch == 'i686'
+                and priority >= cache_item['priority']
+            ):
+                continue
+            replaced_pkg = copy.deepcopy(pkg)
+            for repo in replaced_pkg['repositories']:
+                if repo['arch'] == pkg['arch']:
+                    repo['arch'] = weak_arch
+            beholder_cache[second_key] = replaced_pkg
+
+
+def build_cache(update_func, responses):
+    beholder_cache = {}
+    for response in responses:
+        for pkg_list in response['packages']:
+            for matched, pkgs in pkg_list['packages'].items():
+                update_func(
+                    beholder_cache, pkgs, STRONG_ARCHES, False, False,
+                    response['priority'], matched,
+                )
+    return beholder_cache
+
+
+async def start_beholder(packages_response: dict, latency: float):
+    async def projects(request):
+        await asyncio.sleep(latency)
+        return web.json_response({
+            **packages_response,
+            'distribution': {
+                'name': request.match_info['distr'],
+                'version': '8',
+            },
+        })
+
+    async def module(request):
+        await asyncio.sleep(latency)
+        return web.json_response({
+            'distribution': {
+                'name': request.match_info['distr'],
+                'version': '8',
+            },
+            'name': request.match_info['name'],
+            'artifacts': [],
+            'repository': {'name': 'almalinux-8-appstream'},
+        })
+
+    app = web.Application()
+    app.router.add_post('/api/v1/distros/{distr}/8/projects/', projects)
+    app.router.add_get(
+        '/api/v1/distros/{distr}/8/module/{name}/{stream}/{arch}/', module,
+    )
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 0).start()
+    return runner
+
+
+async def legacy_lookups(client, lookups, src_rpm_names):
+    modules_responses = []
+    for name, stream, arches in lookups:
+        modules_responses.append(await client.retrieve_responses(
+            PLATFORMS,
+            module_name=name,
+            module_stream=stream,
+            module_arch_list=list(arches),
+        ))
+    src_responses = await client.retrieve_responses(
+        PLATFORMS,
+        data={
+            'source_rpms': src_rpm_names,
+            'match': BeholderMatchMethod.all(),
+        },
+    )
+    return modules_responses, src_responses
+
+
+async def run_mode(name, func, iterations, *args):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = func(*args)
+        if inspect.isawaitable(result):
+            result = await result
+        timings.append(time.perf_counter() - start)
+    print(
+        f'{name:>24}: min {min(timings):.3f}s, '
+        f'avg {sum(timings) / iterations:.3f}s'
+    )
+    return result
+
+
+async def main():
+    args = parse_args()
+    packages_response = make_packages_response(args.src_packages)
+    runner = await start_beholder(packages_response, args.latency)
+    host = f'http://127.0.0.1:{runner.addresses[0][1]}'
+    client = BeholderClient(host, cache_ttl=0)
+    planner = AlmaLinuxReleasePlanner(None)
+    planner._beholder_client = client
+    src_rpm_names = [
+        f'package-{idx}-1.0-1.el8.src.rpm' for idx in range(args.src_packages)
+    ]
+    lookups = [
+        (f'module-{idx}', 'stable', ('i686', 'x86_64'))
+        for idx in range(args.modules)
+    ]
+    try:
+        concurrency = settings.beholder_concurrency
+        # endpoints were requested one after another before
+        settings.beholder_concurrency = 1
+        await run_mode(
+            'legacy lookups', legacy_lookups, args.iterations,
+            client, lookups, src_rpm_names,
+        )
+        settings.beholder_concurrency = concurrency
+        _, src_responses = await run_mode(
+            'batched lookups', planner.get_beholder_responses,
+            args.iterations, PLATFORMS, lookups, src_rpm_names,
+        )
+    finally:
+        await runner.cleanup()
+    legacy_cache = await run_mode(
+        'legacy cache', build_cache, args.iterations,
+        legacy_update_beholder_cache, copy.deepcopy(src_responses),
+    )
+    cache = await run_mode(
+        'batched cache', build_cache, args.iterations,
+        planner.update_beholder_cache, copy.deepcopy(src_responses),
+    )
+    assert cache == legacy_cache
+    print(f'{len(cache)} beholder_cache keys')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -86,7 +86,7 @@ async def main(
             get_uuid_from_pulp_href(artifact.href): artifact.id
             for artifact in build_artifacts
         }
-        pulp_pkgs = get_rpm_packages_by_ids(
+        pulp_pkgs = await get_rpm_packages_by_ids(
             list(build_pkgs_mapping),
             [
                 RpmPackage.content_ptr_id,
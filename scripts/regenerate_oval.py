@@ -0,0 +1,51 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from contextlib import asynccontextmanager
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from alws.crud.errata import (
+    OVAL_FRAGMENTS_CHUNK_SIZE,
+    regenerate_oval_fragments,
+)
+from alws.dependencies import get_db
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        'regenerate_oval',
+        description='Renders OVAL fragments of errata records from scratch',
+    )
+    parser.add_argument(
+        '-p', '--platform', type=str, action='append', default=None,
+        help='Platform name, can be repeated, all platforms by default',
+    )
+    parser.add_argument(
+        '-w', '--workers', type=int, default=None,
+        help='Number of rendering processes, CPU count by default',
+    )
+    parser.add_argument(
+        '-c', '--chunk-size', type=int, default=OVAL_FRAGMENTS_CHUNK_SIZE,
+        help='Number of errata records rendered in one task',
+    )
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    async with asynccontextmanager(get_db)() as db:
+        rendered = await regenerate_oval_fragments(
+            db,
+            platform_names=args.platform,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+        )
+    logging.info('Regenerated OVAL fragments of %d errata records', rendered)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
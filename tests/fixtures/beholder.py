@@ -1921,7 +1921,7 @@ def mock_beholder_call(
 
 @pytest.fixture
 def get_multilib_packages_from_pulp(monkeypatch):
-    def func(*args, **kwargs):
+    async def func(*args, **kwargs):
         *_, artifacts = args
         result = {}
         for artifact in artifacts:
@@ -1083,7 +1083,7 @@ async def regular_build_with_user_product(
 
 @pytest.fixture
 def get_rpm_packages_info(monkeypatch):
-    def func(artifacts):
+    async def func(artifacts):
         return {
             artifact.href: get_rpm_pkg_info(artifact) for artifact in artifacts
         }
@@ -87,18 +87,18 @@ def errata_create_payload(request) -> typing.Dict[str, typing.Any]:
 
 @pytest.fixture(autouse=True)
 def mock_get_packages_from_pulp_repo(monkeypatch):
-    def func(*args, **kwargs):
+    async def func(*args, **kwargs):
         return []
 
     monkeypatch.setattr(
-        "alws.crud.errata.get_rpm_packages_from_repository",
+        "alws.crud.errata.get_rpm_packages_by_repositories",
         func,
     )
 
 
 @pytest.fixture(autouse=True)
 def mock_get_packages_from_pulp_by_ids(monkeypatch):
-    def func(*args, **kwargs):
+    async def func(*args, **kwargs):
         return {}
 
     monkeypatch.setattr("alws.crud.errata.get_rpm_packages_by_ids", func)
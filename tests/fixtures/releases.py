@@ -20,11 +20,11 @@ async def get_pulp_packages_info(monkeypatch):
 
 @pytest.fixture
 def disable_packages_check_in_prod_repos(monkeypatch):
-    def func(*args, **kwargs):
+    async def func(*args, **kwargs):
         return []
 
     monkeypatch.setattr(
-        "alws.release_planner.get_rpm_packages_from_repositories",
+        "alws.release_planner.get_rpm_packages_by_nevras",
         func,
     )
 
@@ -32,18 +32,21 @@ def disable_packages_check_in_prod_repos(monkeypatch):
 @pytest.mark.anyio
 @pytest.fixture
 async def disable_sign_verify(monkeypatch):
-    async def func(*args, **kwargs):
-        return True
+    async def func(db, build_ids, platform_id):
+        return {
+            build_id: {"verified": True, "reason": None}
+            for build_id in build_ids
+        }
 
     monkeypatch.setattr(
-        "alws.release_planner.sign_task.verify_signed_build",
+        "alws.release_planner.sign_task.verify_signed_builds",
         func,
     )
 
 
 @pytest.fixture(autouse=True)
 def mock_get_packages_from_64_bit_repos(monkeypatch):
-    def func(*args, **kwargs):
+    async def func(*args, **kwargs):
         return []
 
     monkeypatch.setattr(
@@ -6,7 +6,7 @@ from alws.utils.parsing import parse_rpm_nevra
 
 @pytest.fixture
 def mock_get_pulp_packages(monkeypatch):
-    def func(*args, **kwargs):
+    async def func(*args, **kwargs):
         result = {}
         artifacts, *_ = args
         for artifact in artifacts:
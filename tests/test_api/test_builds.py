@@ -1,7 +1,10 @@
 import pytest
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from alws.config import settings
 from alws.constants import BuildTaskStatus
-from alws.models import Build
+from alws.models import Build, BuildTask, BuildTaskDependency
 from alws.utils.modularity import IndexWrapper
 from tests.constants import CUSTOM_USER_ID
 from tests.mock_classes import BaseAsyncTestCase
@@ -18,6 +21,62 @@ class TestBuildsEndpoints(BaseAsyncTestCase):
         message = f"Cannot ping tasks:\n{response.text}"
         assert response.status_code == self.status_codes.HTTP_200_OK, message
 
+    @pytest.mark.parametrize("skip_locked", [True, False])
+    async def test_get_tasks(
+        self,
+        regular_build: Build,
+        start_build,
+        session: AsyncSession,
+        skip_locked: bool,
+        monkeypatch,
+    ):
+        monkeypatch.setattr(settings, "build_task_skip_locked", skip_locked)
+        # make both arches of the build ready at once
+        await session.execute(
+            delete(BuildTaskDependency).where(
+                BuildTaskDependency.c.build_task_id.in_(
+                    select(BuildTask.id).where(
+                        BuildTask.build_id == regular_build.id
+                    )
+                )
+            )
+        )
+        await session.commit()
+        response = await self.make_request(
+            "post",
+            "/api/v1/build_node/get_tasks",
+            json={"supported_arches": ["i686", "x86_64"], "max_tasks": 2},
+        )
+        message = f"Cannot get build tasks:\n{response.text}"
+        assert response.status_code == self.status_codes.HTTP_200_OK, message
+        tasks = response.json()
+        message = f"Unexpected number of build tasks:\n{response.text}"
+        assert len(tasks) == 2, message
+        assert len({task["id"] for task in tasks}) == 2
+
+        # claimed tasks aren't handed out to another build node
+        response = await self.make_request(
+            "post",
+            "/api/v1/build_node/get_tasks",
+            json={"supported_arches": ["i686", "x86_64"], "max_tasks": 2},
+        )
+        assert response.status_code == self.status_codes.HTTP_200_OK
+        other_ids = {task["id"] for task in response.json()}
+        assert not other_ids & {task["id"] for task in tasks}
+
+        response = await self.make_request(
+            "post",
+            "/api/v1/build_node/get_tasks",
+            json={
+                "supported_arches": ["x86_64"],
+                "max_tasks": settings.build_node_max_tasks_per_request + 1,
+            },
+        )
+        assert (
+            response.status_code
+            == self.status_codes.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+
     async def test_mark_build_as_cancelled(
         self,
         regular_build: Build,
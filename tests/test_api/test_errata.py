@@ -1,5 +1,8 @@
+import dramatiq
 import pytest
 
+from alws.crud import errata as errata_crud
+from alws.dramatiq.errata import ERRATA_IMPORT_CHUNK_SIZE
 from tests.mock_classes import BaseAsyncTestCase
 
 
@@ -29,3 +32,43 @@ class TestErrataEndpoints(BaseAsyncTestCase):
             response.status_code == self.status_codes.HTTP_200_OK
             and "xml version" in response.text
         ), f"Cannot get updateinfo.xml:\n{response.text}"
+
+    async def test_get_bulk_updateinfo_xml_is_limited(self):
+        query = "&".join(
+            f"ids=ALSA-2023:{idx:04d}"
+            for idx in range(errata_crud.UPDATEINFO_MAX_RECORDS + 1)
+        )
+        response = await self.make_request(
+            "get",
+            f"/api/v1/errata/updateinfo/?{query}",
+        )
+        assert (
+            response.status_code == self.status_codes.HTTP_400_BAD_REQUEST
+        ), response.text
+
+    async def test_bulk_create_async_is_chunked(
+        self,
+        errata_create_payload,
+        monkeypatch,
+    ):
+        messages = []
+        monkeypatch.setattr(
+            dramatiq.Actor,
+            "send",
+            lambda actor, records, upsert: messages.append(records),
+        )
+        count = ERRATA_IMPORT_CHUNK_SIZE + 1
+        response = await self.make_request(
+            "post",
+            "/api/v1/errata/bulk_create_async/",
+            json=[
+                {**errata_create_payload, "id": f"ALSA-2023:{idx:05d}"}
+                for idx in range(count)
+            ],
+        )
+        assert response.status_code == self.status_codes.HTTP_200_OK
+        assert [len(records) for records in messages] == [
+            ERRATA_IMPORT_CHUNK_SIZE,
+            1,
+        ]
+        assert messages[1][0]["id"] == f"ALSA-2023:{count - 1:05d}"
@@ -0,0 +1,135 @@
+import datetime
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from alws import models
+from alws.constants import ErrataPackageStatus
+from alws.crud import build_node as build_node_crud
+from alws.crud.build_node import bulk_ping_tasks
+from alws.models import Build
+
+
+@pytest.mark.anyio
+async def test_bulk_ping_tasks(
+    session: AsyncSession,
+    regular_build: Build,
+    start_build,
+):
+    task_ids = (
+        (
+            await session.execute(
+                select(models.BuildTask.id)
+                .where(models.BuildTask.build_id == regular_build.id)
+                .order_by(models.BuildTask.id)
+            )
+        )
+        .scalars()
+        .all()
+    )
+    pinged_id, future_id = task_ids[:2]
+    now = datetime.datetime.utcnow()
+    future_ts = now + datetime.timedelta(hours=3)
+    await session.execute(
+        update(models.BuildTask)
+        .where(models.BuildTask.id == future_id)
+        .values(ts=future_ts)
+    )
+    await session.commit()
+
+    await bulk_ping_tasks(session, {pinged_id: now, future_id: now})
+
+    timestamps = dict(
+        (
+            await session.execute(
+                select(models.BuildTask.id, models.BuildTask.ts).where(
+                    models.BuildTask.id.in_([pinged_id, future_id])
+                )
+            )
+        ).all()
+    )
+    assert timestamps[pinged_id] == now
+    assert timestamps[future_id] == future_ts
+
+
+@pytest.mark.anyio
+async def test_add_errata_packages_proposals(
+    session: AsyncSession,
+    regular_build: Build,
+    start_build,
+    create_errata,
+):
+    task_id = (
+        await session.execute(
+            select(models.BuildTask.id)
+            .where(models.BuildTask.build_id == regular_build.id)
+            .limit(1)
+        )
+    ).scalar()
+    rpms_info = {}
+    rpms = []
+    for name, release, arch in (
+        ("chan", "3.el8", "x86_64"),
+        ("chan-debuginfo", "3.el8", "x86_64"),
+        ("usbguard", "8.el8_7.2", "noarch"),
+    ):
+        version = "1.0.0" if name == "usbguard" else "0.0.4"
+        href = f"/pulp/api/v3/content/rpm/packages/{name}-{arch}/"
+        rpms.append(
+            models.BuildTaskArtifact(
+                build_task_id=task_id,
+                name=f"{name}-{version}-{release}.{arch}.rpm",
+                type="rpm",
+                href=href,
+            )
+        )
+        rpms_info[href] = {
+            "name": name,
+            "epoch": "0",
+            "version": version,
+            "release": release,
+            "arch": arch,
+            "rpm_sourcerpm": f"{name}-{version}-{release}.src.rpm",
+        }
+
+    await build_node_crud.add_errata_packages_proposals(
+        session, rpms, rpms_info
+    )
+    await session.commit()
+
+    proposals = (
+        (
+            await session.execute(
+                select(models.ErrataToALBSPackage)
+                .where(
+                    models.ErrataToALBSPackage.albs_artifact_id.in_(
+                        [rpm.id for rpm in rpms]
+                    )
+                )
+                .options(
+                    selectinload(models.ErrataToALBSPackage.errata_package)
+                )
+            )
+        )
+        .scalars()
+        .all()
+    )
+    # noarch package matches errata packages of every arch
+    assert sorted(
+        (
+            proposal.name,
+            proposal.arch,
+            proposal.errata_package.arch,
+            proposal.errata_package.source_srpm,
+        )
+        for proposal in proposals
+    ) == [
+        ("chan", "x86_64", "x86_64", "chan"),
+        ("usbguard", "noarch", "x86_64", "usbguard"),
+    ]
+    assert all(
+        proposal.status == ErrataPackageStatus.proposal
+        for proposal in proposals
+    )
@@ -0,0 +1,758 @@
+import collections
+import concurrent.futures
+import datetime
+import pickle
+import uuid
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from alws import models
+from alws.constants import ErrataPackageStatus, ErrataReleaseStatus
+from alws.crud import errata as errata_crud
+from alws.pulp_models import RpmPackage
+from alws.schemas.errata_schema import BaseErrataRecord
+
+
+@pytest.mark.anyio
+async def test_get_oval_xml_renders_changed_records_only(
+    session: AsyncSession,
+    base_platform: models.Platform,
+    create_errata,
+    monkeypatch,
+):
+    rendered = []
+    merges = []
+
+    def render(record):
+        rendered.append(record.id)
+        return {"id": record.id, "updated_date": str(record.updated_date)}
+
+    def merge(fragments):
+        fragments = list(fragments)
+        merges.append(fragments)
+        return "\n".join(fragment["updated_date"] for fragment in fragments)
+
+    monkeypatch.setattr(errata_crud, "errata_record_to_oval_fragment", render)
+    monkeypatch.setattr(errata_crud, "oval_fragments_to_xml", merge)
+    record_id = (
+        await session.execute(
+            select(models.ErrataRecord.id).where(
+                models.ErrataRecord.platform_id == base_platform.id
+            )
+        )
+    ).scalar()
+
+    oval_xml = await errata_crud.get_oval_xml(session, base_platform.name)
+    assert rendered == [record_id]
+    assert oval_xml == "2022-10-22 00:00:00"
+
+    # nothing has changed, neither rendering nor merging is needed
+    assert await errata_crud.get_oval_xml(session, base_platform.name) == (
+        oval_xml
+    )
+    assert rendered == [record_id]
+    assert len(merges) == 1
+
+    await session.execute(
+        update(models.ErrataRecord)
+        .where(models.ErrataRecord.id == record_id)
+        .values(updated_date=datetime.datetime(2023, 1, 1))
+    )
+    await session.commit()
+    oval_xml = await errata_crud.get_oval_xml(session, base_platform.name)
+    assert rendered == [record_id, record_id]
+    assert oval_xml == "2023-01-01 00:00:00"
+
+
+@pytest.mark.anyio
+async def test_regenerate_oval_fragments(
+    session: AsyncSession,
+    base_platform: models.Platform,
+    errata_create_payload,
+    monkeypatch,
+):
+    for record_id in ("ALSA-2023:0500", "ALSA-2023:0501"):
+        await errata_crud.create_errata_record(
+            session,
+            BaseErrataRecord(**{**errata_create_payload, "id": record_id}),
+        )
+
+    def render(record):
+        # snapshots have to be sent to worker processes
+        pickle.dumps(record)
+        return {"id": record.id, "distr": record.platform.distr_version}
+
+    def pool(max_workers, mp_context):
+        return concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+
+    monkeypatch.setattr(errata_crud, "errata_record_to_oval_fragment", render)
+    monkeypatch.setattr(
+        errata_crud.concurrent.futures, "ProcessPoolExecutor", pool
+    )
+    record_ids = (
+        (
+            await session.execute(
+                select(models.ErrataRecord.id)
+                .where(models.ErrataRecord.platform_id == base_platform.id)
+                .order_by(models.ErrataRecord.id)
+            )
+        )
+        .scalars()
+        .all()
+    )
+
+    rendered = await errata_crud.regenerate_oval_fragments(
+        session, [base_platform.name], workers=2, chunk_size=1
+    )
+    assert rendered == len(record_ids)
+    fragments = (
+        (
+            await session.execute(
+                select(models.ErrataOvalFragment)
+                .where(
+                    models.ErrataOvalFragment.errata_record_id.in_(record_ids)
+                )
+                .order_by(models.ErrataOvalFragment.errata_record_id)
+            )
+        )
+        .scalars()
+        .all()
+    )
+    assert [fragment.fragment for fragment in fragments] == [
+        {"id": record_id, "distr": base_platform.distr_version}
+        for record_id in record_ids
+    ]
+
+
+@pytest.mark.anyio
+async def test_load_platform_packages_single_query(monkeypatch):
+    repo_ids = [uuid.uuid4() for _ in range(3)]
+    platform = models.Platform(
+        arch_list=["x86_64", "i686"],
+        repos=[
+            models.Repository(
+                production=True,
+                pulp_href=f"/pulp/api/v3/repositories/rpm/rpm/{repo_id}/",
+            )
+            for repo_id in repo_ids
+        ],
+    )
+    noarch_pkg = RpmPackage(
+        content_ptr_id=uuid.uuid4(),
+        name="chan",
+        version="0.0.4",
+        release="3.el8",
+        arch="noarch",
+    )
+    x86_64_pkg = RpmPackage(
+        content_ptr_id=uuid.uuid4(),
+        name="chan",
+        version="0.0.4",
+        release="3.el8.alma.1",
+        arch="x86_64",
+    )
+    queries = []
+
+    async def get_packages(repo_ids, **kwargs):
+        queries.append(repo_ids)
+        return [
+            (x86_64_pkg, repo_ids[2]),
+            (noarch_pkg, repo_ids[1]),
+            (noarch_pkg, repo_ids[0]),
+        ]
+
+    monkeypatch.setattr(
+        errata_crud,
+        "get_rpm_packages_by_repositories",
+        get_packages,
+    )
+    search_params = errata_crud.prepare_search_params(
+        models.ErrataRecord(packages=[])
+    )
+    cache = await errata_crud.load_platform_packages(platform, search_params)
+    assert queries == [repo_ids]
+    assert cache == {
+        "chan-0.0.4-3.el8": {
+            "x86_64": [noarch_pkg, x86_64_pkg],
+            "i686": [noarch_pkg],
+        },
+    }
+
+    cache = await errata_crud.load_platform_packages(
+        platform,
+        search_params,
+        for_release=True,
+    )
+    assert cache[noarch_pkg.pulp_href] == [
+        repo.pulp_href for repo in platform.repos[:2]
+    ]
+    assert cache[x86_64_pkg.pulp_href] == [platform.repos[2].pulp_href]
+
+
+@pytest.mark.anyio
+async def test_get_matching_albs_packages_by_nevra(
+    session: AsyncSession,
+    regular_build: models.Build,
+    start_build,
+    monkeypatch,
+):
+    task_id = (
+        await session.execute(
+            select(models.BuildTask.id).where(
+                models.BuildTask.build_id == regular_build.id
+            )
+        )
+    ).scalar()
+    pulp_pkgs = {}
+    artifacts = []
+    for name, release, arch in (
+        ("usbguard", "8.el8_7.2", "x86_64"),
+        ("usbguard", "8.el8_7.2", "aarch64"),
+        ("usbguard-selinux", "8.el8_7.2", "noarch"),
+        ("usbguard", "9.el8", "x86_64"),
+    ):
+        pulp_pkg = RpmPackage(
+            content_ptr_id=uuid.uuid4(),
+            name=name,
+            epoch="0",
+            version="1.0.0",
+            release=release,
+            arch=arch,
+            rpm_sourcerpm="usbguard-1.0.0-8.el8_7.2.src.rpm",
+        )
+        pulp_pkgs[pulp_pkg.pulp_href] = pulp_pkg
+        artifact = models.BuildTaskArtifact(
+            build_task_id=task_id,
+            name=f"{name}-1.0.0-{release}.{arch}.rpm",
+            type="rpm",
+            href=pulp_pkg.pulp_href,
+        )
+        artifact.set_nevra()
+        artifacts.append(artifact)
+    session.add_all(artifacts)
+    await session.commit()
+
+    async def get_packages_by_ids(pulp_pkg_ids, pkg_fields):
+        return {
+            href: pkg
+            for href, pkg in pulp_pkgs.items()
+            if pkg.content_ptr_id in pulp_pkg_ids
+        }
+
+    monkeypatch.setattr(
+        errata_crud,
+        "get_rpm_packages_by_ids",
+        get_packages_by_ids,
+    )
+    errata_packages = [
+        models.ErrataPackage(
+            name=name,
+            version="1.0.0",
+            release="8.el8_7.2",
+            epoch=0,
+            arch="x86_64",
+        )
+        for name in ("usbguard", "usbguard-selinux", "usbguard-tools")
+    ]
+    mappings = await errata_crud.get_matching_albs_packages(
+        session,
+        errata_packages,
+        {},
+        None,
+    )
+    assert sorted(
+        (mapping.name, mapping.release, mapping.arch) for mapping in mappings
+    ) == [
+        ("usbguard", "8.el8_7.2", "x86_64"),
+        ("usbguard-selinux", "8.el8_7.2", "noarch"),
+    ]
+    assert [len(pkg.albs_packages) for pkg in errata_packages] == [1, 1, 0]
+    assert errata_packages[0].source_srpm is not None
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "errata_create_payload",
+    [{"id": "ALSA-2022:0124"}],
+    indirect=True,
+)
+async def test_prepare_updateinfo_mapping(
+    session: AsyncSession,
+    regular_build: models.Build,
+    start_build,
+    create_errata,
+    monkeypatch,
+):
+    task_id = (
+        await session.execute(
+            select(models.BuildTask.id).where(
+                models.BuildTask.build_id == regular_build.id
+            )
+        )
+    ).scalar()
+    errata_package = (
+        await session.execute(
+            select(models.ErrataPackage).where(
+                models.ErrataPackage.errata_record_id == "ALSA-2022:0124",
+                models.ErrataPackage.name == "usbguard",
+            )
+        )
+    ).scalar()
+    pulp_pkgs = {}
+    mappings = []
+    for arch in ("x86_64", "i686"):
+        pulp_pkg = RpmPackage(
+            content_ptr_id=uuid.uuid4(),
+            name="usbguard",
+            epoch="0",
+            version="1.0.0",
+            release="8.el8_7.2",
+            arch=arch,
+            location_href=f"usbguard-1.0.0-8.el8_7.2.{arch}.rpm",
+            rpm_sourcerpm="usbguard-1.0.0-8.el8_7.2.src.rpm",
+        )
+        pulp_pkgs[pulp_pkg.pulp_href] = pulp_pkg
+        artifact = models.BuildTaskArtifact(
+            build_task_id=task_id,
+            name=pulp_pkg.location_href,
+            type="rpm",
+            href=pulp_pkg.pulp_href,
+        )
+        mappings.append(
+            models.ErrataToALBSPackage(
+                errata_package_id=errata_package.id,
+                build_artifact=artifact,
+                status=ErrataPackageStatus.approved,
+                name="usbguard",
+                version="1.0.0",
+                release="8.el8_7.2",
+                epoch=0,
+                arch=arch,
+            )
+        )
+    session.add_all(mappings)
+    await session.commit()
+    queried_ids = []
+
+    async def get_packages_by_ids(pulp_pkg_ids, pkg_fields):
+        queried_ids.append(sorted(pulp_pkg_ids))
+        return pulp_pkgs
+
+    monkeypatch.setattr(
+        errata_crud,
+        "get_rpm_packages_by_ids",
+        get_packages_by_ids,
+    )
+    monkeypatch.setattr(RpmPackage, "sha256", "checksum")
+    updateinfo_mapping = await errata_crud.prepare_updateinfo_mapping(
+        session,
+        package_hrefs=list(pulp_pkgs) * 2,
+        blacklist_updateinfo=[],
+    )
+    # package metadata of all packages is fetched at once
+    assert queried_ids == [
+        sorted(pkg.content_ptr_id for pkg in pulp_pkgs.values())
+    ]
+    assert list(updateinfo_mapping) == [errata_package.errata_record_id]
+    assert sorted(
+        (db_pkg.href, pulp_pkg["arch"], errata_pkg.id)
+        for db_pkg, pulp_pkg, errata_pkg in updateinfo_mapping[
+            errata_package.errata_record_id
+        ]
+    ) == sorted(
+        (mapping.build_artifact.href, mapping.arch, mapping.id)
+        for mapping in mappings
+    )
+
+    updateinfo_mapping = await errata_crud.prepare_updateinfo_mapping(
+        session,
+        package_hrefs=list(pulp_pkgs),
+        blacklist_updateinfo=[errata_package.errata_record_id],
+    )
+    assert not updateinfo_mapping
+
+
+@pytest.mark.anyio
+async def test_bulk_errata_records_release_groups_pulp_writes(
+    session: AsyncSession,
+    base_platform: models.Platform,
+    errata_create_payload,
+    monkeypatch,
+):
+    records_ids = ["ALSA-2022:0125", "ALSA-2022:0126"]
+    for record_id in records_ids:
+        await errata_crud.create_errata_record(
+            session,
+            BaseErrataRecord(**{**errata_create_payload, "id": record_id}),
+        )
+    records_repos = {
+        records_ids[0]: ["repo-1", "repo-2"],
+        records_ids[1]: ["repo-2", "repo-3"],
+    }
+
+    async def prepare(record_id, pulp):
+        if record_id not in records_repos:
+            raise ValueError("missing packages")
+        return {
+            "record_id": record_id,
+            "error": None,
+            "repos": {
+                repo_href: {
+                    "updateinfo": [],
+                    "pulp_record": {"id": record_id},
+                }
+                for repo_href in records_repos[record_id]
+            },
+            "albs_package_ids": set(),
+            "release_log": f"{record_id} is released",
+        }
+
+    added_records = {}
+    publications = []
+
+    async def add_errata_records(self, records, repo_href):
+        if repo_href == "repo-3":
+            raise ValueError("Pulp is down")
+        added_records[repo_href] = sorted(record["id"] for record in records)
+
+    async def create_rpm_publication(self, repo_href):
+        publications.append(repo_href)
+
+    monkeypatch.setattr(errata_crud, "prepare_errata_record_release", prepare)
+    monkeypatch.setattr(
+        errata_crud.PulpClient,
+        "add_errata_records",
+        add_errata_records,
+    )
+    monkeypatch.setattr(
+        errata_crud.PulpClient,
+        "create_rpm_publication",
+        create_rpm_publication,
+    )
+    await errata_crud.bulk_errata_records_release(
+        [*records_ids, "ALSA-2022:0127"]
+    )
+
+    assert added_records == {
+        "repo-1": [records_ids[0]],
+        "repo-2": records_ids,
+    }
+    assert sorted(publications) == ["repo-1", "repo-2"]
+    session.expire_all()
+    db_records = {
+        record.id: record
+        for record in (
+            await session.execute(
+                select(models.ErrataRecord).where(
+                    models.ErrataRecord.id.in_(records_ids)
+                )
+            )
+        ).scalars()
+    }
+    released, failed = (db_records[record_id] for record_id in records_ids)
+    assert released.release_status == ErrataReleaseStatus.RELEASED
+    assert released.last_release_log == f"{records_ids[0]} is released"
+    assert failed.release_status == ErrataReleaseStatus.FAILED
+    assert "Pulp is down" in failed.last_release_log
+
+
+@pytest.mark.anyio
+async def test_list_errata_records_search_and_keyset(
+    session: AsyncSession,
+    base_platform: models.Platform,
+    errata_create_payload,
+    monkeypatch,
+):
+    records_ids = ["ALSA-2023:0201", "ALSA-2023:0202", "ALSA-2023:0203"]
+    for day, record_id in enumerate(records_ids, start=1):
+        await errata_crud.create_errata_record(
+            session,
+            BaseErrataRecord(**{
+                **errata_create_payload,
+                "id": record_id,
+                "title": f"zorblax update {day}",
+                "updated_date": str(datetime.date(2023, 1, day)),
+            }),
+        )
+
+    result = await errata_crud.list_errata_records(
+        session, search="ALSA-2023:020", compact=True
+    )
+    assert sorted(record.id for record in result["records"]) == records_ids
+    assert result["total_records"] == 3
+    result = await errata_crud.list_errata_records(
+        session, search="zorbl", compact=True
+    )
+    assert sorted(record.id for record in result["records"]) == records_ids
+    result = await errata_crud.list_errata_records(
+        session, search="update zorblax", compact=True
+    )
+    assert result["records"] == []
+    result = await errata_crud.list_errata_records(
+        session, search="cve-2022-2161", compact=True
+    )
+    assert set(records_ids) <= {record.id for record in result["records"]}
+
+    monkeypatch.setattr(errata_crud, "ERRATA_PAGE_SIZE", 2)
+    first_page = await errata_crud.list_errata_records(
+        session, search="zorblax", keyset=True, estimate_total=True
+    )
+    second_page = await errata_crud.list_errata_records(
+        session,
+        search="zorblax",
+        keyset=True,
+        after_updated_date=first_page["next_updated_date"],
+        after_id=first_page["next_id"],
+    )
+    assert [record.id for record in first_page["records"]] == [
+        "ALSA-2023:0203",
+        "ALSA-2023:0202",
+    ]
+    assert first_page["total_records_estimated"]
+    assert isinstance(first_page["total_records"], int)
+    assert [record.id for record in second_page["records"]] == [
+        "ALSA-2023:0201"
+    ]
+    assert "next_id" not in second_page
+
+
+@pytest.mark.anyio
+async def test_updateinfo_xml_is_rendered_once_per_advisory_update(
+    monkeypatch,
+):
+    last_updated = {
+        "ALSA-2023:0301": datetime.datetime(2023, 1, 1),
+        "ALSA-2023:0302": datetime.datetime(2023, 1, 1),
+    }
+    updated_dates = dict(last_updated)
+    requested_ids = []
+
+    def advisory(record_id):
+        return {
+            "pulp_href": f"/pulp/api/v3/content/rpm/advisories/{record_id}/",
+            "pulp_last_updated": str(last_updated[record_id]),
+            "id": record_id,
+            "title": record_id,
+            "updated_date": str(updated_dates[record_id]),
+            "references": [
+                {
+                    "href": f"https://errata.almalinux.org/{record_id}",
+                    "type": "self",
+                    "id": record_id,
+                    "title": record_id,
+                },
+                {
+                    "href": "https://www.cve.org/CVERecord?id=CVE-2022-1",
+                    "type": "cve",
+                    "id": "CVE-2022-1",
+                    "title": "CVE-2022-1",
+                },
+            ],
+            "pkglist": [{
+                "name": "almalinux-8-for-x86_64-appstream-rpms",
+                "shortname": "almalinux-8",
+                "module": None,
+                "packages": [],
+            }],
+        }
+
+    async def list_updateinfo_records(self, id__in, include_fields=None):
+        advisories = [
+            advisory(record_id)
+            for record_id in id__in
+            if record_id in last_updated
+        ]
+        if include_fields:
+            return [
+                {field: record[field] for field in include_fields}
+                for record in advisories
+            ]
+        requested_ids.append(sorted(id__in))
+        return advisories
+
+    monkeypatch.setattr(
+        errata_crud.PulpClient,
+        "list_updateinfo_records",
+        list_updateinfo_records,
+    )
+
+    updateinfo_xml = await errata_crud.get_bulk_updateinfo_xml_from_pulp(
+        ["ALSA-2023:0301", "ALSA-2023:0302", "ALSA-2023:0399"]
+    )
+    assert updateinfo_xml.count("<update>") == 2
+    # every reference is rendered, not only the last one
+    assert updateinfo_xml.count("<reference ") == 4
+    updateinfo_xml = await errata_crud.get_updateinfo_xml_from_pulp(
+        "ALSA-2023:0301"
+    )
+    assert updateinfo_xml.startswith(errata_crud.UPDATEINFO_XML_HEADER)
+    assert updateinfo_xml.count("<update>") == 1
+    assert requested_ids == [["ALSA-2023:0301", "ALSA-2023:0302"]]
+
+    last_updated["ALSA-2023:0302"] = datetime.datetime(2023, 2, 1)
+    updated_dates["ALSA-2023:0302"] = datetime.datetime(2023, 2, 1)
+    updateinfo_xml = await errata_crud.get_bulk_updateinfo_xml_from_pulp(
+        ["ALSA-2023:0301", "ALSA-2023:0302"]
+    )
+    assert requested_ids[-1] == ["ALSA-2023:0302"]
+    assert "2023-02-01" in updateinfo_xml
+
+    # packages appended on release bump only updated_date of advisory
+    updated_dates["ALSA-2023:0301"] = datetime.datetime(2023, 3, 1)
+    updateinfo_xml = await errata_crud.get_bulk_updateinfo_xml_from_pulp(
+        ["ALSA-2023:0301", "ALSA-2023:0302"]
+    )
+    assert requested_ids[-1] == ["ALSA-2023:0301"]
+    assert "2023-03-01" in updateinfo_xml
+    assert (
+        await errata_crud.get_updateinfo_xml_from_pulp("ALSA-2023:0399")
+        is None
+    )
+
+
+@pytest.mark.anyio
+async def test_updateinfo_xml_requests_and_cache_are_bounded(monkeypatch):
+    record_ids = [f"ALSA-2023:{idx:04d}" for idx in range(310, 315)]
+    requested_ids = []
+
+    async def list_updateinfo_records(self, id__in, include_fields=None):
+        requested_ids.append(list(id__in))
+        return [
+            {
+                "pulp_href": f"/pulp/api/v3/content/rpm/advisories/{idx}/",
+                "pulp_last_updated": "2023-01-01 00:00:00",
+                "id": record_id,
+                "title": record_id,
+                "updated_date": "2023-01-01 00:00:00",
+                "references": [],
+                "pkglist": [{
+                    "name": "almalinux-8-for-x86_64-appstream-rpms",
+                    "shortname": "almalinux-8",
+                    "module": None,
+                    "packages": [],
+                }],
+            }
+            for idx, record_id in enumerate(id__in)
+        ]
+
+    monkeypatch.setattr(
+        errata_crud.PulpClient,
+        "list_updateinfo_records",
+        list_updateinfo_records,
+    )
+    monkeypatch.setattr(errata_crud, "UPDATEINFO_PULP_IDS_CHUNK_SIZE", 2)
+    monkeypatch.setattr(errata_crud, "UPDATEINFO_XML_CACHE_SIZE", 3)
+    monkeypatch.setattr(
+        errata_crud, "_updateinfo_xml_cache", collections.OrderedDict()
+    )
+
+    updateinfo_xml = await errata_crud.get_bulk_updateinfo_xml_from_pulp(
+        record_ids
+    )
+    assert updateinfo_xml.count("<update>") == len(record_ids)
+    # states and advisories are both requested in chunks
+    assert [len(ids) for ids in requested_ids] == [2, 2, 1] * 2
+    # the least recently used records are evicted
+    assert list(errata_crud._updateinfo_xml_cache) == record_ids[2:]
+
+    requested_ids.clear()
+    await errata_crud.get_updateinfo_xml_from_pulp(record_ids[2])
+    await errata_crud.get_updateinfo_xml_from_pulp(record_ids[0])
+    assert requested_ids == [[record_ids[2]], [record_ids[0]], [record_ids[0]]]
+    assert list(errata_crud._updateinfo_xml_cache) == [
+        record_ids[4],
+        record_ids[2],
+        record_ids[0],
+    ]
+
+
+@pytest.mark.anyio
+async def test_bulk_create_errata_records(
+    session: AsyncSession,
+    base_platform: models.Platform,
+    errata_create_payload,
+):
+    await errata_crud.create_errata_record(
+        session,
+        BaseErrataRecord(**{**errata_create_payload, "id": "ALSA-2023:0400"}),
+    )
+    payloads = [
+        {
+            **errata_create_payload,
+            "id": "ALSA-2023:0400",
+            "updated_date": str(datetime.date(2023, 3, 1)),
+        },
+        {**errata_create_payload, "id": "ALSA-2023:0401"},
+        {**errata_create_payload, "id": "ALSA-2023:0401"},
+        {**errata_create_payload, "id": "ALSA-2023:0402", "platform_id": 999},
+    ]
+    results = await errata_crud.bulk_create_errata_records(
+        session,
+        [BaseErrataRecord(**payload) for payload in payloads],
+        upsert=True,
+    )
+
+    assert [(result["id"], result["action"]) for result in results] == [
+        ("ALSA-2023:0400", "updated"),
+        ("ALSA-2023:0401", "created"),
+        ("ALSA-2023:0401", "skipped"),
+        ("ALSA-2023:0402", "skipped"),
+    ]
+    assert [bool(result["error"]) for result in results] == [
+        False,
+        False,
+        True,
+        True,
+    ]
+    session.expire_all()
+    records = {
+        record.id: record
+        for record in (
+            await session.execute(
+                select(models.ErrataRecord)
+                .where(
+                    models.ErrataRecord.id.in_(
+                        ["ALSA-2023:0400", "ALSA-2023:0401"]
+                    )
+                )
+                .options(
+                    selectinload(models.ErrataRecord.references),
+                    selectinload(models.ErrataRecord.packages).selectinload(
+                        models.ErrataPackage.albs_packages
+                    ),
+                )
+            )
+        ).scalars()
+    }
+    updated, created = records["ALSA-2023:0400"], records["ALSA-2023:0401"]
+    assert updated.updated_date == datetime.datetime(2023, 3, 1)
+    # bulk import gives the same rows as the single record creation
+    for attr in ("original_title", "module", "rights", "contact_mail"):
+        assert getattr(created, attr) == getattr(updated, attr)
+    assert created.oval_title == updated.oval_title.replace("0400", "0401")
+    assert sorted(
+        (ref.ref_type.value, ref.ref_id, ref.cve_id)
+        for ref in created.references
+    ) == sorted(
+        (ref.ref_type.value, ref.ref_id.replace("0400", "0401"), ref.cve_id)
+        for ref in updated.references
+    )
+
+    def packages_summary(record):
+        return sorted(
+            (
+                pkg.name,
+                pkg.arch,
+                pkg.source_srpm,
+                sorted(
+                    (albs_pkg.status.value, albs_pkg.pulp_href, albs_pkg.arch)
+                    for albs_pkg in pkg.albs_packages
+                ),
+            )
+            for pkg in record.packages
+        )
+
+    assert packages_summary(created) == packages_summary(updated)
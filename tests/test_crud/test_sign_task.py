@@ -0,0 +1,115 @@
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from alws import models
+from alws.crud.sign_task import verify_signed_builds
+
+
+@pytest.mark.anyio
+async def test_verify_signed_builds(
+    session: AsyncSession,
+    base_platform: models.Platform,
+    sign_key: models.SignKey,
+    regular_build: models.Build,
+    start_build,
+):
+    missing_build_id = regular_build.id + 1000
+
+    async def get_verdicts():
+        verdicts = await verify_signed_builds(
+            session,
+            [regular_build.id, missing_build_id],
+            base_platform.id,
+        )
+        assert not verdicts[missing_build_id]["verified"]
+        assert (
+            verdicts[missing_build_id]["reason"]
+            == f"Build with ID {missing_build_id} does not exist"
+        )
+        return verdicts[regular_build.id]
+
+    verdict = await verify_signed_builds(
+        session, [regular_build.id], base_platform.id
+    )
+    assert (
+        verdict[regular_build.id]["reason"]
+        == f"platform with ID {base_platform.id} connects with no keys"
+    )
+    sign_key.platform_id = base_platform.id
+    await session.commit()
+
+    await session.execute(
+        update(models.Build)
+        .where(models.Build.id == regular_build.id)
+        .values(signed=False)
+    )
+    await session.commit()
+    verdict = await get_verdicts()
+    assert verdict == {
+        "verified": False,
+        "reason": f"Build with ID {regular_build.id} has not already signed",
+    }
+
+    await session.execute(
+        update(models.Build)
+        .where(models.Build.id == regular_build.id)
+        .values(signed=True)
+    )
+    await session.commit()
+    verdict = await get_verdicts()
+    assert (
+        verdict["reason"]
+        == f"No built packages in build with ID {regular_build.id}"
+    )
+
+    task_id = (
+        await session.execute(
+            select(models.BuildTask.id)
+            .where(models.BuildTask.build_id == regular_build.id)
+            .limit(1)
+        )
+    ).scalar()
+    artifacts = [
+        models.BuildTaskArtifact(
+            build_task_id=task_id,
+            name=name,
+            type="rpm",
+            href=f"/pulp/api/v3/content/rpm/packages/{name}/",
+            sign_key_id=sign_key_id,
+        )
+        for name, sign_key_id in (
+            ("chan-0.0.4-3.el8.src.rpm", sign_key.id),
+            ("chan-0.0.4-3.el8.x86_64.rpm", None),
+        )
+    ]
+    session.add_all(artifacts)
+    await session.flush()
+    src_rpm = models.SourceRpm(
+        build_id=regular_build.id,
+        artifact_id=artifacts[0].id,
+    )
+    session.add(src_rpm)
+    await session.flush()
+    binary_rpm = models.BinaryRpm(
+        build_id=regular_build.id,
+        artifact_id=artifacts[1].id,
+        source_rpm_id=src_rpm.id,
+    )
+    session.add(binary_rpm)
+    await session.commit()
+    verdict = await get_verdicts()
+    assert (
+        verdict["reason"]
+        == f"Sign key with for pkg ID {binary_rpm.id} is not matched "
+        f"by sign key for platform ID {base_platform.id}"
+    )
+
+    artifacts[1].sign_key_id = sign_key.id
+    await session.commit()
+    assert await get_verdicts() == {"verified": True, "reason": None}
+
+    # the sign key is deleted by the fixture
+    for artifact in artifacts:
+        artifact.sign_key_id = None
+    await session.commit()
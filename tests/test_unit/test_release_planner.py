@@ -0,0 +1,176 @@
+import asyncio
+from unittest.mock import Mock
+
+import pytest
+
+from alws.release_planner import AlmaLinuxReleasePlanner
+from alws.utils.pulp_client import PulpClient
+
+
+def _create_build_mock(build_id: int, module_version: int):
+    tasks = [
+        Mock(
+            id=build_id * 10 + idx,
+            arch=arch,
+            rpm_module=Mock(
+                stream="1.0",
+                version=module_version,
+                arch=arch,
+            ),
+        )
+        for idx, arch in enumerate(("x86_64", "i686"))
+    ]
+    for task in tasks:
+        task.rpm_module.name = "module"
+    repos = [
+        Mock(
+            arch=arch,
+            debug=debug,
+            type="rpm",
+            url=f"http://pulp/{build_id}-{arch}{'-debug' if debug else ''}/",
+        )
+        for debug in (True, False)
+        for arch in ("x86_64", "i686")
+    ]
+    rpms = []
+    for task in tasks:
+        for name in (f"pkg-1.0-1.{task.arch}.rpm", "pkg-1.0-1.src.rpm"):
+            artifact = Mock(
+                build_task_id=task.id,
+                href=f"/pulp/api/v3/content/rpm/packages/{task.id}-{name}/",
+                cas_hash=None,
+            )
+            artifact.name = name
+            rpms.append(Mock(artifact=artifact, source_rpm=None))
+    return Mock(
+        id=build_id,
+        tasks=tasks,
+        repos=repos,
+        source_rpms=[],
+        binary_rpms=rpms,
+        platform_flavors=[],
+    )
+
+
+@pytest.mark.anyio
+async def test_get_pulp_packages(monkeypatch):
+    # both builds contain the same module, its template is fetched once
+    builds = [_create_build_mock(1, 1), _create_build_mock(2, 1)]
+    fetched = []
+    running = 0
+    max_running = 0
+
+    async def get_builds_for_release(self, build_ids):
+        return builds
+
+    async def get_pulp_packages_info(self, build_rpms, build_tasks):
+        return [
+            {"name": "pkg", "arch": "x86_64", "pulp_href": rpm.artifact.href}
+            for rpm in build_rpms
+            if rpm.artifact.build_task_id in build_tasks
+        ]
+
+    async def get_repo_modules_yaml(self, url):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(running, max_running)
+        await asyncio.sleep(0)
+        fetched.append(url)
+        running -= 1
+
+    monkeypatch.setattr(
+        AlmaLinuxReleasePlanner,
+        "get_builds_for_release",
+        get_builds_for_release,
+    )
+    monkeypatch.setattr(
+        AlmaLinuxReleasePlanner,
+        "get_pulp_packages_info",
+        get_pulp_packages_info,
+    )
+    monkeypatch.setattr(
+        PulpClient,
+        "get_repo_modules_yaml",
+        get_repo_modules_yaml,
+    )
+    planner = AlmaLinuxReleasePlanner(None)
+    build_tasks = [task.id for build in builds for task in build.tasks]
+    packages, src_rpm_names, modules = await planner.get_pulp_packages(
+        [build.id for build in builds],
+        build_tasks=build_tasks,
+    )
+
+    assert sorted(fetched) == ["http://pulp/1-i686/", "http://pulp/1-x86_64/"]
+    assert max_running == 2
+    assert modules == []
+    assert len(packages) == 8
+    assert len(src_rpm_names) == 4
+    assert [pkg["task_arch"] for pkg in packages[:4]] == [
+        "x86_64",
+        "x86_64",
+        "i686",
+        "i686",
+    ]
+    assert [pkg["source"] for pkg in packages[:2]] == [
+        None,
+        "pkg-1.0-1.src.rpm",
+    ]
+    packages[0]["force"] = True
+    assert not any(pkg["force"] for pkg in packages[1:])
+    assert {
+        "get_packages_info_modules_templates",
+        "get_packages_info_pulp_and_db",
+    } <= set(planner.stats)
+
+    # without build tasks whole builds are released, modules included
+    fetched.clear()
+    packages, _, _ = await planner.get_pulp_packages(
+        [build.id for build in builds],
+    )
+    assert len(packages) == 8
+    assert sorted(fetched) == ["http://pulp/1-i686/", "http://pulp/1-x86_64/"]
+
+    # only packages and modules of the given tasks are released
+    fetched.clear()
+    packages, _, _ = await planner.get_pulp_packages(
+        [build.id for build in builds],
+        build_tasks=[builds[1].tasks[1].id],
+    )
+    assert {pkg["task_arch"] for pkg in packages} == {"i686"}
+    assert len(packages) == 2
+    assert fetched == ["http://pulp/2-i686/"]
+
+
+@pytest.mark.anyio
+async def test_get_beholder_responses():
+    requests = []
+
+    async def retrieve_responses(platforms, **kwargs):
+        requests.append(kwargs)
+        if "data" in kwargs:
+            return [{"packages": kwargs["data"]["source_rpms"]}]
+        return [{"name": kwargs["module_name"]}]
+
+    planner = AlmaLinuxReleasePlanner(None)
+    planner._beholder_client = Mock(retrieve_responses=retrieve_responses)
+    lookups = [
+        ("ruby", "3.1", ("x86_64",)),
+        ("ruby-devel", "3.1", ("x86_64",)),
+        ("ruby", "3.1", ("x86_64",)),
+    ]
+    modules_responses, src_responses = await planner.get_beholder_responses(
+        [],
+        lookups,
+        ["ruby-3.1.2-1.src.rpm", "ruby-3.1.2-1.src.rpm", "pg-1.3-1.src.rpm"],
+    )
+
+    assert modules_responses == [
+        [{"name": "ruby"}],
+        [{"name": "ruby-devel"}],
+        [{"name": "ruby"}],
+    ]
+    assert src_responses == [
+        {"packages": ["ruby-3.1.2-1.src.rpm", "pg-1.3-1.src.rpm"]},
+    ]
+    # identical lookups and source RPMs are requested once
+    assert len(requests) == 3
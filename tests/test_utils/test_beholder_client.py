@@ -0,0 +1,136 @@
+import asyncio
+import collections
+import time
+from unittest.mock import Mock
+
+import pytest
+from aiohttp import web
+
+from alws.config import settings
+from alws.utils.beholder_client import BeholderClient
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+
+@pytest.mark.anyio
+async def test_beholder_responses_are_shared(monkeypatch):
+    calls = []
+
+    async def project(request):
+        calls.append(request.path_qs)
+        # let identical requests meet while this one is in flight
+        await asyncio.sleep(0.05)
+        return web.json_response({'packages': [request.match_info['name']]})
+
+    app = web.Application()
+    app.router.add_get('/api/v1/projects/{name}/', project)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 0).start()
+    host = f'http://127.0.0.1:{runner.addresses[0][1]}'
+    redis = FakeRedis()
+    monkeypatch.setattr(
+        BeholderClient, 'get_redis', classmethod(lambda cls: redis)
+    )
+    monkeypatch.setattr(BeholderClient, '_in_flight', {})
+    monkeypatch.setattr(BeholderClient, 'cache_stats', collections.Counter())
+    params = {'match': 'closest'}
+    try:
+        responses = await asyncio.gather(*(
+            BeholderClient(host, cache_ttl=60).get(
+                '/api/v1/projects/bash/', params=params
+            )
+            for _ in range(3)
+        ))
+        # callers get their own copies of the response
+        responses[0]['packages'].append('zsh')
+        assert responses[1] == {'packages': ['bash']}
+        assert calls == ['/api/v1/projects/bash/?match=closest']
+
+        client = BeholderClient(host, cache_ttl=60)
+        assert await client.get('/api/v1/projects/bash/', params=params) == {
+            'packages': ['bash']
+        }
+        assert await client.get('/api/v1/projects/bash/') == {
+            'packages': ['bash']
+        }
+        assert len(calls) == 2
+        assert BeholderClient.cache_stats == {
+            'misses': 2,
+            'hits': 1,
+            'coalesced': 2,
+        }
+
+        # cache is disabled with zero TTL
+        await BeholderClient(host, cache_ttl=0).get('/api/v1/projects/bash/')
+        assert len(calls) == 3
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.anyio
+async def test_retrieve_responses_concurrently(monkeypatch):
+    running = 0
+    max_running = 0
+    delays = {'slow': 3, 'broken': None, 'one': 0.02, 'two': 0.01}
+
+    async def projects(request):
+        nonlocal running, max_running
+        name = request.match_info['name']
+        running += 1
+        max_running = max(running, max_running)
+        try:
+            if delays[name] is None:
+                raise web.HTTPInternalServerError()
+            await asyncio.sleep(delays[name])
+        finally:
+            running -= 1
+        return web.json_response({
+            'distribution': {'name': name, 'version': '8'},
+        })
+
+    app = web.Application()
+    app.router.add_post('/api/v1/distros/{name}/8/projects/', projects)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 0).start()
+    host = f'http://127.0.0.1:{runner.addresses[0][1]}'
+    platforms = [
+        Mock(distr_version='8', priority=priority) for priority in (1, 2, 3, 4)
+    ]
+    for platform, name in zip(platforms, ('slow', 'broken', 'two', 'one')):
+        platform.name = name
+    client = BeholderClient(host, cache_ttl=0)
+    try:
+        started = time.monotonic()
+        responses = [
+            response
+            async for _, response in client.iter_responses(
+                platforms,
+                data={'source_rpms': []},
+                concurrency=2,
+                timeout=0.5,
+            )
+        ]
+        # the slow platform doesn't hold back the others
+        assert [
+            response['distribution']['name'] for response in responses
+        ] == ['two', 'one']
+        assert time.monotonic() - started < 2
+        assert max_running == 2
+        monkeypatch.setattr(settings, 'beholder_endpoint_timeout', 0.5)
+        responses = await client.retrieve_responses(
+            platforms, data={'source_rpms': []}
+        )
+        assert [response['priority'] for response in responses] == [4, 3]
+    finally:
+        await runner.cleanup()
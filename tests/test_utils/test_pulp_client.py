@@ -0,0 +1,277 @@
+import asyncio
+import collections
+import json
+from unittest.mock import Mock
+
+import pytest
+from aiohttp import web
+from aiohttp.client_exceptions import ClientResponseError
+
+from alws.utils import pulp_client as pulp_client_module
+from alws.utils.pulp_client import PulpClient
+
+# requests to Pulp are disabled by an autouse fixture,
+# the stand-in below needs the real implementation
+PULP_REQUEST = PulpClient.request
+
+
+@pytest.mark.anyio
+async def test_wait_for_tasks_batched(monkeypatch):
+    polls = []
+    # task href -> number of polls before the task is finished
+    durations = {
+        '/pulp/api/v3/tasks/1/': 1,
+        '/pulp/api/v3/tasks/2/': 3,
+        '/pulp/api/v3/tasks/3/': 2,
+    }
+
+    async def request(self, method, endpoint, params=None, **kwargs):
+        hrefs = params['pulp_href__in'].split(',')
+        polls.append(hrefs)
+        results = []
+        for href in hrefs:
+            durations[href] -= 1
+            state = 'completed' if durations[href] <= 0 else 'running'
+            if href.endswith('/3/') and state == 'completed':
+                state = 'failed'
+            results.append({'pulp_href': href, 'state': state})
+        return {'count': len(results), 'results': results}
+
+    monkeypatch.setattr(PulpClient, 'request', request)
+    pulp_client = PulpClient('http://pulp', 'admin', 'admin')
+    results = await asyncio.wait_for(
+        asyncio.gather(
+            pulp_client.wait_for_task('/pulp/api/v3/tasks/1/'),
+            pulp_client.wait_for_task('/pulp/api/v3/tasks/2/'),
+            pulp_client.wait_for_task('/pulp/api/v3/tasks/3/'),
+            return_exceptions=True,
+        ),
+        timeout=5,
+    )
+    await PulpClient.close_session()
+
+    assert results[0]['state'] == 'completed'
+    assert results[1]['state'] == 'completed'
+    assert isinstance(results[2], Exception)
+    # all pending tasks are checked with a single request
+    assert sorted(polls[0]) == sorted(durations)
+    assert len(polls) == 3
+
+
+@pytest.mark.anyio
+async def test_wait_for_tasks_survives_poll_errors(monkeypatch):
+    polls = []
+    broken_polls = 1
+
+    async def request(self, method, endpoint, params=None, **kwargs):
+        hrefs = params['pulp_href__in'].split(',')
+        polls.append(hrefs)
+        if len(polls) <= broken_polls:
+            raise ClientResponseError(
+                Mock(real_url=f'http://pulp/{endpoint}'), (), status=500
+            )
+        return {
+            'count': len(hrefs),
+            'results': [
+                {'pulp_href': href, 'state': 'completed'} for href in hrefs
+            ],
+        }
+
+    monkeypatch.setattr(PulpClient, 'request', request)
+    pulp_client = PulpClient('http://pulp', 'admin', 'admin')
+    try:
+        # one failed poll doesn't fail the whole batch
+        results = await asyncio.wait_for(
+            asyncio.gather(
+                pulp_client.wait_for_task('/pulp/api/v3/tasks/1/'),
+                pulp_client.wait_for_task('/pulp/api/v3/tasks/2/'),
+            ),
+            timeout=5,
+        )
+        assert [result['state'] for result in results] == ['completed'] * 2
+        assert len(polls) == 2
+
+        # waiters give up after several failed polls in a row
+        monkeypatch.setattr(
+            pulp_client_module, 'PULP_TASKS_POLL_MAX_ERRORS', 3
+        )
+        polls.clear()
+        broken_polls = 10
+        with pytest.raises(ClientResponseError):
+            await asyncio.wait_for(
+                pulp_client.wait_for_task('/pulp/api/v3/tasks/3/'),
+                timeout=5,
+            )
+        assert len(polls) == 3
+    finally:
+        await PulpClient.close_session()
+
+
+@pytest.mark.anyio
+async def test_wait_for_tasks_fails_on_missing_task(monkeypatch):
+    polls = []
+    requested_tasks = []
+
+    async def request(self, method, endpoint, params=None, **kwargs):
+        if params is None:
+            requested_tasks.append(endpoint)
+            raise ClientResponseError(
+                Mock(real_url=f'http://pulp{endpoint}'), (), status=404
+            )
+        hrefs = params['pulp_href__in'].split(',')
+        polls.append(hrefs)
+        # the deleted task is never listed
+        return {
+            'count': 1,
+            'results': [
+                {'pulp_href': href, 'state': 'completed'}
+                for href in hrefs
+                if href.endswith('/1/')
+            ],
+        }
+
+    monkeypatch.setattr(PulpClient, 'request', request)
+    monkeypatch.setattr(pulp_client_module, 'PULP_TASKS_POLL_MAX_ERRORS', 3)
+    pulp_client = PulpClient('http://pulp', 'admin', 'admin')
+    try:
+        results = await asyncio.wait_for(
+            asyncio.gather(
+                pulp_client.wait_for_task('/pulp/api/v3/tasks/1/'),
+                pulp_client.wait_for_task('/pulp/api/v3/tasks/2/'),
+                return_exceptions=True,
+            ),
+            timeout=5,
+        )
+        assert results[0]['state'] == 'completed'
+        assert isinstance(results[1], ClientResponseError)
+        assert results[1].status == 404
+        assert len(polls) == 3
+        assert requested_tasks == ['/pulp/api/v3/tasks/2/']
+    finally:
+        await PulpClient.close_session()
+
+
+@pytest.mark.anyio
+async def test_iter_entities_pages_by_offset(monkeypatch):
+    entities = [{'pulp_href': f'/pulp/api/v3/content/{i}/'} for i in range(25)]
+    requested_offsets = []
+
+    async def request(self, method, endpoint, params=None, **kwargs):
+        offset = params.get('offset', 0)
+        limit = params['limit']
+        requested_offsets.append(offset)
+        return {
+            'count': len(entities),
+            'next': 'next' if offset + limit < len(entities) else None,
+            'results': entities[offset : offset + limit],
+        }
+
+    monkeypatch.setattr(PulpClient, 'request', request)
+    pulp_client = PulpClient('http://pulp', 'admin', 'admin')
+    result = [
+        entity
+        async for entity in pulp_client.iter_entities(
+            'pulp/api/v3/content/rpm/packages/',
+            limit=10,
+        )
+    ]
+    assert result == entities
+    assert sorted(requested_offsets) == [0, 10, 20]
+
+
+class PulpStandIn:
+    """
+    Minimal Pulp API answering advisory uploads, repository modifies
+    and tasks lookups, every finished task is completed immediately.
+    """
+
+    def __init__(self):
+        self.tasks = {}
+        self.advisories = {}
+        # repository href -> list of repository versions content
+        self.repo_versions = collections.defaultdict(lambda: [set()])
+
+    def _create_task(self, created_resources):
+        task_href = f'/pulp/api/v3/tasks/{len(self.tasks)}/'
+        self.tasks[task_href] = {
+            'pulp_href': task_href,
+            'state': 'completed',
+            'created_resources': created_resources,
+        }
+        return web.json_response({'task': task_href})
+
+    def _add_to_repo(self, repo_href, content_hrefs):
+        versions = self.repo_versions[repo_href]
+        versions.append(versions[-1] | set(content_hrefs))
+        return f'{repo_href}versions/{len(versions) - 1}/'
+
+    async def upload_advisory(self, request):
+        form = await request.post()
+        record = json.loads(form['file'].file.read())
+        advisory_href = (
+            f'/pulp/api/v3/content/rpm/advisories/{len(self.advisories)}/'
+        )
+        self.advisories[advisory_href] = record
+        created_resources = [advisory_href]
+        if 'repository' in form:
+            created_resources.append(
+                self._add_to_repo(form['repository'], [advisory_href])
+            )
+        return self._create_task(created_resources)
+
+    async def modify(self, request):
+        payload = await request.json()
+        repo_href = request.path[: -len('modify/')]
+        version_href = self._add_to_repo(
+            repo_href, payload.get('add_content_units', [])
+        )
+        return self._create_task([version_href])
+
+    async def list_tasks(self, request):
+        hrefs = request.query['pulp_href__in'].split(',')
+        return web.json_response({
+            'count': len(hrefs),
+            'results': [self.tasks[href] for href in hrefs],
+        })
+
+    async def start(self) -> web.AppRunner:
+        app = web.Application()
+        app.router.add_post(
+            '/pulp/api/v3/content/rpm/advisories/', self.upload_advisory
+        )
+        app.router.add_post(
+            '/pulp/api/v3/repositories/rpm/rpm/{repo_id}/modify/',
+            self.modify,
+        )
+        app.router.add_get('/pulp/api/v3/tasks/', self.list_tasks)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', 0).start()
+        return runner
+
+
+@pytest.mark.anyio
+async def test_add_errata_records_creates_single_repo_version(monkeypatch):
+    monkeypatch.setattr(PulpClient, 'request', PULP_REQUEST)
+    pulp = PulpStandIn()
+    runner = await pulp.start()
+    host = f'http://127.0.0.1:{runner.addresses[0][1]}'
+    repo_hrefs = [f'/pulp/api/v3/repositories/rpm/rpm/{i}/' for i in range(2)]
+    records = [{'id': f'ALSA-2022:{i:04d}'} for i in range(10)]
+    try:
+        pulp_client = PulpClient(host, 'admin', 'admin')
+        await asyncio.gather(*(
+            pulp_client.add_errata_records(records, repo_href)
+            for repo_href in repo_hrefs
+        ))
+    finally:
+        await PulpClient.close_session()
+        await runner.cleanup()
+
+    for repo_href in repo_hrefs:
+        versions = pulp.repo_versions[repo_href]
+        # initial empty version and a single one with all advisories
+        assert len(versions) == 2
+        assert sorted(
+            pulp.advisories[href]['id'] for href in versions[-1]
+        ) == [record['id'] for record in records]
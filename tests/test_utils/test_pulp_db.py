@@ -0,0 +1,229 @@
+import asyncio
+import uuid
+
+import pytest
+import sqlalchemy
+from sqlalchemy import insert, select, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from alws import database
+from alws.config import settings
+from alws.database import pulp_async_engine
+from alws.dependencies import get_async_pulp_db
+from alws.pulp_models import (
+    CoreContent,
+    CoreRepository,
+    CoreRepositoryContent,
+    CoreRepositoryVersion,
+    RpmPackage,
+)
+from alws.utils.pulp_utils import get_rpm_packages_by_nevras, in_array
+
+PULP_SCHEMA = "test_pulp_packages"
+
+
+@pytest.fixture
+async def pulp_schema_session(monkeypatch):
+    # Pulp tables are created in a throwaway schema,
+    # queries of pulp_utils are routed there through AsyncPulpSession
+    engine = create_async_engine(
+        make_url(settings.pulp_database_url).set(
+            drivername="postgresql+asyncpg"
+        ),
+        poolclass=NullPool,
+        connect_args={"server_settings": {"search_path": PULP_SCHEMA}},
+    )
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(f"DROP SCHEMA IF EXISTS {PULP_SCHEMA} CASCADE")
+        )
+        await conn.execute(text(f"CREATE SCHEMA {PULP_SCHEMA}"))
+        # Pulp models declare DATETIME columns, which PostgreSQL lacks
+        await conn.execute(
+            text(f"CREATE DOMAIN {PULP_SCHEMA}.datetime AS timestamp")
+        )
+        await conn.run_sync(
+            database.PulpBase.metadata.create_all,
+            tables=[
+                CoreRepository.__table__,
+                CoreRepositoryVersion.__table__,
+                CoreContent.__table__,
+                CoreRepositoryContent.__table__,
+                RpmPackage.__table__,
+            ],
+        )
+    pulp_session = sessionmaker(
+        engine,
+        expire_on_commit=False,
+        class_=AsyncSession,
+    )
+    monkeypatch.setattr(database, "AsyncPulpSession", pulp_session)
+    try:
+        yield pulp_session
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(
+                text(f"DROP SCHEMA IF EXISTS {PULP_SCHEMA} CASCADE")
+            )
+        await engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_pulp_query_does_not_block_event_loop():
+    ticks = []
+    query_done = asyncio.Event()
+
+    async def ticker():
+        loop = asyncio.get_running_loop()
+        while not query_done.is_set():
+            ticks.append(loop.time())
+            await asyncio.sleep(0.01)
+
+    async def run_query():
+        try:
+            async with get_async_pulp_db() as pulp_db:
+                result = await pulp_db.execute(
+                    text(
+                        "SELECT i, md5(i::text) "
+                        "FROM generate_series(1, 50000) AS i, pg_sleep(0.5)"
+                    )
+                )
+                return result.all()
+        finally:
+            query_done.set()
+
+    try:
+        rows, _ = await asyncio.gather(run_query(), ticker())
+    finally:
+        await pulp_async_engine.dispose()
+
+    assert len(rows) == 50000
+    # the loop kept running other coroutines while the query was running,
+    # a blocking query would give a single tick for the whole 0.5s sleep
+    assert len(ticks) >= 25
+
+
+@pytest.mark.anyio
+async def test_in_array_is_not_limited_by_bind_parameters():
+    # asyncpg accepts up to 32767 parameters in a single query
+    ids = [uuid.uuid4() for _ in range(40000)]
+    values = sqlalchemy.values(
+        sqlalchemy.column("pulp_id", UUID(as_uuid=True)),
+        name="ids",
+    ).data([(ids[0],), (ids[-1],), (uuid.uuid4(),)])
+    try:
+        async with get_async_pulp_db() as pulp_db:
+            result = await pulp_db.execute(
+                select(values.c.pulp_id).where(in_array(values.c.pulp_id, ids))
+            )
+            assert sorted(result.scalars().all()) == sorted([ids[0], ids[-1]])
+    finally:
+        await pulp_async_engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_get_rpm_packages_by_nevras(pulp_schema_session):
+    repo_ids = [uuid.uuid4() for _ in range(3)]
+    version_ids = [uuid.uuid4() for _ in range(3)]
+    removed_version_id = uuid.uuid4()
+    nevras = {
+        "released": ("foo", "0", "1.0", "1.el9", "x86_64"),
+        "other": ("bar", "0", "2.0", "1.el9", "x86_64"),
+        # name and version are searched, but not together
+        "cartesian": ("foo", "0", "2.0", "1.el9", "x86_64"),
+        "removed": ("bar", "0", "2.0", "1.el9", "i686"),
+    }
+    content_ids = {key: uuid.uuid4() for key in nevras}
+    # (content, repository, repository version the content is removed in)
+    repo_contents = [
+        (content_ids["released"], repo_ids[0], None),
+        (content_ids["released"], repo_ids[1], None),
+        # the last repository isn't searched
+        (content_ids["released"], repo_ids[2], None),
+        (content_ids["other"], repo_ids[0], None),
+        (content_ids["cartesian"], repo_ids[0], None),
+        (content_ids["removed"], repo_ids[0], removed_version_id),
+    ]
+    async with pulp_schema_session() as pulp_db:
+        await pulp_db.execute(
+            insert(CoreRepository),
+            [
+                {"pulp_id": repo_id, "name": f"repo-{idx}"}
+                for idx, repo_id in enumerate(repo_ids)
+            ],
+        )
+        await pulp_db.execute(
+            insert(CoreRepositoryVersion),
+            [
+                {"pulp_id": version_id, "repository_id": repo_id, "number": 1}
+                for repo_id, version_id in zip(repo_ids, version_ids)
+            ]
+            + [{
+                "pulp_id": removed_version_id,
+                "repository_id": repo_ids[0],
+                "number": 2,
+            }],
+        )
+        await pulp_db.execute(
+            insert(CoreContent),
+            [
+                {"pulp_id": content_id, "pulp_type": "rpm.package"}
+                for content_id in content_ids.values()
+            ],
+        )
+        await pulp_db.execute(
+            insert(RpmPackage),
+            [
+                {
+                    "content_ptr_id": content_ids[key],
+                    **dict(
+                        zip(
+                            ("name", "epoch", "version", "release", "arch"),
+                            nevra,
+                        )
+                    ),
+                }
+                for key, nevra in nevras.items()
+            ],
+        )
+        await pulp_db.execute(
+            insert(CoreRepositoryContent),
+            [
+                {
+                    "pulp_id": uuid.uuid4(),
+                    "content_id": content_id,
+                    "repository_id": repo_id,
+                    "version_added_id": version_ids[repo_ids.index(repo_id)],
+                    "version_removed_id": version_removed_id,
+                }
+                for content_id, repo_id, version_removed_id in repo_contents
+            ],
+        )
+        await pulp_db.commit()
+
+    # more NEVRAs than separate bind parameters would allow
+    missing_nevras = [
+        (f"missing-{idx}", "0", "1.0", "1.el9", "x86_64")
+        for idx in range(7000)
+    ]
+    pkgs = await get_rpm_packages_by_nevras(
+        repo_ids[:2],
+        [
+            nevras["released"],
+            nevras["other"],
+            nevras["removed"],
+            *missing_nevras,
+        ],
+    )
+    assert sorted(
+        (pkg.content_ptr_id, repo_id) for pkg, repo_id in pkgs
+    ) == sorted([
+        (content_ids["released"], repo_ids[0]),
+        (content_ids["released"], repo_ids[1]),
+        (content_ids["other"], repo_ids[0]),
+    ])
+    assert await get_rpm_packages_by_nevras([], [nevras["released"]]) == []
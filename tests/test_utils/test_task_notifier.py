@@ -0,0 +1,94 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from alws import dependencies
+from alws.dependencies import get_db
+from alws.utils.task_notifier import (
+    get_build_topics,
+    task_notifier,
+    wait_for_tasks,
+)
+
+
+@pytest.mark.anyio
+async def test_wait_for_tasks_wakes_up_on_notification():
+    attempts = []
+
+    async def claim(db):
+        attempts.append(db)
+        return ['task'] if len(attempts) > 1 else []
+
+    async def notify():
+        await asyncio.sleep(0.1)
+        task_notifier.publish('build:x86_64')
+
+    result, _ = await asyncio.gather(
+        asyncio.wait_for(
+            wait_for_tasks(
+                claim,
+                get_build_topics(['x86_64']),
+                timeout=30,
+            ),
+            timeout=5,
+        ),
+        notify(),
+    )
+    assert result == ['task']
+    assert len(attempts) == 2
+
+
+@pytest.mark.anyio
+async def test_wait_for_tasks_ignores_other_topics():
+    attempts = []
+
+    async def claim(db):
+        attempts.append(db)
+        return None
+
+    async def notify():
+        await asyncio.sleep(0.1)
+        task_notifier.publish('build:aarch64')
+
+    result, _ = await asyncio.gather(
+        wait_for_tasks(
+            claim,
+            get_build_topics(['x86_64']),
+            timeout=1,
+        ),
+        notify(),
+    )
+    assert result is None
+    assert len(attempts) == 2
+
+
+@pytest.mark.anyio
+async def test_parked_waiters_do_not_hold_db_semaphore(monkeypatch):
+    monkeypatch.setattr(dependencies, 'DB_SEMAPHORE', asyncio.Semaphore(2))
+    attempts = []
+
+    async def claim(db):
+        attempts.append(db)
+        return []
+
+    waiters = [
+        asyncio.create_task(
+            wait_for_tasks(claim, get_build_topics(['x86_64']), timeout=30)
+        )
+        for _ in range(5)
+    ]
+    try:
+        await asyncio.sleep(0.1)
+        assert len(attempts) == 5
+        assert not dependencies.DB_SEMAPHORE.locked()
+
+        async def request():
+            async with asynccontextmanager(get_db)():
+                return True
+
+        assert await asyncio.wait_for(request(), timeout=1)
+    finally:
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)